@@ -1,17 +1,19 @@
-from aws_syncr.filename_completer import filename_prompt, setup_completer
 from aws_syncr.formatter import MergedOptionStringFormatter
-from aws_syncr.errors import AwsSyncrError
+from aws_syncr.errors import AwsSyncrError, BadConfiguration
 from aws_syncr.errors import UserQuit
+from aws_syncr.deploys import Deploys, summary_line, failed
 
-from Crypto.Util import Counter
-from Crypto.Cipher import AES
+from delfick_error import DelfickError
 
+from input_algorithms.spec_base import NotSpecified
 from option_merge import MergedOptions
+from multiprocessing.pool import ThreadPool
+from functools import partial
 from six.moves import input
-import readline
 import logging
+import fnmatch
 import base64
-import yaml
+import json
 import six
 import os
 
@@ -23,20 +25,91 @@ def an_action(func):
     available_actions[func.__name__] = func
     return func
 
-def find_lambda_function(aws_syncr, configuration):
-    lambda_function = aws_syncr.artifact
+def an_action_called(name):
+    """Register an action under a name that can't be a function name"""
+    def register(func):
+        available_actions[name] = func
+        return func
+    return register
 
+def an_offline_action(func):
+    """An action that never talks to amazon, so we don't need to set it up"""
+    func.offline = True
+    return an_action(func)
+
+def convert_all(configuration):
+    """Convert every registered section, returning the converted sections and any errors"""
+    converted = {}
+    errors = []
+    for thing in configuration["__registered__"]:
+        if thing in configuration:
+            try:
+                converted[thing] = configuration[thing]
+            except DelfickError as error:
+                errors.append(error)
+    return converted, errors
+
+def write_report(aws_syncr, amazon):
+    """Write the changes amazon made (or would make) to the --report file"""
+    if not aws_syncr.report:
+        return
+
+    report = {
+          "environment": aws_syncr.environment
+        , "shard": None if not aws_syncr.shard else "{0}/{1}".format(*aws_syncr.shard)
+        , "dry_run": aws_syncr.dry_run
+        , "changes": amazon.recorded
+        }
+
+    with open(aws_syncr.report, "w") as fle:
+        json.dump(report, fle, indent=2, sort_keys=True)
+    log.info("Wrote report\tlocation=%s\tchanges=%s", aws_syncr.report, len(amazon.recorded))
+
+def find_lambda_functions(aws_syncr, configuration):
+    """Return the lambda functions chosen by the comma separated names and globs in --artifact"""
     if 'lambda' not in configuration:
         raise AwsSyncrError("Please define lambda functions under the 'lambda' section of your configuration")
 
-    if not lambda_function:
+    if not aws_syncr.artifact:
         raise AwsSyncrError("Please specify --artifact for the lambda function to deploy")
 
-    wanted = ['lambda', lambda_function]
-    if wanted not in configuration:
-        raise AwsSyncrError("Couldn't find specified lambda function", available=list(configuration["lambda"].items.keys()))
+    available = configuration['lambda'].items
+    chosen = []
+    for pattern in aws_syncr.artifact.split(","):
+        pattern = pattern.strip()
+        matched = sorted(name for name in available if fnmatch.fnmatch(name, pattern))
+        if not matched:
+            raise AwsSyncrError("Couldn't find specified lambda function", wanted=pattern, available=sorted(available))
+        chosen.extend(name for name in matched if name not in chosen)
 
-    return configuration['lambda'].items[lambda_function]
+    return [available[name] for name in chosen]
+
+def lambda_functions(collector, deploy, test):
+    """Deploy and/or test the lambda functions in --artifact"""
+    amazon = collector.configuration['amazon']
+    aws_syncr = collector.configuration['aws_syncr']
+    functions = find_lambda_functions(aws_syncr, collector.configuration)
+
+    if len(functions) == 1 and functions[0].name == aws_syncr.artifact:
+        if deploy:
+            functions[0].deploy(aws_syncr, amazon)
+        if test:
+            amazon._validated = True
+            functions[0].test(aws_syncr, amazon)
+        return
+
+    log.info("Running lambda functions together\tdeploy=%s\ttest=%s\tfunctions=%s", deploy, test, [function.name for function in functions])
+    summaries = Deploys(amazon, deploy=deploy, test=test).run(functions)
+
+    for summary in summaries:
+        if summary.get("tested", {}).get("logs"):
+            print("{0}\nLogs for {1}\n{2}".format("=" * 80, summary["name"], summary["tested"]["logs"]))
+    for summary in summaries:
+        print(summary_line(summary))
+
+    failures = [summary["name"] for summary in summaries if failed(summary)]
+    if failures:
+        raise AwsSyncrError("Some lambda functions failed", failed=failures)
 
 def find_gateway(aws_syncr, configuration):
     amazon = configuration['amazon']
@@ -60,6 +133,43 @@ def find_gateway(aws_syncr, configuration):
 
     return aws_syncr, amazon, stage, gateway
 
+def available_certificates(configuration):
+    """Return [(gateway_name, certificate), ...] for the custom domain names in the configuration"""
+    available = []
+    for gateway_name, gateway in configuration.get('apigateway', {}, ignore_converters=True).items():
+        for name, options in gateway.get("domain_names", {}).items():
+            if "zone" in options:
+                location = '.'.join(['apigateway', gateway_name, 'domain_names'])
+                formatter = MergedOptionStringFormatter(configuration, location, value=options['zone'])
+                available.append((gateway_name, "{0}.{1}".format(name, formatter.format())))
+
+    if not available:
+        raise AwsSyncrError("Please specify apigateway.<gateway_name>.domain_names.<domain_name>.name in the configuration")
+
+    return available
+
+def encrypt_file(plaintext_data_key, filename, chunk_size=64 * 1024):
+    """
+    Encrypt a file with AES-CTR under a new random nonce, a chunk at a time
+
+    Return the ciphertext and the nonce, both base64 encoded
+    """
+    from Crypto.Util import Counter
+    from Crypto.Cipher import AES
+
+    nonce = os.urandom(8)
+    encryptor = AES.new(plaintext_data_key[:32], AES.MODE_CTR, counter=Counter.new(64, prefix=nonce))
+
+    encrypted = []
+    with open(filename, 'rb') as fle:
+        while True:
+            chunk = fle.read(chunk_size)
+            if not chunk:
+                break
+            encrypted.append(encryptor.encrypt(chunk))
+
+    return base64.b64encode(b"".join(encrypted)).decode('utf-8'), base64.b64encode(nonce).decode('utf-8')
+
 def find_certificate_source(configuration, gateway, certificate):
     source = configuration.source_for(['apigateway', gateway, 'domain_names'])
     location = ["apigateway", gateway, 'domain_names']
@@ -70,10 +180,7 @@ def find_certificate_source(configuration, gateway, certificate):
             zone = MergedOptionStringFormatter(configuration, '.'.join(location + ['zone']), value=domain.get('zone')).format()
             domain_name = "{0}.{1}".format(name, zone)
             if domain_name == certificate:
-                if 'certificate' not in domain:
-                    domain['certificate'] = {}
-
-                var = domain['certificate']
+                var = domain.get('certificate', {})
 
                 class StickyChain(object):
                     def __init__(self):
@@ -99,6 +206,9 @@ def find_certificate_source(configuration, gateway, certificate):
                     source = configuration.source_for(location)
                     for info in configuration.storage.get_info(location, ignore_converters=True):
                         location = [str(part) for part in info.path.path]
+                    return location, source
+
+                return location + [name, 'certificate'], source
 
     return location, source
 
@@ -115,36 +225,272 @@ def sync(collector):
         if thing in collector.configuration:
             converted[thing] = collector.configuration[thing]
 
+    # Only sync what changed if we were asked to
+    changed = None
+    if aws_syncr.since:
+        from aws_syncr.since import changed_items
+        changed = changed_items(collector.configuration, aws_syncr.config_folder, aws_syncr.since)
+
+    # Keep a journal of what we do so we can resume if we die half way
+    done = set()
+    journal = None
+    if not aws_syncr.dry_run:
+        from aws_syncr.journal import Journal, desired_hash
+        journal = amazon.journal = Journal(aws_syncr.environment)
+        done = journal.resume() if aws_syncr.resume else journal.start()
+
     # Do the sync
     for typ in collector.configuration["__registered__"]:
         if typ in converted:
             thing = converted[typ]
             if not aws_syncr.artifact or aws_syncr.artifact == typ:
                 log.info("Syncing {0}".format(typ))
-                for name, item in thing.items.items():
-                    thing.sync_one(aws_syncr, amazon, item)
 
+                # Work out what we're syncing before we ask amazon about any of it
+                wanted = []
+                for name, item in thing.items.items():
+                    if changed is None or name in changed.get(typ, ()):
+                        desired = None
+                        if journal is not None:
+                            desired = desired_hash(thing, aws_syncr, collector.configuration['accounts'], item)
+                            if (typ, name, desired) in done:
+                                log.info("Already synced in the interrupted run\tsection=%s\tname=%s", typ, name)
+                                continue
+                        wanted.append((name, item, desired))
+
+                if wanted and hasattr(thing, "prefetch"):
+                    thing.prefetch(amazon, [item for _, item, _ in wanted])
+
+                for name, item, desired in wanted:
+                    if journal is None:
+                        thing.sync_one(aws_syncr, amazon, item)
+                    else:
+                        with journal.item(typ, name, desired):
+                            thing.sync_one(aws_syncr, amazon, item)
+
+    if journal:
+        journal.finish()
+    write_report(aws_syncr, amazon)
     if not amazon.changes:
         log.info("No changes were made!!")
 
+@an_action
+def watch(collector):
+    """Sync the environment, and then sync whatever changes in its files as they change"""
+    from aws_syncr.watch import Watcher
+    Watcher(collector, sync).watch()
+
+@an_offline_action
+def serve(collector):
+    """Run tasks for aws_syncr_client from a unix socket at --artifact, $AWS_SYNCR_SERVER or ~/.aws_syncr/server.sock"""
+    from aws_syncr.client import socket_location
+    from aws_syncr.server import Server
+    Server(socket_location(collector.configuration['aws_syncr'].artifact)).serve()
+
+@an_action
+def snapshot(collector):
+    """Record everything a sync would read from amazon into the file given by --artifact"""
+    configuration = collector.configuration
+    amazon = configuration['amazon']
+    aws_syncr = configuration['aws_syncr']
+    from aws_syncr.amazon.snapshot import Snapshot
+
+    if not aws_syncr.artifact:
+        raise AwsSyncrError("Please specify where to write the snapshot with --artifact")
+
+    recording = Snapshot(aws_syncr.environment, amazon.accounts[aws_syncr.environment])
+    amazon.use_snapshot(recording)
+    amazon.dry_run = aws_syncr.dry_run = True
+
+    location, aws_syncr.artifact = aws_syncr.artifact, ""
+    sync(collector)
+    recording.save(location)
+
+@an_action
+def audit(collector):
+    """
+    Report the resources in the account that aren't in the configuration
+
+    Only resources whose name starts with --artifact are reported, if it's given.
+    We look in the regions the configuration uses and aws_syncr.location, and
+    only at the records in zones the configuration has records for.
+    """
+    configuration = collector.configuration
+    amazon = configuration['amazon']
+    aws_syncr = configuration['aws_syncr']
+
+    converted, errors = convert_all(configuration)
+    if errors:
+        raise BadConfiguration("Configuration isn't valid", _errors=errors)
+
+    items = lambda typ: list(converted[typ].items.values()) if typ in converted else []
+    managed = {
+          "role": set((None, role.name.split('/')[-1]) for role in items("roles"))
+        , "bucket": set((None, bucket.name.split('/')[-1]) for bucket in items("buckets"))
+        , "key": set((key.location, key.name) for key in items("encryption_keys"))
+        , "function": set((function.location, function.name) for function in items("lambda"))
+        , "gateway": set((gateway.location, gateway.name) for gateway in items("apigateway"))
+        , "record": set((route.zone, "{0}.{1}".format(route.name, route.zone)) for route in items("dns"))
+        }
+    regions = sorted(set([aws_syncr.location] + [location for kind in ("key", "function", "gateway") for location, _ in managed[kind]]))
+    zones = sorted(set(zone for zone, _ in managed["record"]))
+
+    # Make the clients here because boto3 sessions aren't thread safe
+    jobs = [("role", None, amazon.iam.role_names), ("bucket", None, amazon.s3.existing_buckets)]
+    for region in regions:
+        amazon.kms.get_client(region)
+        amazon.lambdas.client(region)
+        amazon.apigateway.client(region)
+        jobs.append(("key", region, partial(amazon.kms.alias_names, region)))
+        jobs.append(("function", region, partial(lambda region: amazon.lambdas.inventory(region).keys(), region)))
+        jobs.append(("gateway", region, partial(lambda region: amazon.apigateway.inventory(region).rest_apis.keys(), region)))
+
+    for zone in zones:
+        jobs.append(("record", zone, partial(amazon.route53.cname_records, zone)))
+
+    log.info("Listing resources\tregions=%s\tzones=%s", regions, zones)
+    pool = ThreadPool(min(10, len(jobs)))
+    try:
+        found = pool.map(lambda job: job[2](), jobs)
+    finally:
+        pool.close()
+        pool.join()
+
+    unmanaged = {}
+    for (kind, location, _), names in zip(jobs, found):
+        for _, name in sorted(set((location, name) for name in names) - managed[kind]):
+            if name.startswith(aws_syncr.artifact):
+                unmanaged.setdefault(kind, []).append({"location": location, "name": name})
+
+    for kind, resources in sorted(unmanaged.items()):
+        for resource in resources:
+            print("? {0}(name={1}{2})".format(kind, resource["name"], "" if resource["location"] is None else ", location={0}".format(resource["location"])))
+
+    log.info("Found unmanaged resources\t%s", "\t".join("{0}={1}".format(kind, len(resources)) for kind, resources in sorted(unmanaged.items())) or "none")
+    if aws_syncr.report:
+        with open(aws_syncr.report, "w") as fle:
+            json.dump({"environment": aws_syncr.environment, "unmanaged": unmanaged}, fle, indent=2, sort_keys=True)
+
+@an_action_called("import")
+def import_account(collector):
+    """
+    Write configuration for the roles and buckets in the account that aren't in the configuration
+
+    The roles.yaml, buckets.yaml and templates.yaml files go in the folder given
+    by --artifact, or the environment folder. We complain about any imported
+    item a sync would still change.
+    """
+    configuration = collector.configuration
+    amazon = configuration['amazon']
+    aws_syncr = configuration['aws_syncr']
+    from aws_syncr.importer import Importer, factor_templates
+    import yaml
+
+    converted, errors = convert_all(configuration)
+    if errors:
+        raise BadConfiguration("Configuration isn't valid", _errors=errors)
+
+    folder = aws_syncr.artifact or os.path.join(aws_syncr.config_folder, aws_syncr.environment)
+    locations = dict((section, os.path.join(folder, "{0}.yaml".format(section))) for section in ("roles", "buckets", "templates"))
+    existing = sorted(location for location in locations.values() if os.path.exists(location))
+    if existing:
+        raise AwsSyncrError("Refusing to overwrite existing files", existing=existing)
+
+    managed = lambda typ: set(item.name.split('/')[-1] for item in converted[typ].items.values()) if typ in converted else set()
+    managed_roles, managed_buckets = managed("roles"), managed("buckets")
+
+    log.info("Listing roles and buckets")
+    pool = ThreadPool(10)
+    try:
+        roles, instance_profiles, buckets = pool.map(lambda job: job(), [amazon.iam.roles, amazon.iam.instance_profile_roles, amazon.s3.existing_buckets])
+        roles = [role for role in roles if role["RoleName"] not in managed_roles]
+        buckets = sorted(name for name in buckets if name not in managed_buckets)
+
+        log.info("Finding policies for %s roles", len(roles))
+        policies = pool.map(lambda role: amazon.iam.role_policies(role["RoleName"]), roles)
+    finally:
+        pool.close()
+        pool.join()
+    amazon.s3.discover(buckets)
+
+    importer = Importer(aws_syncr, configuration['accounts'])
+    found = {"roles": {}, "buckets": {}}
+    current = {"roles": {}, "buckets": {}}
+    for role, role_policies in zip(roles, policies):
+        name, options = importer.role(role, role_policies, instance_profiles)
+        found["roles"][name] = options
+        current["roles"][name] = (role, role_policies)
+
+    for bucket in buckets:
+        info = amazon.s3.bucket_info(bucket)
+        found["buckets"][bucket], current["buckets"][bucket] = importer.bucket(info)[1], (info, )
+
+    taken = set(configuration.get("templates", {}).keys())
+    for section in ("roles", "buckets"):
+        importer.templates.update(factor_templates(section, found[section], taken))
+
+    checks = {"roles": importer.problems_with_role, "buckets": importer.problems_with_bucket}
+    for section in ("roles", "buckets"):
+        for name, options in sorted(found[section].items()):
+            problems = checks[section](name, options, *current[section][name])
+            if problems:
+                log.warning("Sync would still change an imported item\tsection=%s\tname=%s\tproblems=%s", section, name, problems)
+
+    found["templates"] = importer.templates
+    if not os.path.exists(folder):
+        os.makedirs(folder)
+
+    for section, items in sorted(found.items()):
+        if items:
+            with open(locations[section], "w") as fle:
+                yaml.safe_dump({section: items}, fle, default_flow_style=False)
+            log.info("Wrote %s %s\tlocation=%s", len(items), section, locations[section])
+
+@an_offline_action
+def validate(collector):
+    """Convert every section and complain about everything that is wrong"""
+    converted, errors = convert_all(collector.configuration)
+    if errors:
+        raise BadConfiguration("Configuration isn't valid", _errors=errors)
+    log.info("Configuration is valid\tsections=%s", sorted(converted))
+
+@an_offline_action
+def render(collector):
+    """Print as json what sync would apply, without talking to amazon"""
+    configuration = collector.configuration
+    aws_syncr = configuration['aws_syncr']
+
+    converted, errors = convert_all(configuration)
+    if errors:
+        raise BadConfiguration("Configuration isn't valid", _errors=errors)
+
+    rendered = {}
+    for typ in configuration["__registered__"]:
+        if typ in converted and (not aws_syncr.artifact or aws_syncr.artifact == typ):
+            thing = converted[typ]
+            rendered[typ] = dict((name, thing.render_one(aws_syncr, configuration['accounts'], item)) for name, item in thing.items.items())
+
+    def default(obj):
+        if obj is NotSpecified:
+            return None
+        raise TypeError("{0!r} is not JSON serializable".format(obj))
+
+    print(json.dumps(rendered, indent=2, sort_keys=True, default=default))
+
 @an_action
 def deploy_lambda(collector):
-    """Deploy a lambda function"""
-    amazon = collector.configuration['amazon']
-    aws_syncr = collector.configuration['aws_syncr']
-    find_lambda_function(aws_syncr, collector.configuration).deploy(aws_syncr, amazon)
+    """Deploy the lambda functions named (or globbed) in --artifact"""
+    lambda_functions(collector, deploy=True, test=False)
 
 @an_action
 def test_lambda(collector):
-    amazon = collector.configuration['amazon']
-    amazon._validated = True
-    aws_syncr = collector.configuration['aws_syncr']
-    find_lambda_function(aws_syncr, collector.configuration).test(aws_syncr, amazon)
+    """Invoke the lambda functions named (or globbed) in --artifact with their sample_event"""
+    lambda_functions(collector, deploy=False, test=True)
 
 @an_action
 def deploy_and_test_lambda(collector):
-    deploy_lambda(collector)
-    test_lambda(collector)
+    """Deploy the lambda functions in --artifact and invoke each one as soon as it's deployed"""
+    lambda_functions(collector, deploy=True, test=True)
 
 @an_action
 def deploy_gateway(collector):
@@ -176,17 +522,7 @@ def encrypt_certificate(collector):
     aws_syncr = configuration['aws_syncr']
     certificate = aws_syncr.artifact
 
-    available = []
-
-    for gateway_name, gateway in configuration.get('apigateway', {}, ignore_converters=True).items():
-        for name, options in gateway.get("domain_names", {}).items():
-            if "zone" in options:
-                location = '.'.join(['apigateway', gateway_name, 'domain_names'])
-                formatter = MergedOptionStringFormatter(configuration, location, value=options['zone'])
-                available.append((gateway_name, "{0}.{1}".format(name, formatter.format())))
-
-    if not available:
-        raise AwsSyncrError("Please specify apigateway.<gateway_name>.domain_names.<domain_name>.name in the configuration")
+    available = available_certificates(configuration)
 
     if not certificate:
         raise AwsSyncrError("Please specify certificate to encrypt with --artifact", available=[a[1] for a in available])
@@ -198,8 +534,8 @@ def encrypt_certificate(collector):
     location, source = find_certificate_source(configuration, gateway, certificate)
 
     log.info("Gonna edit {0} in {1}".format(location, source))
+    import yaml
     current = MergedOptions.using(yaml.load(open(source)))
-    dest = current[location]
 
     try:
         key_id = input("Which kms key do you want to use? ")
@@ -208,6 +544,7 @@ def encrypt_certificate(collector):
         raise UserQuit()
 
     # Make the filename completion work
+    from aws_syncr.filename_completer import filename_prompt, setup_completer
     setup_completer()
 
     # Create the datakey to encrypt with
@@ -218,22 +555,168 @@ def encrypt_certificate(collector):
     # Encrypt our secrets
     secrets = {}
     for name, desc in (("body", "certificate's crt file"), ("key", "private key file"), ("chain", "certificate chain")):
-        location = None
-        while not location or not os.path.isfile(location):
-            location = os.path.expanduser(filename_prompt("Where is the {0}? ".format(desc)))
-            if not location or not os.path.isfile(location):
+        filename = None
+        while not filename or not os.path.isfile(filename):
+            filename = os.path.expanduser(filename_prompt("Where is the {0}? ".format(desc)))
+            if not filename or not os.path.isfile(filename):
                 print("Please give a location to a file that exists!")
 
-        data = open(location).read()
-        counter = Counter.new(128)
-        encryptor = AES.new(plaintext_data_key[:32], AES.MODE_CTR, counter=counter)
-        secrets[name] = base64.b64encode(encryptor.encrypt(data)).decode('utf-8')
+        secrets[name] = encrypt_file(plaintext_data_key, filename)
 
     # Add in the encrypted values
-    dest['body'] = {"kms": secrets['body'], "location": region, "kms_data_key": encrypted_data_key}
-    dest['key'] = {"kms": secrets['key'], "location": region, "kms_data_key": encrypted_data_key}
-    dest['chain'] = {"kms": secrets['chain'], "location": region, "kms_data_key": encrypted_data_key}
+    for name in ("body", "key", "chain"):
+        encrypted, nonce = secrets[name]
+        current[location + [name]] = {"kms": encrypted, "nonce": nonce, "location": region, "kms_data_key": encrypted_data_key}
 
     # And write to the file!
     yaml.dump(current.as_dict(), open(source, 'w'), explicit_start=True, indent=2, default_flow_style=False)
 
+@an_action
+def encrypt_secrets(collector):
+    """
+    Encrypt the certificates in a manifest given by --artifact
+
+    The manifest is yaml like::
+
+        key_id: alias/my-key
+        region: ap-southeast-2
+        certificates:
+          api.example.com:
+            body: certs/api.crt
+            key: certs/api.key
+            chain: certs/chain.crt
+
+    Where key_id and region may also be set for each certificate and files
+    are relative to the manifest.
+    """
+    configuration = collector.configuration
+    amazon = configuration['amazon']
+    aws_syncr = configuration['aws_syncr']
+    import yaml
+
+    if not aws_syncr.artifact or not os.path.isfile(aws_syncr.artifact):
+        raise AwsSyncrError("Please specify the manifest of certificates to encrypt with --artifact", got=aws_syncr.artifact)
+
+    with open(aws_syncr.artifact) as fle:
+        manifest = yaml.safe_load(fle) or {}
+    manifest_folder = os.path.dirname(os.path.abspath(aws_syncr.artifact))
+
+    certificates = manifest.get("certificates")
+    if not isinstance(certificates, dict) or not certificates:
+        raise AwsSyncrError("Please specify certificates in the manifest", manifest=aws_syncr.artifact)
+
+    available = dict((certificate, gateway) for gateway, certificate in available_certificates(configuration))
+
+    # Work out everything we need before we ask amazon for anything
+    jobs = []
+    for certificate, files in sorted(certificates.items()):
+        if certificate not in available:
+            raise AwsSyncrError("Unknown certificate", available=sorted(available), got=certificate)
+
+        key_id = files.get("key_id", manifest.get("key_id"))
+        region = files.get("region", manifest.get("region"))
+        if not key_id or not region:
+            raise AwsSyncrError("Please specify key_id and region for each certificate", certificate=certificate)
+
+        location, source = find_certificate_source(configuration, available[certificate], certificate)
+        for name in ("body", "key", "chain"):
+            if name in files:
+                filename = os.path.join(manifest_folder, os.path.expanduser(files[name]))
+                if not os.path.isfile(filename):
+                    raise AwsSyncrError("Please give a location to a file that exists!", certificate=certificate, part=name, got=filename)
+                jobs.append((source, location, name, filename, region, key_id))
+
+    # One data key per kms key
+    data_keys = {}
+    for _, _, _, _, region, key_id in jobs:
+        if (region, key_id) not in data_keys:
+            log.info("Generating data key\tregion=%s\tkey_id=%s", region, key_id)
+            data_key = amazon.kms.generate_data_key(region, key_id)
+            data_keys[(region, key_id)] = (data_key["Plaintext"], base64.b64encode(data_key["CiphertextBlob"]).decode('utf-8'))
+
+    def encrypt(job):
+        _, _, _, filename, region, key_id = job
+        return encrypt_file(data_keys[(region, key_id)][0], filename)
+
+    log.info("Encrypting %s files", len(jobs))
+    pool = ThreadPool(min(10, len(jobs)) or 1)
+    try:
+        encrypted = pool.map(encrypt, jobs)
+    finally:
+        pool.close()
+        pool.join()
+
+    # Load and dump each configuration file once
+    by_source = {}
+    for job, (kms, nonce) in zip(jobs, encrypted):
+        source, location, name, _, region, key_id = job
+        value = {"kms": kms, "nonce": nonce, "location": region, "kms_data_key": data_keys[(region, key_id)][1]}
+        by_source.setdefault(source, []).append((location, name, value))
+
+    for source, values in by_source.items():
+        log.info("Writing %s secrets to %s", len(values), source)
+        with open(source) as fle:
+            current = MergedOptions.using(yaml.safe_load(fle))
+        for location, name, value in values:
+            current[location + [name]] = value
+        with open(source, 'w') as fle:
+            yaml.safe_dump(current.as_dict(), fle, explicit_start=True, indent=2, default_flow_style=False)
+
+@an_offline_action
+def merge_reports(collector):
+    """
+    Combine the --report files from each shard of a sync
+
+    The reports are given after a ``--``, i.e.::
+
+        aws_syncr dev --task merge_reports --report all.json -- shard1.json shard2.json
+
+    And the combined report is written to --report, or printed.
+    """
+    aws_syncr = collector.configuration['aws_syncr']
+    import shlex
+
+    locations = shlex.split(aws_syncr.extra)
+    if not locations:
+        raise AwsSyncrError("Please specify the reports to merge after a --")
+
+    reports = []
+    for location in locations:
+        if not os.path.isfile(location):
+            raise AwsSyncrError("Please give a location to a report that exists!", got=location)
+        with open(location) as fle:
+            reports.append((location, json.load(fle)))
+
+    environments = sorted(set(report["environment"] for _, report in reports))
+    if len(environments) > 1:
+        raise AwsSyncrError("Reports are for different environments", environments=environments)
+
+    # Make sure we have every shard once
+    shards = [report["shard"] for _, report in reports if report.get("shard")]
+    if shards:
+        if len(shards) != len(reports):
+            raise AwsSyncrError("Some reports aren't for a shard", reports=[location for location, report in reports if not report.get("shard")])
+
+        counts = set(int(shard.split("/")[1]) for shard in shards)
+        wanted = set("{0}/{1}".format(index, count) for count in counts for index in range(1, count + 1))
+        if len(counts) > 1 or sorted(shards) != sorted(wanted):
+            raise AwsSyncrError("Reports don't cover every shard exactly once", got=sorted(shards), wanted=sorted(wanted))
+
+    changes = []
+    for _, report in reports:
+        for change in report["changes"]:
+            changes.append(dict(change, shard=report.get("shard")))
+
+    merged = {
+          "environment": environments[0]
+        , "shards": sorted(shards)
+        , "dry_run": any(report["dry_run"] for _, report in reports)
+        , "changes": changes
+        }
+
+    if aws_syncr.report:
+        with open(aws_syncr.report, "w") as fle:
+            json.dump(merged, fle, indent=2, sort_keys=True)
+        log.info("Wrote merged report\tlocation=%s\tchanges=%s", aws_syncr.report, len(changes))
+    else:
+        print(json.dumps(merged, indent=2, sort_keys=True))
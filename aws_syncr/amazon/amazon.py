@@ -1,13 +1,13 @@
+"""
+boto3 and the wrapper for each amazon service are only imported when first
+used, so that tasks which never talk to amazon start quickly.
+"""
+
 from aws_syncr.errors import BadCredentials, AwsSyncrError
-from aws_syncr.amazon.apigateway import ApiGateway
+from aws_syncr.amazon.identifiers import IdentifierCache
 from aws_syncr.amazon.common import AmazonMixin
-from aws_syncr.amazon.lambdas import Lambdas
-from aws_syncr.amazon.route53 import Route53
-from aws_syncr.amazon.iam import Iam
-from aws_syncr.amazon.kms import Kms
-from aws_syncr.amazon.s3 import S3
-import boto3
 
+import importlib
 import logging
 
 log = logging.getLogger("aws_syncr.amazon.amazon")
@@ -17,41 +17,119 @@ class ValidatingMemoizedProperty(object):
         self.kls = kls
         self.key = key
 
+    def resolve_kls(self):
+        """Import the class if we were given "module:Class" """
+        if isinstance(self.kls, str):
+            module, name = self.kls.split(":")
+            self.kls = getattr(importlib.import_module(module), name)
+        return self.kls
+
     def __get__(self, instance, owner):
         obj = getattr(instance, self.key, None)
         if not obj:
             if not getattr(instance, "_validated", False) and not getattr(instance, "_validating", False):
                 instance.validate_account()
-            obj = self.kls(instance, instance.environment, instance.accounts, instance.dry_run)
+            obj = self.resolve_kls()(instance, instance.environment, instance.accounts, instance.dry_run)
             setattr(instance, self.key, obj)
         return obj
 
 class Amazon(AmazonMixin, object):
-    def __init__(self, environment, accounts, debug=False, dry_run=False):
+    def __init__(self, environment, accounts, debug=False, dry_run=False, assume_role=None):
         self.debug = debug
         self.dry_run = dry_run
         self.accounts = accounts
         self.environment = environment
+        self.assume_role = assume_role
 
         self.changes = False
-        self.session = boto3.session.Session()
+        self.journal = None
+        self.snapshot = None
+        self.replaying = False
+        self.recorded = []
+        self.assumed_account_id = None
+        self.identifiers = IdentifierCache(environment)
+
+    @property
+    def session(self):
+        """Our boto3 session, with the credentials for assume_role if we have one"""
+        if getattr(self, "_session", None) is None:
+            if self.replaying:
+                # Nothing is sent to amazon, so we don't need to look for real credentials
+                import boto3
+                self._session = boto3.session.Session(aws_access_key_id="snapshot", aws_secret_access_key="snapshot")
+            elif self.assume_role:
+                from aws_syncr.amazon.credentials import assumed_role_session
+                self._session, self.assumed_account_id = assumed_role_session(self.environment, self.accounts[self.environment], self.assume_role)
+            else:
+                import boto3
+                self._session = boto3.session.Session()
+
+            if self.snapshot:
+                self.snapshot.attach(self._session, replay=self.replaying)
+        return self._session
+
+    def use_snapshot(self, snapshot, replay=False):
+        """Record what we read from amazon into this snapshot, or read everything from it instead"""
+        if getattr(self, "_session", None) is not None:
+            raise AwsSyncrError("Can only use a snapshot before talking to amazon")
+
+        self.snapshot = snapshot
+        self.replaying = replay
+
+        # What we look up depends on what we already know, so start from nothing
+        self.identifiers = IdentifierCache(self.environment, persist=False)
+
+    def forget_discovered(self):
+        """
+        Forget what we found out about the account, but keep the session, clients and validated account
 
-    s3 = ValidatingMemoizedProperty(S3, "_s3")
-    iam = ValidatingMemoizedProperty(Iam, "_iam")
-    kms = ValidatingMemoizedProperty(Kms, "_kms")
-    lambdas = ValidatingMemoizedProperty(Lambdas, "_lambdas")
-    route53 = ValidatingMemoizedProperty(Route53, "_route53")
-    apigateway = ValidatingMemoizedProperty(ApiGateway, "_apigateway")
+        Used when this connection is used again later, when the account may have changed
+        """
+        self.identifiers.reload()
+        for key in ("_s3", "_iam", "_kms", "_lambdas", "_route53", "_apigateway"):
+            service = getattr(self, key, None)
+            if service is not None and hasattr(service, "forget_discovered"):
+                service.forget_discovered()
+
+    def record_change(self, symbol, typ, applied, changes=None, document=None, **info):
+        """Remember a change we made, or would make in a dry run, for the change report and journal"""
+        resource = dict((key, "{0}".format(val)) for key, val in info.items())
+        self.recorded.append({"symbol": symbol, "type": typ, "applied": applied, "resource": resource})
+        if applied and self.journal:
+            self.journal.change(symbol, typ, resource)
+
+    s3 = ValidatingMemoizedProperty("aws_syncr.amazon.s3:S3", "_s3")
+    iam = ValidatingMemoizedProperty("aws_syncr.amazon.iam:Iam", "_iam")
+    kms = ValidatingMemoizedProperty("aws_syncr.amazon.kms:Kms", "_kms")
+    lambdas = ValidatingMemoizedProperty("aws_syncr.amazon.lambdas:Lambdas", "_lambdas")
+    route53 = ValidatingMemoizedProperty("aws_syncr.amazon.route53:Route53", "_route53")
+    apigateway = ValidatingMemoizedProperty("aws_syncr.amazon.apigateway:ApiGateway", "_apigateway")
 
     def validate_account(self):
         """Make sure we are able to connect to the right account"""
         self._validating = True
-        with self.catch_invalid_credentials():
-            log.info("Finding a role to check the account id")
-            a_role = list(self.iam.resource.roles.limit(1))
-            if not a_role:
-                raise AwsSyncrError("Couldn't find an iam role, can't validate the account....")
-            account_id = a_role[0].meta.data['Arn'].split(":", 5)[4]
+        self.session
+
+        if self.replaying:
+            if self.accounts[self.environment] != self.snapshot.account_id:
+                raise BadCredentials("Snapshot is for a different account!", wanted=self.accounts[self.environment], got=self.snapshot.account_id)
+            self._validating = False
+            self._validated = True
+            return
+
+        access_key = None if self.assumed_account_id else self.access_key()
+        account_id = self.assumed_account_id or (self.identifiers.get("account", access_key) if access_key else None)
+
+        if not account_id:
+            with self.catch_invalid_credentials():
+                log.info("Finding a role to check the account id")
+                a_role = list(self.iam.resource.roles.limit(1))
+                if not a_role:
+                    raise AwsSyncrError("Couldn't find an iam role, can't validate the account....")
+                account_id = a_role[0].meta.data['Arn'].split(":", 5)[4]
+
+            if access_key:
+                self.identifiers.set("account", access_key, account_id)
 
         chosen_account = self.accounts[self.environment]
         if chosen_account != account_id:
@@ -60,3 +138,8 @@ class Amazon(AmazonMixin, object):
         self._validating = False
         self._validated = True
 
+    def access_key(self):
+        """The access key of our credentials, if we can find any"""
+        credentials = self.session._session.get_credentials()
+        return getattr(credentials, "access_key", None)
+
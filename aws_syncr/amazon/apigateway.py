@@ -1,7 +1,11 @@
+from aws_syncr.amazon.identifiers import is_not_found
 from aws_syncr.amazon.common import AmazonMixin
 from aws_syncr.errors import AwsSyncrError
 from aws_syncr.differ import Differ
 
+from input_algorithms.spec_base import NotSpecified
+from botocore.exceptions import ClientError
+from contextlib import contextmanager
 import boto3
 
 import logging
@@ -9,6 +13,75 @@ import json
 
 log = logging.getLogger("aws_syncr.amazon.apigateway")
 
+def paginated(method, key, **kwargs):
+    """Yield all the items from an api gateway list call"""
+    kwargs["limit"] = 500
+    while True:
+        result = method(**kwargs)
+        for item in result.get(key, []):
+            yield item
+
+        if not result.get("position"):
+            break
+        kwargs["position"] = result["position"]
+
+class GatewayInventory(object):
+    """
+    The rest apis, domain names and api keys in one region
+
+    Each is listed once when first needed and then kept up to date by
+    ApiGateway as it changes things, so that syncing, deploying and finding
+    cnames don't need to ask amazon again.
+    """
+    def __init__(self, client, region):
+        self.client = client
+        self.region = region
+
+        self.infos = {}
+        self._api_keys = None
+        self._rest_apis = None
+        self._domains = None
+        self._domains_by_name = None
+
+    @property
+    def rest_apis(self):
+        """Dictionary of name to rest api"""
+        if self._rest_apis is None:
+            log.info("Finding rest apis\tregion=%s", self.region)
+            self._rest_apis = dict((item['name'], item) for item in paginated(self.client.get_rest_apis, "items"))
+        return self._rest_apis
+
+    @property
+    def domains(self):
+        """List of domain names and their base path mappings"""
+        if self._domains is None:
+            log.info("Finding domain names\tregion=%s", self.region)
+            self._domains = list(paginated(self.client.get_domain_names, "items"))
+            for domain in self._domains:
+                domain['mappings'] = list(paginated(self.client.get_base_path_mappings, "items", domainName=domain['domainName']))
+            self._domains_by_name = dict((domain['domainName'], domain) for domain in self._domains)
+        return self._domains
+
+    @property
+    def api_keys(self):
+        """List of all the api keys"""
+        if self._api_keys is None:
+            self._api_keys = list(paginated(self.client.get_api_keys, "items"))
+        return self._api_keys
+
+    def domain(self, domain_name):
+        """Return the domain with this name or None"""
+        self.domains
+        return self._domains_by_name.get(domain_name)
+
+    def add_rest_api(self, item):
+        self.rest_apis[item['name']] = item
+
+    def add_domain(self, domain):
+        domain.setdefault('mappings', [])
+        self.domains.append(domain)
+        self._domains_by_name[domain['domainName']] = domain
+
 class ApiGateway(AmazonMixin, object):
     def __init__(self, amazon, environment, accounts, dry_run):
         self.amazon = amazon
@@ -18,71 +91,123 @@ class ApiGateway(AmazonMixin, object):
         self.account_id = accounts[environment]
         self.environment = environment
 
-        self.client = lambda region: self.amazon.session.client('apigateway', region)
+        self.clients = {}
+        self.inventories = {}
+        self.planning = None
 
-    def gateway_info(self, gateway_name, region):
-        client = self.client(region)
-        apis = client.get_rest_apis()
+    def client(self, region):
+        if region not in self.clients:
+            self.clients[region] = self.amazon.session.client('apigateway', region)
+        return self.clients[region]
 
-        for item in apis['items']:
-            if item['name'] == gateway_name:
-                identity = item['id']
-                info = {"identity": identity, 'name': gateway_name}
-                self.load_info(client, info)
-                return info
+    def forget_discovered(self):
+        self.inventories = {}
+
+    def inventory(self, region):
+        if region not in self.inventories:
+            self.inventories[region] = GatewayInventory(self.client(region), region)
+        return self.inventories[region]
+
+    def gateway_info(self, gateway_name, region):
+        inventory = self.inventory(region)
+        if gateway_name not in inventory.infos:
+            identity = self.rest_api_id(gateway_name, region)
+            if not identity:
+                return None
+
+            info = {"identity": identity, 'name': gateway_name, 'location': region}
+            self.load_info(self.client(region), info)
+            inventory.infos[gateway_name] = info
+        return inventory.infos[gateway_name]
+
+    def rest_api_id(self, gateway_name, region):
+        """Find the id of the rest api with this name, preferring the one we remember if it still has this name"""
+        key = "{0}/{1}".format(region, gateway_name)
+        identity = self.amazon.identifiers.get("rest_api", key)
+        if identity:
+            try:
+                if self.client(region).get_rest_api(restApiId=identity)['name'] == gateway_name:
+                    return identity
+            except ClientError as error:
+                if not is_not_found(error):
+                    raise
+            self.amazon.identifiers.forget("rest_api", key)
+
+        item = self.inventory(region).rest_apis.get(gateway_name)
+        if item:
+            self.amazon.identifiers.set("rest_api", key, item['id'])
+            return item['id']
 
     def load_info(self, client, info):
         """Fill out information about the gateway"""
         if 'identity' in info:
             info['stages'] = client.get_stages(restApiId=info['identity'])['item']
-            info['resources'] = client.get_resources(restApiId=info['identity'])['items']
-            for resource in info['resources']:
-                for method in resource.get('resourceMethods', {}):
-                    resource['resourceMethods'][method] = client.get_method(restApiId=info['identity'], resourceId=resource['id'], httpMethod=method)
-
-            info['deployment'] = client.get_deployments(restApiId=info['identity'])['items']
+            self.load_resources(client, info)
+            info['deployment'] = list(paginated(client.get_deployments, "items", restApiId=info['identity']))
         else:
             for key in ('stages', 'resources', 'deployment'):
                 info[key] = []
 
-        info['api_keys'] = client.get_api_keys()['items']
-        info['domains'] = client.get_domain_names()['items']
-        for domain in info['domains']:
-            domain['mappings'] = client.get_base_path_mappings(domainName=domain['domainName']).get('items', [])
+        inventory = self.inventory(info['location'])
+        info['api_keys'] = inventory.api_keys
+        info['domains'] = inventory.domains
 
-    def create_gateway(self, name, location, stages, resources, api_keys, domains):
+    def load_resources(self, client, info):
+        """Fill out the resources and their methods for the gateway"""
+        info['resources'] = list(paginated(client.get_resources, "items", restApiId=info['identity']))
+        for resource in info['resources']:
+            for method in resource.get('resourceMethods', {}):
+                resource['resourceMethods'][method] = client.get_method(restApiId=info['identity'], resourceId=resource['id'], httpMethod=method)
+
+    def create_gateway(self, name, location, stages, resources, api_keys, domains, apply_mode="fine_grained"):
         client = self.client(location)
 
         with self.catch_boto_400("Couldn't Make gateway", gateway=name):
             for _ in self.change("+", "gateway", gateway=name):
                 result = client.create_rest_api(name=name)
-                info = {"identity": result['id']}
+                inventory = self.inventory(location)
+                inventory.add_rest_api(result)
+                self.amazon.identifiers.set("rest_api", "{0}/{1}".format(location, name), result['id'])
+
+                info = {"identity": result['id'], 'name': name, 'location': location}
                 self.load_info(client, info)
-                self.modify_gateway(info, name, location, stages, resources, api_keys, domains)
+                inventory.infos[name] = info
+                self.modify_gateway(info, name, location, stages, resources, api_keys, domains, apply_mode=apply_mode)
 
         if self.dry_run:
-            info = {}
+            info = {'location': location}
             self.load_info(client, info)
-            self.modify_gateway(info, name, location, stages, resources, api_keys, domains)
+            self.modify_gateway(info, name, location, stages, resources, api_keys, domains, apply_mode=apply_mode)
 
-    def modify_gateway(self, gateway_info, name, location, stages, resources, api_keys, domains):
+    def modify_gateway(self, gateway_info, name, location, stages, resources, api_keys, domains, apply_mode="fine_grained"):
         client = self.client(location)
 
         current_domain_names = [domain['domainName'] for domain in gateway_info['domains']]
         missing = set(d.full_name for d in domains.values()) - set(current_domain_names)
 
+        if missing and not self.dry_run:
+            certificates = [d.certificate for d in domains.values() if d.full_name in missing]
+            secrets = [secret for certificate in certificates for secret in (certificate.body, certificate.key, certificate.chain)]
+            self.amazon.kms.decrypt_many([(secret.location, secret.kms_data_key) for secret in secrets if secret.kms is not NotSpecified])
+
         for domain in missing:
             with self.catch_boto_400("Couldn't Make domain", domain=domain):
                 for _ in self.change("+", "domain", domain=domain):
                     certificate = [d for d in domains.values() if d.full_name == domain][0].certificate
-                    client.create_domain_name(domainName=domain
+                    created = client.create_domain_name(domainName=domain
                         , certificateName = certificate.name
                         , certificateBody = certificate.body.resolve(self.amazon)
                         , certificateChain = certificate.chain.resolve(self.amazon)
                         , certificatePrivateKey = certificate.key.resolve(self.amazon)
                         )
+                    created.pop('ResponseMetadata', None)
+                    self.inventory(location).add_domain(created)
+
+        if apply_mode == "fine_grained":
+            self.modify_resources(client, gateway_info, location, name, resources)
+        else:
+            self.import_resources(client, gateway_info, location, name, resources, apply_mode)
 
-        self.modify_resources(client, gateway_info, location, name, resources)
         self.modify_stages(client, gateway_info, name, stages)
 
         self.modify_domains(client, gateway_info, name, domains)
@@ -95,7 +220,11 @@ class ApiGateway(AmazonMixin, object):
         wanted_by_path = dict((r.name, r) for r in resources)
         resources_by_path = dict((r['path'], r) for r in gateway_info['resources'])
 
-        for_removal = [key for key in list(set(current_resources) - set(wanted_resources)) if key != '/']
+        # Resources above the ones we want are made for them, and removing one would remove what's under it
+        parents = set('/'.join(path.split('/')[:index]) for path in wanted_resources for index in range(2, len(path.split('/'))))
+        for_removal = sorted(key for key in set(current_resources) - set(wanted_resources) - parents if key != '/')
+        # Removing a resource removes everything under it, so only remove the top ones
+        for_removal = [key for key in for_removal if not any(key.startswith("{0}/".format(other)) for other in for_removal)]
         for_addition = [key for key in list(set(wanted_resources) - set(current_resources)) if key != '/']
         for_modification = list(set(['/'] + [r for r in wanted_resources if r in current_resources] + list(for_addition)))
 
@@ -105,6 +234,12 @@ class ApiGateway(AmazonMixin, object):
                     resource_id = resources_by_path[path]['id']
                     client.delete_resource(restApiId=gateway_info['identity'], resourceId=resource_id)
 
+                    # Deleting a resource deletes everything under it as well
+                    removed = lambda p: p == path or p.startswith("{0}/".format(path))
+                    gateway_info['resources'][:] = [r for r in gateway_info['resources'] if not removed(r['path'])]
+                    for p in [p for p in resources_by_path if removed(p)]:
+                        del resources_by_path[p]
+
         for path in for_addition:
             with self.catch_boto_400("Couldn't add resource", gateway=name, resource=path):
                 for _ in self.change("+", "gateway resource", gateway=name, resource=path):
@@ -117,6 +252,9 @@ class ApiGateway(AmazonMixin, object):
                         upto.append(part)
                         if '/'.join(upto) not in resources_by_path:
                             info = client.create_resource(restApiId=gateway_info['identity'], parentId=parent_id, pathPart=part)
+                            info.pop('ResponseMetadata', None)
+                            info.setdefault('resourceMethods', {})
+                            gateway_info['resources'].append(info)
                             resources_by_path['/'.join(upto)] = info
                             parent_id = info['id']
                         else:
@@ -127,9 +265,63 @@ class ApiGateway(AmazonMixin, object):
             if path in wanted_by_path:
                 wanted_methods = dict(wanted_by_path[path].method_options)
 
-            current_methods = resources_by_path.get(path, {}).get('resourceMethods', {})
+            current_methods = resources_by_path.get(path, {}).setdefault('resourceMethods', {})
             self.modify_resource_methods(client, gateway_info, location, name, path, current_methods, wanted_methods, resources_by_path)
 
+    def import_resources(self, client, gateway_info, location, name, resources, mode):
+        """Apply all our resources with one put_rest_api of a swagger document"""
+        # Use the fine grained diff to show what the import is going to change
+        with self.planned() as planned:
+            self.modify_resources(client, gateway_info, location, name, resources)
+
+        if mode == "merge":
+            # Merging only adds and replaces, it never removes anything
+            planned = [(symbol, typ, kwargs) for symbol, typ, kwargs in planned if symbol != "-"]
+
+        if planned:
+            for symbol, typ, kwargs in planned:
+                self.print_change(symbol, typ, **kwargs)
+
+            document = json.dumps(self.swagger_document(name, location, resources), indent=2, sort_keys=True)
+            with self.catch_boto_400("Couldn't import gateway resources", "{0} swagger document".format(name), document, gateway=name, mode=mode):
+                for _ in self.change("M", "gateway swagger import", gateway=name, mode=mode):
+                    client.put_rest_api(restApiId=gateway_info['identity'], mode=mode, failOnWarnings=True, body=document.encode('utf-8'))
+
+                    # The import changes resources all over the place, so ask what they look like now
+                    self.load_resources(client, gateway_info)
+
+    def swagger_document(self, name, location, resources):
+        """Render our resources as a swagger document"""
+        paths = {}
+        need_api_key = False
+        for resource in resources:
+            path = resource.name if resource.name.startswith('/') else "/{0}".format(resource.name)
+            operations = paths.setdefault(path, {})
+            for method, options in resource.method_options:
+                operations[method.lower()] = options.swagger(method, location, self.accounts, self.environment)
+                need_api_key = need_api_key or options.method_request.require_api_key
+
+        document = {"swagger": "2.0", "info": {"title": name, "version": "1.0"}, "schemes": ["https"], "paths": paths}
+        if need_api_key:
+            document["securityDefinitions"] = {"api_key": {"type": "apiKey", "name": "x-api-key", "in": "header"}}
+        return document
+
+    @contextmanager
+    def planned(self):
+        """Yield a list of (symbol, typ, kwargs) for the changes asked for in this block, without printing, recording or making them"""
+        planning, planned = self.planning, []
+        self.planning = planned
+        try:
+            yield planned
+        finally:
+            self.planning = planning
+
+    def change(self, symbol, typ, **kwargs):
+        if self.planning is not None:
+            self.planning.append((symbol, typ, kwargs))
+            return iter(())
+        return AmazonMixin.change(self, symbol, typ, **kwargs)
+
     def modify_resource_methods(self, client, gateway_info, location, name, path, old_methods, new_methods, resources_by_path):
         for_removal = set(old_methods) - set(new_methods)
         for_addition = set(new_methods) - set(old_methods)
@@ -140,15 +332,18 @@ class ApiGateway(AmazonMixin, object):
                 for _ in self.change("-", "gateway resource method", gateway=name, resource=path, method=method):
                     resource_id = resources_by_path[path]['id']
                     client.delete_method(restApiId=gateway_info['identity'], resourceId=resource_id, httpMethod=method)
+                    del old_methods[method]
 
         for method in for_addition:
             with self.catch_boto_400("Couldn't add method", gateway=name, resource=path, method=method):
                 for _ in self.change("+", "gateway resource method", gateway=name, resource=path, method=method):
                     resource_id = resources_by_path[path]['id']
-                    client.put_method(restApiId=gateway_info['identity'], resourceId=resource_id, httpMethod=method
+                    created = client.put_method(restApiId=gateway_info['identity'], resourceId=resource_id, httpMethod=method
                         , apiKeyRequired=new_methods[method].method_request.require_api_key
                         , authorizationType = "none"
                         )
+                    created.pop('ResponseMetadata', None)
+                    old_methods[method] = created
 
         for method in for_modification:
             with self.catch_boto_400("Couldn't modify method", gateway=name, resource=path, method=method):
@@ -158,6 +353,7 @@ class ApiGateway(AmazonMixin, object):
                             resource_id = resources_by_path[path]['id']
                             operations = [{"op": "replace", "path": "/apiKeyRequired", "value": str(new_methods[method].method_request.require_api_key)}]
                             client.update_method(restApiId=gateway_info['identity'], resourceId=resource_id, httpMethod=method, patchOperations=operations)
+                            old_methods[method]['apiKeyRequired'] = new_methods[method].method_request.require_api_key
 
                 self.modify_resource_method_status_codes(client, gateway_info, name, path, method, old_methods.get(method, {}), new_methods[method], resources_by_path)
                 self.modify_resource_method_integration(client, gateway_info, location, name, path, method, old_methods.get(method, {}), new_methods[method], resources_by_path)
@@ -174,13 +370,16 @@ class ApiGateway(AmazonMixin, object):
             for _ in self.change("-", "gateway resource method response", gateway=name, resource=path, method=method, status_code=status_code):
                 resource_id = resources_by_path[path]['id']
                 client.delete_method_response(restApiId=gateway_info['identity'], resourceId=resource_id, httpMethod=method, statusCode=str(status_code))
+                del old_method['methodResponses'][status_code]
 
         for status_code in for_addition:
             for _ in self.change("+", "gateway resource method response", gateway=name, resource=path, method=method, status_code=status_code):
                 resource_id = resources_by_path[path]['id']
-                client.put_method_response(restApiId=gateway_info['identity'], resourceId=resource_id, httpMethod=method, statusCode=str(status_code)
+                created = client.put_method_response(restApiId=gateway_info['identity'], resourceId=resource_id, httpMethod=method, statusCode=str(status_code)
                     , responseParameters = {}
                     )
+                created.pop('ResponseMetadata', None)
+                old_method.setdefault('methodResponses', {})[status_code] = created
 
     def modify_resource_method_integration(self, client, gateway_info, location, name, path, method, old_method, new_method, resources_by_path):
         old_integration = old_method.get('methodIntegration', {})
@@ -196,10 +395,13 @@ class ApiGateway(AmazonMixin, object):
             symbol = "+" if not old_integration else 'M'
             for _ in self.change(symbol, "gateway resource method integration request", gateway=name, resource=path, method=method, type=new_kwargs['type'], changes=changes):
                 resource_id = resources_by_path[path]['id']
-                client.put_integration(restApiId=gateway_info['identity'], resourceId=resource_id, httpMethod=method
+                created = client.put_integration(restApiId=gateway_info['identity'], resourceId=resource_id, httpMethod=method
                     , integrationHttpMethod=method
                     , **new_kwargs
                     )
+                created.pop('ResponseMetadata', None)
+                created['integrationResponses'] = old_integration.get('integrationResponses', {})
+                old_method['methodIntegration'] = created
 
     def modify_resource_method_integration_response(self, client, gateway_info, name, path, method, old_method, new_method, resources_by_path):
         old_integration = old_method.get('methodIntegration', {}).get("integrationResponses", {})
@@ -213,13 +415,16 @@ class ApiGateway(AmazonMixin, object):
             for _ in self.change("-", "gateway resource integration response", gateway=name, resource=path, method=method, status_code=status_code):
                 resource_id = resources_by_path[path]['id']
                 client.delete_integration_response(restApiId=gateway_info['identity'], resourceId=resource_id, httpMethod=method, statusCode=str(status_code))
+                del old_integration[status_code]
 
         for status_code in for_addition:
             for _ in self.change("+", "gateway resource integration response", gateway=name, resource=path, method=method, status_code=status_code):
                 resource_id = resources_by_path[path]['id']
-                client.put_integration_response(restApiId=gateway_info['identity'], resourceId=resource_id, httpMethod=method, statusCode=str(status_code)
+                created = client.put_integration_response(restApiId=gateway_info['identity'], resourceId=resource_id, httpMethod=method, statusCode=str(status_code)
                     , responseTemplates = dict((m.content_type, m.template) for m in wanted_integration[status_code])
                     )
+                created.pop('ResponseMetadata', None)
+                old_method.setdefault('methodIntegration', {}).setdefault('integrationResponses', {})[status_code] = created
 
         for status_code in for_modification:
             old = old_integration[status_code]['responseTemplates']
@@ -247,6 +452,7 @@ class ApiGateway(AmazonMixin, object):
                     client.update_integration_response(restApiId=gateway_info['identity'], resourceId=resource_id, httpMethod=method, statusCode=str(status_code)
                         , patchOperations = operations
                         )
+                    old_integration[status_code]['responseTemplates'] = dict((m.content_type, m.template) for m in wanted_integration[status_code])
 
     def modify_stages(self, client, gateway_info, name, stages):
         current_stages = [stage['stageName'] for stage in gateway_info['stages']]
@@ -257,28 +463,27 @@ class ApiGateway(AmazonMixin, object):
             with self.catch_boto_400("Couldn't remove stage", gateway=name, stage=stage):
                 for _ in self.change("-", "gateway stage", gateway=name, stage=stage):
                     client.delete_stage(restApiId=gateway_info['identity'], stageName=stage)
+                    gateway_info['stages'][:] = [s for s in gateway_info['stages'] if s['stageName'] != stage]
 
-        if 'identity' in gateway_info:
-            deployments = client.get_deployments(restApiId=gateway_info['identity'])['items']
-            stages = client.get_stages(restApiId=gateway_info['identity'])['item']
-        else:
-            stages = []
-            deployments = []
-
-        stage_deployments = [stage['deploymentId'] for stage in stages]
-        for_removal = [deployment['id'] for deployment in deployments if deployment['id'] not in stage_deployments]
+        stage_deployments = [stage['deploymentId'] for stage in gateway_info['stages']]
+        for_removal = [deployment['id'] for deployment in gateway_info['deployment'] if deployment['id'] not in stage_deployments]
         for deployment in for_removal:
             with self.catch_boto_400("Couldn't remove deployment", gateway=name, deployment=deployment):
                 for _ in self.change("-", "gateway deployment", gateway=name, deployment=deployment):
                     client.delete_deployment(restApiId=gateway_info['identity'], deploymentId=deployment)
+                    gateway_info['deployment'][:] = [d for d in gateway_info['deployment'] if d['id'] != deployment]
 
         for stage in missing:
             with self.catch_boto_400("Couldn't add stage", gateway=name, stage=stage):
                 for _ in self.change("+", "gateway stage", gateway=name, stage=stage):
                     if gateway_info.get('deployment'):
-                        client.create_stage(restApiId=gateway_info['identity'], deploymentId=gateway_info['deployment'][0]['id'], stageName=stage)
+                        deployment_id = gateway_info['deployment'][0]['id']
+                        client.create_stage(restApiId=gateway_info['identity'], deploymentId=deployment_id, stageName=stage)
                     else:
-                        client.create_deployment(restApiId=gateway_info['identity'], stageName=stage)
+                        deployment = client.create_deployment(restApiId=gateway_info['identity'], stageName=stage)
+                        deployment_id = deployment['id']
+                        gateway_info['deployment'].append({"id": deployment_id})
+                    gateway_info['stages'].append({"stageName": stage, "deploymentId": deployment_id})
 
     def modify_api_keys(self, client, gateway_info, name, api_keys):
         current = [ak['name'] for ak in gateway_info['api_keys']]
@@ -289,9 +494,11 @@ class ApiGateway(AmazonMixin, object):
             with self.catch_boto_400("Couldn't add api keys", api_key=keyname):
                 for _ in self.change("+", "gateway api key", gateway=name, api_key=keyname):
                     api_key = [api_key for api_key in api_keys if api_key.name == keyname][0]
-                    client.create_api_key(name=keyname, enabled=True
+                    created = client.create_api_key(name=keyname, enabled=True
                         , stageKeys=[{'restApiId': gateway_info['identity'], 'stageName': stage} for stage in api_key.stages]
                         )
+                    created.pop('ResponseMetadata', None)
+                    gateway_info['api_keys'].append(created)
 
         for_modification = [key for key in current if key in wanted]
         for keyname in for_modification:
@@ -317,13 +524,14 @@ class ApiGateway(AmazonMixin, object):
                 if operations:
                     for _ in self.change("M", "gateway api key", gateway=name, api_key=keyname, changes=changes):
                         client.update_api_key(apiKey=old_api_key['id'], patchOperations=operations)
+                        old_api_key['stageKeys'] = new_stage_keys
 
     def modify_domains(self, client, gateway_info, name, domains):
         for domain in domains.values():
             found = []
-            matches = [d for d in gateway_info['domains'] if d['domainName'] == domain.full_name]
-            if matches:
-                for mapping in matches[0]['mappings']:
+            current_domain = self.inventory(gateway_info['location']).domain(domain.full_name)
+            if current_domain:
+                for mapping in current_domain['mappings']:
                     if ('identity' in gateway_info and mapping['restApiId'] == gateway_info['identity']) or mapping['basePath'] == domain.base_path:
                         found.append(mapping)
 
@@ -346,11 +554,14 @@ class ApiGateway(AmazonMixin, object):
                             client.update_base_path_mapping(domainName=domain.full_name, basePath=mapping['basePath']
                                 , patchOperations = [{"op": "remove", "path": "/"}]
                                 )
+                            current_domain['mappings'][:] = [m for m in current_domain['mappings'] if m['basePath'] != mapping['basePath']]
 
                 with self.catch_boto_400("Couldn't add domain name bindings", gateway=name):
                     for mapping in for_addition:
                         for _ in self.change("+", "domain name gateway association", gateway=name, base_path=mapping['basePath'], stage=mapping['stage']):
                             client.create_base_path_mapping(domainName=domain.full_name, basePath=mapping['basePath'], restApiId=gateway_info['identity'], stage=mapping['stage'])
+                            if current_domain:
+                                current_domain['mappings'].append(dict(mapping, restApiId=gateway_info['identity']))
 
                 with self.catch_boto_400("Couldn't modify domain name bindings", gateway=name):
                     for old, new in for_modification:
@@ -365,12 +576,15 @@ class ApiGateway(AmazonMixin, object):
                                 operations.append({"op": "replace", "path": "/stage", "value": new['restApiId']})
 
                             client.update_base_path_mapping(domainName=domain.full_name, basePath=wanted['basePath'], patchOperations = operations)
+                            for mapping in current_domain['mappings']:
+                                if mapping['basePath'] == new['basePath']:
+                                    mapping.update(new)
 
     def deploy_stage(self, gateway_info, location, stage, description):
         client = self.client(location)
         for _ in self.change("D", "Deployment", gateway=gateway_info['name'], stage=stage):
             log.info("Deploying stage {0} for gateway {1}".format(stage, gateway_info['name']))
-            client.create_deployment(restApiId=gateway_info['identity'], stageName=stage, description=description)
+            deployment = client.create_deployment(restApiId=gateway_info['identity'], stageName=stage, description=description)
             print("https://{0}.execute-api.{1}.amazonaws.com/{2}".format(gateway_info['identity'], location, stage))
 
         previous_deployments = [s['deploymentId'] for s in gateway_info['stages'] if s['stageName'] == stage]
@@ -378,8 +592,16 @@ class ApiGateway(AmazonMixin, object):
             for previous_deployment in previous_deployments:
                 for _ in self.change("-", "deployment", gateway=gateway_info['name'], deployment=previous_deployment):
                     client.delete_deployment(restApiId=gateway_info['identity'], deploymentId=previous_deployment)
+                    gateway_info['deployment'][:] = [d for d in gateway_info['deployment'] if d['id'] != previous_deployment]
+
+        if not self.dry_run:
+            gateway_info['deployment'].append({"id": deployment['id']})
+            for info in gateway_info['stages']:
+                if info['stageName'] == stage:
+                    info['deploymentId'] = deployment['id']
 
     def cname_for(self, gateway_location, record):
-        with self.ignore_missing():
-            return self.client(gateway_location).get_domain_name(domainName=record)['distributionDomainName']
+        domain = self.inventory(gateway_location).domain(record)
+        if domain and domain.get('distributionDomainName'):
+            return domain['distributionDomainName']
         raise AwsSyncrError("Please do a sync first!")
@@ -1,13 +1,12 @@
 from aws_syncr.errors import BadAmazon, BadCredentials
 
-from botocore.exceptions import ClientError, NoCredentialsError
-
 from contextlib import contextmanager
 
 class AmazonMixin:
     @contextmanager
     def catch_boto_400(self, message, heading=None, document=None, **info):
         """Turn a BotoServerError 400 into a BadAmazon"""
+        from botocore.exceptions import ClientError
         try:
             yield
         except ClientError as error:
@@ -25,6 +24,7 @@ class AmazonMixin:
 
     @contextmanager
     def ignore_missing(self):
+        from botocore.exceptions import ClientError
         try:
             yield
         except ClientError as error:
@@ -35,12 +35,13 @@ class AmazonMixin:
 
     @contextmanager
     def catch_invalid_credentials(self):
+        from botocore.exceptions import ClientError, NoCredentialsError
         try:
             yield
         except NoCredentialsError:
             raise BadCredentials("Failed to find valid credentials")
         except ClientError as error:
-            if error.response["ResponseMetadata"]["HTTPStatsuCode"] == 403:
+            if error.response["ResponseMetadata"]["HTTPStatusCode"] == 403:
                 raise BadCredentials("Failed to find valid credentials", error=error.message)
             else:
                 raise
@@ -65,4 +66,7 @@ class AmazonMixin:
                 raise
             else:
                 self.amazon.changes = True
+                self.amazon.record_change(symbol, typ, applied=True, **kwargs)
+        else:
+            self.amazon.record_change(symbol, typ, applied=False, **kwargs)
 
@@ -0,0 +1,183 @@
+"""
+Assume a role for an environment and remember the credentials until they expire.
+
+Credentials are kept under ``~/.aws_syncr/credentials`` (or wherever
+``AWS_SYNCR_CREDENTIALS_CACHE`` says), one file per environment, encrypted
+with a key that is made the first time and only readable by the current
+user. That way the next run, and any workers running at the same time, can
+use them without another AssumeRole.
+"""
+
+from aws_syncr.errors import BadCredentials
+
+from Crypto.Util import Counter
+from Crypto.Cipher import AES
+
+from botocore.exceptions import ClientError
+import calendar
+import tempfile
+import hashlib
+import logging
+import base64
+import boto3
+import hmac
+import json
+import time
+import os
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+log = logging.getLogger("aws_syncr.amazon.credentials")
+
+# Don't use credentials that expire within this many seconds
+expiry_margin = 300
+
+def role_arn_for(account_id, role):
+    """Turn ``role/path/name`` (or an arn) into the arn of a role in this account"""
+    if role.startswith("arn:"):
+        return role
+    if not role.startswith("role/"):
+        role = "role/{0}".format(role)
+    return "arn:aws:iam::{0}:{1}".format(account_id, role)
+
+class CredentialsCache(object):
+    def __init__(self, location=None):
+        self.location = location or os.path.expanduser(os.environ.get("AWS_SYNCR_CREDENTIALS_CACHE", "~/.aws_syncr/credentials"))
+
+    def path_for(self, environment):
+        return os.path.join(self.location, "{0}.json".format(environment))
+
+    @property
+    def key(self):
+        """64 random bytes that encrypt and sign the cache, made the first time we need them"""
+        key_location = os.path.join(self.location, "key")
+        key = self.read_key(key_location)
+        if key is None:
+            self.ensure_folder()
+            with tempfile.NamedTemporaryFile("wb", dir=self.location, delete=False) as fle:
+                fle.write(os.urandom(64))
+
+            try:
+                if os.path.exists(key_location) or not hasattr(os, "link"):
+                    # Replace a key that isn't 64 bytes
+                    os.rename(fle.name, key_location)
+                else:
+                    # Link rather than rename so we don't replace a key someone else just made
+                    os.link(fle.name, key_location)
+            except OSError:
+                # Someone else made it at the same time
+                pass
+            finally:
+                if os.path.exists(fle.name):
+                    os.remove(fle.name)
+
+            key = self.read_key(key_location)
+            if key is None:
+                raise IOError("Couldn't make a key for the credentials cache at {0}".format(key_location))
+
+        return key
+
+    def read_key(self, key_location):
+        """Return the key, or None if there isn't one or it isn't 64 bytes"""
+        if os.path.exists(key_location):
+            with open(key_location, "rb") as fle:
+                key = fle.read()
+            if len(key) == 64:
+                return key
+
+    def ensure_folder(self):
+        if not os.path.exists(self.location):
+            os.makedirs(self.location, 0o700)
+
+    def encrypt(self, data):
+        key = self.key
+        nonce = os.urandom(8)
+        encrypted = AES.new(key[:32], AES.MODE_CTR, counter=Counter.new(64, prefix=nonce)).encrypt(json.dumps(data).encode('utf-8'))
+        signature = hmac.new(key[32:], nonce + encrypted, hashlib.sha256).hexdigest()
+        return {"nonce": base64.b64encode(nonce).decode('utf-8'), "data": base64.b64encode(encrypted).decode('utf-8'), "signature": signature}
+
+    def decrypt(self, stored):
+        key = self.key
+        nonce = base64.b64decode(stored["nonce"])
+        encrypted = base64.b64decode(stored["data"])
+        signature = hmac.new(key[32:], nonce + encrypted, hashlib.sha256).hexdigest()
+        if not hmac.compare_digest(signature.encode('utf-8'), stored["signature"].encode('utf-8')):
+            raise ValueError("Signature doesn't match")
+        return json.loads(AES.new(key[:32], AES.MODE_CTR, counter=Counter.new(64, prefix=nonce)).decrypt(encrypted).decode('utf-8'))
+
+    def get(self, environment, role_arn):
+        """Return cached credentials for this role that won't expire soon, or None"""
+        location = self.path_for(environment)
+        if not os.path.exists(location):
+            return None
+
+        try:
+            with open(location) as fle:
+                credentials = self.decrypt(json.load(fle))
+        except (ValueError, KeyError, TypeError, IOError, OSError) as error:
+            log.warning("Ignoring unreadable cached credentials\tlocation=%s\terror=%s", location, error)
+            return None
+
+        if credentials.get("RoleArn") != role_arn or credentials.get("Expiration", 0) < time.time() + expiry_margin:
+            return None
+        return credentials
+
+    def set(self, environment, credentials):
+        self.ensure_folder()
+        try:
+            encrypted = self.encrypt(credentials)
+            with tempfile.NamedTemporaryFile("w", dir=self.location, delete=False) as fle:
+                json.dump(encrypted, fle)
+            os.rename(fle.name, self.path_for(environment))
+        except (IOError, OSError) as error:
+            log.warning("Failed to save credentials\tenvironment=%s\terror=%s", environment, error)
+
+    def lock(self, environment):
+        """Return an open lock file for this environment, so only one worker assumes the role at a time"""
+        self.ensure_folder()
+        fle = open("{0}.lock".format(self.path_for(environment)), "w")
+        if fcntl:
+            fcntl.flock(fle, fcntl.LOCK_EX)
+        return fle
+
+    def assumed(self, environment, role_arn, session):
+        """Return credentials for role_arn from the cache, or by assuming it with this session"""
+        credentials = self.get(environment, role_arn)
+        if credentials:
+            return credentials
+
+        with self.lock(environment):
+            # Another worker may have assumed the role while we waited
+            credentials = self.get(environment, role_arn)
+            if credentials:
+                return credentials
+
+            log.info("Assuming role\trole=%s", role_arn)
+            try:
+                result = session.client("sts").assume_role(RoleArn=role_arn, RoleSessionName="aws_syncr-{0}".format(environment))
+            except ClientError as error:
+                raise BadCredentials("Couldn't assume role", role=role_arn, error=error.response["Error"]["Message"])
+
+            credentials = dict(
+                  RoleArn = role_arn
+                , AccessKeyId = result["Credentials"]["AccessKeyId"]
+                , SecretAccessKey = result["Credentials"]["SecretAccessKey"]
+                , SessionToken = result["Credentials"]["SessionToken"]
+                , Expiration = calendar.timegm(result["Credentials"]["Expiration"].utctimetuple())
+                , AccountId = result["AssumedRoleUser"]["Arn"].split(":", 5)[4]
+                )
+            self.set(environment, credentials)
+            return credentials
+
+def assumed_role_session(environment, account_id, role, cache=None):
+    """Return a boto3 session and account id for the role we assume in this environment"""
+    credentials = (cache or CredentialsCache()).assumed(environment, role_arn_for(account_id, role), boto3.session.Session())
+    session = boto3.session.Session(
+          aws_access_key_id = credentials["AccessKeyId"]
+        , aws_secret_access_key = credentials["SecretAccessKey"]
+        , aws_session_token = credentials["SessionToken"]
+        )
+    return session, credentials["AccountId"]
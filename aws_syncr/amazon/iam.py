@@ -18,35 +18,69 @@ class Iam(AmazonMixin, object):
         self.account_id = accounts[environment]
         self.environment = environment
 
+        self.client = self.amazon.session.client('iam')
         self.resource = self.amazon.session.resource('iam')
 
+    def roles(self):
+        """All the roles in the account with their trust documents, except those amazon made for its own services"""
+        roles = []
+        for page in self.client.get_paginator("list_roles").paginate():
+            for role in page["Roles"]:
+                if not role["Path"].startswith(("/aws-service-role/", "/aws-reserved/")):
+                    roles.append(role)
+        return roles
+
+    def role_names(self):
+        """The names of all the roles in the account, except those amazon made for its own services"""
+        return set(role["RoleName"] for role in self.roles())
+
+    def instance_profile_roles(self):
+        """Return a dictionary of instance profile name to the names of the roles in it"""
+        profiles = {}
+        for page in self.client.get_paginator("list_instance_profiles").paginate():
+            for profile in page["InstanceProfiles"]:
+                profiles[profile["InstanceProfileName"]] = [role["RoleName"] for role in profile["Roles"]]
+        return profiles
+
     def role_info(self, role_name):
-        role = self.resource.Role(role_name.split('/')[-1])
+        """Return the role with its inline policies as a dictionary, or None if it doesn't exist"""
+        role_name = role_name.split('/')[-1]
         with self.ignore_missing():
-            role.load()
-            return role
+            info = self.client.get_role(RoleName=role_name)['Role']
+            info['RolePolicies'] = self.role_policies(role_name)
+            return info
+
+    def role_policies(self, role_name):
+        """Return a dictionary of policy name to document for the inline policies on a role"""
+        policies = {}
+        with self.catch_boto_400("Couldn't get policies for a role", role=role_name):
+            for page in self.client.get_paginator("list_role_policies").paginate(RoleName=role_name):
+                for policy_name in page['PolicyNames']:
+                    policies[policy_name] = self.client.get_role_policy(RoleName=role_name, PolicyName=policy_name)['PolicyDocument']
+        return policies
 
     def create_role(self, name, trust_document, policies):
+        role_name = name.split('/')[-1]
         with self.catch_boto_400("Couldn't Make role", "{0} assume document".format(name), trust_document, role=name):
             for _ in self.change("+", "role", role=name, document=trust_document):
-                self.resource.create_role(Path='/'.join(name.split('/')[:-1]), RoleName=name.split('/')[-1], AssumeRolePolicyDocument=trust_document)
+                self.client.create_role(Path='/'.join(name.split('/')[:-1]), RoleName=role_name, AssumeRolePolicyDocument=trust_document)
 
         if policies:
             for policy_name, document in policies.items():
                 if document:
                     with self.catch_boto_400("Couldn't add policy", "{0} - {1} Permission document".format(name, policy_name), document, role=name, policy_name=policy_name):
                         for _ in self.change("+", "role_policy", role=name, policy=policy_name, document=document):
-                            self.resource.RolePolicy(name, policy_name).put(PolicyDocument=document)
+                            self.client.put_role_policy(RoleName=role_name, PolicyName=policy_name, PolicyDocument=document)
 
     def modify_role(self, role_info, name, trust_document, policies):
-        changes = list(Differ.compare_two_documents(json.dumps(role_info.assume_role_policy_document), trust_document))
+        role_name = name.split('/')[-1]
+        changes = list(Differ.compare_two_documents(json.dumps(role_info['AssumeRolePolicyDocument']), trust_document))
         if changes:
             with self.catch_boto_400("Couldn't modify trust document", "{0} assume document".format(name), trust_document, role=name):
                 for _ in self.change("M", "trust_document", role=name, changes=changes):
-                    self.resource.AssumeRolePolicy(name.split('/')[-1]).update(PolicyDocument=trust_document)
+                    self.client.update_assume_role_policy(RoleName=role_name, PolicyDocument=trust_document)
 
-        with self.catch_boto_400("Couldn't get policies for a role", role=name):
-            current_policies = dict((policy.name, policy) for policy in role_info.policies.all())
+        current_policies = role_info['RolePolicies']
         unknown = [key for key in current_policies if key not in policies]
 
         if unknown:
@@ -54,20 +88,20 @@ class Iam(AmazonMixin, object):
             for policy in unknown:
                 with self.catch_boto_400("Couldn't delete a policy from a role", policy=policy, role=name):
                     for _ in self.change("-", "role_policy", role=name, policy=policy):
-                        current_policies[policy].delete()
+                        self.client.delete_role_policy(RoleName=role_name, PolicyName=policy)
 
         for policy, document in policies.items():
             if not document:
                 if policy in current_policies:
                     with self.catch_boto_400("Couldn't delete a policy from a role", policy=policy, role=name):
                         for _ in self.change("-", "policy", role=name, policy=policy):
-                            current_policies[policy].delete()
+                            self.client.delete_role_policy(RoleName=role_name, PolicyName=policy)
             else:
                 needed = False
                 changes = None
 
                 if policy in current_policies:
-                    changes = list(Differ.compare_two_documents(json.dumps(current_policies.get(policy).policy_document), document))
+                    changes = list(Differ.compare_two_documents(json.dumps(current_policies[policy]), document))
                     if changes:
                         log.info("Overriding existing policy\trole=%s\tpolicy=%s", name, policy)
                         needed = True
@@ -79,34 +113,35 @@ class Iam(AmazonMixin, object):
                     with self.catch_boto_400("Couldn't add policy document", "{0} - {1} policy document".format(name, policy), document, role=name, policy=policy):
                         symbol = "M" if changes else "+"
                         for _ in self.change(symbol, "role_policy", role=name, policy=policy, changes=changes, document=document):
-                            current_policies[policy].put(PolicyDocument=document)
+                            self.client.put_role_policy(RoleName=role_name, PolicyName=policy, PolicyDocument=document)
 
     def make_instance_profile(self, name):
         role_name = name.split('/')[-1]
         existing_roles_in_profile = None
         with self.ignore_missing():
-            existing_roles_in_profile = self.resource.InstanceProfile(role_name).roles
+            profile = self.client.get_instance_profile(InstanceProfileName=role_name)['InstanceProfile']
+            existing_roles_in_profile = [role['RoleName'] for role in profile['Roles']]
 
         if existing_roles_in_profile is None:
-            try:
-                with self.catch_boto_400("Couldn't create instance profile", instance_profile=name):
-                    for _ in self.change("+", "instance_profile", profile=name):
-                        self.resource.InstanceProfile(role_name).add_role(RoleName=role_name)
-            except ClientError as error:
-                if error.response["ResponseMetadata"]["HTTPStatusCode"] == 409:
-                    # I'd rather ignore this conflict, than list all the instance_profiles
-                    # Basically, the instance exists but isn't associated with the role
-                    pass
-                else:
-                    raise
-
-        if existing_roles_in_profile and any(rl.name != role_name for rl in existing_roles_in_profile):
-            for role in [rl for rl in existing_roles_in_profile if rl.name != role_name]:
+            with self.catch_boto_400("Couldn't create instance profile", instance_profile=name):
+                for _ in self.change("+", "instance_profile", profile=name):
+                    try:
+                        self.client.create_instance_profile(InstanceProfileName=role_name)
+                    except ClientError as error:
+                        if error.response["ResponseMetadata"]["HTTPStatusCode"] == 409:
+                            # I'd rather ignore this conflict, than list all the instance_profiles
+                            # Basically, the instance exists but isn't associated with the role
+                            pass
+                        else:
+                            raise
+
+        if existing_roles_in_profile and any(rl != role_name for rl in existing_roles_in_profile):
+            for role in [rl for rl in existing_roles_in_profile if rl != role_name]:
                 with self.catch_boto_400("Couldn't remove role from an instance profile", profile=role_name, role=role):
                     for _ in self.change("-", "instance_profile_role", profile=role_name, role=role):
-                        self.resource.InstanceProfile(role_name).remove_role(RoleName=role)
+                        self.client.remove_role_from_instance_profile(InstanceProfileName=role_name, RoleName=role)
 
-        if not existing_roles_in_profile or not any(rl.name == role_name for rl in existing_roles_in_profile):
+        if not existing_roles_in_profile or role_name not in existing_roles_in_profile:
             with self.catch_boto_400("Couldn't add role to an instance profile", role=name, instance_profile=role_name):
                 for _ in self.change("+", "instance_profile_role", profile=role_name, role=role_name):
-                    self.resource.InstanceProfile(role_name).add_role(RoleName=role_name)
+                    self.client.add_role_to_instance_profile(InstanceProfileName=role_name, RoleName=role_name)
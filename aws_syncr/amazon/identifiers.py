@@ -0,0 +1,117 @@
+"""
+Remember identifiers that can never change once amazon has made them.
+
+For example the region of a bucket, the id of a hosted zone or a rest api and
+the account behind some credentials. These are kept on disk per environment so
+the next run doesn't need to look them up again.
+
+A cached identifier may still point at something that was deleted and made
+again, so ``validated`` will look it up again and retry once if using it
+results in amazon saying it can't be found.
+"""
+
+import threading
+import tempfile
+import logging
+import json
+import os
+
+log = logging.getLogger("aws_syncr.amazon.identifiers")
+
+not_found_codes = ("404", "NotFoundException", "NoSuchBucket", "NoSuchHostedZone", "NotFound", "PermanentRedirect", "AuthorizationHeaderMalformed")
+
+def is_not_found(error):
+    """Say whether this ClientError means our identifier is stale"""
+    from botocore.exceptions import ClientError
+    if not isinstance(error, ClientError):
+        return False
+    if error.response.get("ResponseMetadata", {}).get("HTTPStatusCode") in (301, 404):
+        return True
+    return error.response.get("Error", {}).get("Code") in not_found_codes
+
+class IdentifierCache(object):
+    def __init__(self, environment, location=None, persist=True):
+        self.persist = persist
+        self.environment = environment
+        self.location = location or os.path.expanduser(os.environ.get("AWS_SYNCR_IDENTIFIER_CACHE", "~/.aws_syncr/identifiers.json"))
+        self._data = None
+        self.lock = threading.RLock()
+
+    @property
+    def data(self):
+        with self.lock:
+            return self.load()
+
+    def load(self):
+        if self._data is None:
+            self._data = {}
+            if self.persist and os.path.exists(self.location):
+                try:
+                    with open(self.location) as fle:
+                        self._data = json.load(fle)
+                except (ValueError, IOError, OSError) as error:
+                    log.warning("Failed to read identifier cache\tlocation=%s\terror=%s", self.location, error)
+        return self._data
+
+    def reload(self):
+        """Forget what we have in memory, so it's read from disk again when next needed"""
+        with self.lock:
+            self._data = None
+
+    def identifiers(self, kind):
+        return self.data.setdefault(self.environment, {}).setdefault(kind, {})
+
+    def get(self, kind, key):
+        return self.identifiers(kind).get(key)
+
+    def set(self, kind, key, value):
+        with self.lock:
+            if self.identifiers(kind).get(key) != value:
+                self.identifiers(kind)[key] = value
+                self.save()
+
+    def forget(self, kind, key):
+        with self.lock:
+            if key in self.identifiers(kind):
+                del self.identifiers(kind)[key]
+                self.save()
+
+    def lookup(self, kind, key, find):
+        """Return the cached identifier or find and remember it"""
+        value = self.get(kind, key)
+        if value is None:
+            value = find()
+            if value is not None:
+                self.set(kind, key, value)
+        return value
+
+    def validated(self, kind, key, find, use):
+        """Return use(identifier), looking up the identifier again once if it appears to be stale"""
+        from botocore.exceptions import ClientError
+        cached = self.get(kind, key) is not None
+        value = self.lookup(kind, key, find)
+        try:
+            return use(value)
+        except ClientError as error:
+            if not cached or not is_not_found(error):
+                raise
+
+        log.info("Cached identifier is stale, finding it again\tkind=%s\tkey=%s", kind, key)
+        self.forget(kind, key)
+        return use(self.lookup(kind, key, find))
+
+    def save(self):
+        """Write the cache to disk, replacing it in one go"""
+        if not self.persist:
+            return
+
+        directory = os.path.dirname(self.location)
+        with self.lock:
+            try:
+                if not os.path.exists(directory):
+                    os.makedirs(directory)
+                with tempfile.NamedTemporaryFile("w", dir=directory, delete=False) as fle:
+                    json.dump(self.data, fle, indent=2, sort_keys=True)
+                os.rename(fle.name, self.location)
+            except (IOError, OSError) as error:
+                log.warning("Failed to save identifier cache\tlocation=%s\terror=%s", self.location, error)
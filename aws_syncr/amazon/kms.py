@@ -1,11 +1,24 @@
 from aws_syncr.amazon.common import AmazonMixin
 from aws_syncr.differ import Differ
 
+from multiprocessing.pool import ThreadPool
+import threading
+import hashlib
 import logging
+import weakref
+import atexit
 import base64
 
 log = logging.getLogger("aws_syncr.amazon.kms")
 
+# Every Kms we've made, so we can forget their data keys when we exit
+instances = weakref.WeakSet()
+
+@atexit.register
+def forget_all_data_keys():
+    for kms in list(instances):
+        kms.forget_data_keys()
+
 class Kms(AmazonMixin, object):
     def __init__(self, amazon, environment, accounts, dry_run):
         self.amazon = amazon
@@ -17,13 +30,73 @@ class Kms(AmazonMixin, object):
 
         self.clients = {}
 
+        # Plaintext data keys we have decrypted, only ever kept in memory
+        self.data_keys = {}
+        self.data_keys_lock = threading.Lock()
+        instances.add(self)
+
+    def forget_discovered(self):
+        self.forget_data_keys()
+
     def get_client(self, location):
         if location not in self.clients:
             self.clients[location] = self.amazon.session.client('kms', location)
         return self.clients[location]
 
+    def alias_names(self, location):
+        """The names of the aliases in this region, except those for amazon's own keys"""
+        names = set()
+        for page in self.get_client(location).get_paginator("list_aliases").paginate():
+            for alias in page["Aliases"]:
+                if not alias["AliasName"].startswith("alias/aws/"):
+                    names.add(alias["AliasName"][len("alias/"):])
+        return names
+
+    def data_key_address(self, location, secret):
+        return (location, hashlib.sha256(secret.encode('utf-8') if not isinstance(secret, bytes) else secret).hexdigest())
+
     def decrypt(self, location, secret):
-        return self.get_client(location).decrypt(CiphertextBlob=base64.b64decode(secret))['Plaintext']
+        """Decrypt a data key, only asking kms the first time we see it"""
+        address = self.data_key_address(location, secret)
+        with self.data_keys_lock:
+            plaintext = self.data_keys.get(address)
+
+        if plaintext is None:
+            plaintext = bytearray(self.get_client(location).decrypt(CiphertextBlob=base64.b64decode(secret))['Plaintext'])
+            with self.data_keys_lock:
+                self.data_keys[address] = plaintext
+
+        return bytes(plaintext)
+
+    def decrypt_many(self, encrypted, concurrency=10):
+        """Decrypt the distinct data keys in a list of (location, secret) at the same time"""
+        wanted = {}
+        for location, secret in encrypted:
+            address = self.data_key_address(location, secret)
+            if address not in self.data_keys:
+                wanted[address] = (location, secret)
+
+        if not wanted:
+            return
+
+        # Make the clients here because sessions aren't thread safe
+        for location, _ in wanted.values():
+            self.get_client(location)
+
+        log.info("Decrypting %s data keys", len(wanted))
+        pool = ThreadPool(min(concurrency, len(wanted)))
+        try:
+            pool.map(lambda args: self.decrypt(*args), wanted.values())
+        finally:
+            pool.close()
+            pool.join()
+
+    def forget_data_keys(self):
+        """Overwrite and forget the plaintext data keys we have"""
+        with self.data_keys_lock:
+            for plaintext in self.data_keys.values():
+                plaintext[:] = b"\x00" * len(plaintext)
+            self.data_keys.clear()
 
     def generate_data_key(self, location, key_id):
         return self.get_client(location).generate_data_key(KeyId=key_id, KeySpec="AES_256")
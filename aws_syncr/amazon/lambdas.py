@@ -1,6 +1,7 @@
 from aws_syncr.amazon.common import AmazonMixin
 from aws_syncr.differ import Differ
 
+from input_algorithms.spec_base import NotSpecified
 from contextlib import contextmanager
 import logging
 import base64
@@ -18,14 +19,44 @@ class Lambdas(AmazonMixin, object):
         self.account_id = accounts[environment]
         self.environment = environment
 
+        self.clients = {}
+        self.inventories = {}
+
+    def client(self, location):
+        if location not in self.clients:
+            self.clients[location] = self.amazon.session.client('lambda', location)
+        return self.clients[location]
+
+    def forget_discovered(self):
+        self.inventories = {}
+
+    def inventory(self, location):
+        """Dictionary of name to configuration for all the functions in this region"""
+        if location not in self.inventories:
+            log.info("Finding functions\tregion=%s", location)
+            functions = {}
+            for page in self.client(location).get_paginator("list_functions").paginate():
+                for configuration in page.get("Functions", []):
+                    functions[configuration["FunctionName"]] = configuration
+            self.inventories[location] = functions
+        return self.inventories[location]
+
     def function_info(self, function_name, location):
-        with self.ignore_missing():
-            return self.amazon.session.client('lambda', location).get_function(FunctionName=function_name)
+        """Return the configuration of this function, or None if it doesn't exist"""
+        inventory = self.inventory(location)
+        if function_name not in inventory:
+            with self.ignore_missing():
+                inventory[function_name] = self.client(location).get_function_configuration(FunctionName=function_name)
+        return inventory.get(function_name)
 
     @contextmanager
-    def code_options(self, code):
+    def code_options(self, code, packaged=None):
+        """Yield the Code options for this code, using the zipfile at ``packaged`` if we already made one"""
         options = {}
-        if code.s3_address:
+        if packaged:
+            with open(packaged, 'rb') as fle:
+                yield {"ZipFile": fle.read()}
+        elif code.s3_address:
             options["Key"] = code.key
             options["S3Bucket"] = code.bucket
             if code.version is not NotSpecified:
@@ -37,7 +68,7 @@ class Lambdas(AmazonMixin, object):
                     yield {"ZipFile": open(location, 'rb').read()}
 
     def create_function(self, name, description, location, runtime, role, handler, timeout, memory_size, code):
-        client = self.amazon.session.client('lambda', location)
+        client = self.client(location)
         with self.catch_boto_400("Couldn't Make function", function=name):
             for _ in self.change("+", "function", function=name):
                 kwargs = dict(
@@ -47,17 +78,17 @@ class Lambdas(AmazonMixin, object):
 
                 with self.code_options(code) as options:
                     kwargs["Code"] = options
-                    client.create_function(**kwargs)
+                    self.inventory(location)[name] = client.create_function(**kwargs)
 
     def modify_function(self, function_info, name, description, location, runtime, role, handler, timeout, memory_size, code):
-        client = self.amazon.session.client('lambda', location)
+        client = self.client(location)
 
         wanted = dict(
               FunctionName=name, Role=role, Handler=handler
             , Description=description, Timeout=timeout, MemorySize=memory_size
             )
 
-        current = dict((key, function_info["Configuration"][key]) for key in (
+        current = dict((key, function_info[key]) for key in (
               "FunctionName", "Role", "Handler", "Description", "Timeout", "MemorySize"
             )
         )
@@ -66,23 +97,31 @@ class Lambdas(AmazonMixin, object):
         if changes:
             with self.catch_boto_400("Couldn't modify function", function=name):
                 for _ in self.change("M", "function", changes=changes, function=name):
-                    client.update_function_configuration(**wanted)
+                    self.inventory(location)[name] = client.update_function_configuration(**wanted)
 
-    def deploy_function(self, name, code, location):
-        client = self.amazon.session.client('lambda', location)
-        with self.code_options(code) as options:
+    def deploy_function(self, name, code, location, packaged=None):
+        client = self.client(location)
+        with self.code_options(code, packaged) as options:
             for _ in self.change("D", "function", function=name):
                 with self.catch_boto_400("Couldn't deploy function", function=name):
                     return client.update_function_code(FunctionName=name, **options)
 
-    def test_function(self, name, event, location):
-        client = self.amazon.session.client('lambda', location)
+    def invoke_function(self, name, event, location):
+        """Invoke this function and return (response, the end of its log or None)"""
+        client = self.client(location)
         log.info("Invoking function %s", name)
         if not isinstance(event, six.string_types):
             event = json.dumps(event)
         res = client.invoke(FunctionName=name, InvocationType="RequestResponse", Payload=event, LogType="Tail")
         res['Payload'] = json.loads(res['Payload'].read().decode('utf-8'))
+        logs = None
         if 'LogResult' in res:
-            print(base64.b64decode(res['LogResult']).decode('utf-8'))
+            logs = base64.b64decode(res['LogResult']).decode('utf-8')
             del res['LogResult']
+        return res, logs
+
+    def test_function(self, name, event, location):
+        res, logs = self.invoke_function(name, event, location)
+        if logs is not None:
+            print(logs)
         return res
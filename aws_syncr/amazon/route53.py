@@ -19,12 +19,31 @@ class Route53(AmazonMixin, object):
 
         self.client = self.amazon.session.client('route53')
 
-    def route_info(self, route_name, zone):
+    def find_zone_id(self, zone):
+        # Zones are listed in order starting at this name, so the first may be a different zone
         zones = self.client.list_hosted_zones_by_name(DNSName=zone)
-        if not zones.get("HostedZones"):
+        if not zones.get("HostedZones") or zones['HostedZones'][0]['Name'].rstrip('.') != zone.rstrip('.'):
             raise UnknownZone(zone=zone)
+        return zones['HostedZones'][0]['Id']
+
+    def zone_id(self, zone):
+        return self.amazon.identifiers.lookup("hosted_zone", zone, lambda: self.find_zone_id(zone))
+
+    def cname_records(self, zone):
+        """The names of all the CNAME records in this zone"""
+        names = set()
+        for page in self.client.get_paginator("list_resource_record_sets").paginate(HostedZoneId=self.zone_id(zone)):
+            for record in page["ResourceRecordSets"]:
+                if record["Type"] == "CNAME":
+                    names.add(record["Name"])
+        return names
+
+    def route_info(self, route_name, zone):
+        find = lambda: self.find_zone_id(zone)
+        return self.amazon.identifiers.validated("hosted_zone", zone, find, lambda zone_id: self.find_record(zone_id, route_name, zone))
 
-        info = {"zoneid": zones['HostedZones'][0]['Id'], 'zone': zone}
+    def find_record(self, zone_id, route_name, zone):
+        info = {"zoneid": zone_id, 'zone': zone}
 
         next_record_name = ""
         next_record_type = ""
@@ -42,7 +61,7 @@ class Route53(AmazonMixin, object):
             if record_infos['IsTruncated']:
                 next_record_name = record_infos['NextRecordName']
                 next_record_type = record_infos['NextRecordType']
-                next_record_identitifer = record_infos['NextRecordIdentifier']
+                next_record_identifier = record_infos['NextRecordIdentifier']
             else:
                 break
 
@@ -53,7 +72,7 @@ class Route53(AmazonMixin, object):
         old = {}
         new = {"target": [{"Value": record_target}], 'type': record_type}
         changes = list(Differ.compare_two_documents(old, new))
-        hosted_zone_id = self.client.list_hosted_zones_by_name(DNSName=zone)['HostedZones'][0]['Id']
+        hosted_zone_id = self.zone_id(zone)
 
         with self.catch_boto_400("Couldn't add record", record=name, zone=zone):
             for _ in self.change("+", "record", record=name, zone=zone, changes=changes):
@@ -75,7 +94,7 @@ class Route53(AmazonMixin, object):
         old = {"target": route_info['record']['ResourceRecords'], "type": route_info['record']['Type']}
         new = {"target": [{"Value": record_target}], 'type': record_type}
         changes = list(Differ.compare_two_documents(old, new))
-        hosted_zone_id = self.client.list_hosted_zones_by_name(DNSName=zone)['HostedZones'][0]['Id']
+        hosted_zone_id = self.zone_id(zone)
 
         if changes:
             with self.catch_boto_400("Couldn't change record", record=name, zone=zone):
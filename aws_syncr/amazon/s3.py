@@ -2,11 +2,17 @@ from aws_syncr.amazon.common import AmazonMixin
 from aws_syncr.errors import AwsSyncrError
 from aws_syncr.differ import Differ
 
+from multiprocessing.pool import ThreadPool
+import threading
 import logging
 import json
 
 log = logging.getLogger("aws_syncr.amazon.s3")
 
+def region_for(location_constraint):
+    """Buckets in us-east-1 have no LocationConstraint and old buckets in eu-west-1 say EU"""
+    return {None: "us-east-1", "": "us-east-1", "EU": "eu-west-1"}.get(location_constraint, location_constraint)
+
 class S3(AmazonMixin, object):
     def __init__(self, amazon, environment, accounts, dry_run):
         self.amazon = amazon
@@ -17,71 +23,149 @@ class S3(AmazonMixin, object):
         self.environment = environment
 
         self.client = self.amazon.session.client("s3")
-        self.resource = self.amazon.session.resource('s3')
 
-    def bucket_info(self, bucket_name):
-        bucket = self.resource.Bucket(bucket_name.split('/')[-1])
+        self.clients = {}
+        self.clients_lock = threading.Lock()
+        self.infos = {}
+        self.existing = None
+
+    def forget_discovered(self):
+        self.infos = {}
+        self.existing = None
+
+    def regional_client(self, location):
+        """Make sure we use the correct endpoint to get info from a bucket so that website buckets don't complain"""
+        # discover makes these before using threads, except when a location it remembered was stale
+        with self.clients_lock:
+            if location not in self.clients:
+                self.clients[location] = self.amazon.session.client("s3", location)
+            return self.clients[location]
+
+    def existing_buckets(self):
+        """The names of all the buckets, found with one list_buckets"""
+        if self.existing is None:
+            log.info("Finding buckets")
+            self.existing = set(bucket["Name"] for bucket in self.client.list_buckets()["Buckets"])
+        return self.existing
+
+    def discover(self, bucket_names, concurrency=10):
+        """Find location, policy and tags for these buckets in parallel"""
+        existing = self.existing_buckets()
+        wanted = [name.split('/')[-1] for name in bucket_names]
+        wanted = sorted(set(name for name in wanted if name in existing and name not in self.infos))
+        if not wanted:
+            return
+
+        log.info("Finding information for %s buckets", len(wanted))
+        pool = ThreadPool(min(concurrency, len(wanted)))
+        try:
+            # Make the regional clients here because boto3 sessions aren't thread safe
+            for location in set(pool.map(self.bucket_location, wanted)):
+                self.regional_client(location)
+
+            for info in pool.map(self.load_info, wanted):
+                self.infos[info["name"]] = info
+        finally:
+            pool.close()
+            pool.join()
+
+    def find_location(self, bucket_name):
+        return region_for(self.client.get_bucket_location(Bucket=bucket_name)['LocationConstraint'])
+
+    def bucket_location(self, bucket_name):
+        """The region of this bucket, from the identifiers we remember if we can"""
+        return self.amazon.identifiers.lookup("bucket_location", bucket_name, lambda: self.find_location(bucket_name))
+
+    def load_info(self, bucket_name):
+        """Get location, policy and tags for one bucket"""
+        find_location = lambda: self.find_location(bucket_name)
+        load = lambda location: self.load_bucket(bucket_name, location)
+        return self.amazon.identifiers.validated("bucket_location", bucket_name, find_location, load)
+
+    def load_bucket(self, bucket_name, location):
+        """Get policy and tags for a bucket from the endpoint for its location"""
+        location = region_for(location)
+        client = self.regional_client(location)
+
+        policy = ""
+        with self.ignore_missing():
+            policy = client.get_bucket_policy(Bucket=bucket_name)["Policy"]
+
+        tags = []
         with self.ignore_missing():
-            bucket.load()
-            return bucket
+            tags = client.get_bucket_tagging(Bucket=bucket_name)["TagSet"]
+
+        return {"name": bucket_name, "location": location, "policy": policy, "tags": dict((tag["Key"], tag["Value"]) for tag in tags)}
+
+    def bucket_info(self, bucket_name):
+        bucket_name = bucket_name.split('/')[-1]
+        if bucket_name not in self.existing_buckets():
+            return None
+
+        if bucket_name not in self.infos:
+            self.discover([bucket_name])
+        return self.infos[bucket_name]
 
     def create_bucket(self, name, permission_document, location, tags):
         with self.catch_boto_400("Couldn't Make bucket", bucket=name):
             for _ in self.change("+", "bucket", bucket=name):
-                self.resource.create_bucket(Bucket=name, CreateBucketConfiguration={"LocationConstraint": location})
+                if location == "us-east-1":
+                    # us-east-1 is the default and amazon complains if we ask for it
+                    self.client.create_bucket(Bucket=name)
+                else:
+                    self.client.create_bucket(Bucket=name, CreateBucketConfiguration={"LocationConstraint": location})
+                self.existing_buckets().add(name)
+                self.amazon.identifiers.set("bucket_location", name, location)
+                self.infos[name] = {"name": name, "location": location, "policy": "", "tags": {}}
 
         if permission_document:
             with self.catch_boto_400("Couldn't add policy", "{0} Permission document".format(name), permission_document, bucket=name):
                 for _ in self.change("+", "bucket_policy", bucket=name, document=permission_document):
-                    self.resource.Bucket(name).Policy().put(Policy=permission_document)
+                    self.regional_client(location).put_bucket_policy(Bucket=name, Policy=permission_document)
+                    self.infos[name]["policy"] = permission_document
 
         if tags:
             with self.catch_boto_400("Couldn't add tags", bucket=name):
                 tag_set = [{"Value": val, "Key": key} for key, val in tags.items()]
                 changes = list(Differ.compare_two_documents("[]", json.dumps(tag_set)))
                 for _ in self.change("+", "bucket_tags", bucket=name, tags=tags, changes=changes):
-                    self.resource.Bucket(name).Tagging().put(Tagging={"TagSet": tag_set})
+                    self.regional_client(location).put_bucket_tagging(Bucket=name, Tagging={"TagSet": tag_set})
+                    self.infos[name]["tags"] = dict(tags)
 
     def modify_bucket(self, bucket_info, name, permission_document, location, tags):
-        current_location = self.client.get_bucket_location(Bucket=name)['LocationConstraint']
+        current_location = bucket_info["location"]
         if current_location != location:
             raise AwsSyncrError("Sorry, can't change the location of a bucket!", wanted=location, currently=current_location, bucket=name)
 
-        # Make sure we use the correct endpoint to get info from the bucket
-        # So that website buckets don't complain
-        bucket_info.meta.client = self.amazon.session.client("s3", location)
-
-        bucket_document = ""
-        with self.ignore_missing():
-            bucket_document = bucket_info.Policy().policy
+        client = self.regional_client(location)
+        bucket_document = bucket_info["policy"]
 
         if bucket_document or permission_document:
             if permission_document and not bucket_document:
                 with self.catch_boto_400("Couldn't add policy", "Bucket {0} policy".format(name), permission_document, bucket=name):
                     for _ in self.change("+", "bucket_policy", bucket=name, changes=list(Differ.compare_two_documents("{}", permission_document))):
-                        bucket_info.Policy().put(Policy=permission_document)
+                        client.put_bucket_policy(Bucket=name, Policy=permission_document)
+                        bucket_info["policy"] = permission_document
 
             elif bucket_document and not permission_document:
                 with self.catch_boto_400("Couldn't remove policy", "Bucket {0} policy".format(name), permission_document, bucket=name):
                     for _ in self.change("-", "bucket_policy", bucket=name, changes=list(Differ.compare_two_documents(bucket_document, "{}"))):
-                        bucket_info.Policy().delete()
+                        client.delete_bucket_policy(Bucket=name)
+                        bucket_info["policy"] = ""
 
             else:
                 changes = list(Differ.compare_two_documents(bucket_document, permission_document))
                 if changes:
                     with self.catch_boto_400("Couldn't modify policy", "Bucket {0} policy".format(name), permission_document, bucket=name):
                         for _ in self.change("M", "bucket_policy", bucket=name, changes=changes):
-                            bucket_info.Policy().put(Policy=permission_document)
+                            client.put_bucket_policy(Bucket=name, Policy=permission_document)
+                            bucket_info["policy"] = permission_document
 
         self.modify_tags(bucket_info, name, tags)
 
     def modify_tags(self, bucket_info, name, tags):
-        current_tags = bucket_info.Tagging()
-        tag_set = []
-        with self.ignore_missing():
-            current_tags.load()
-            tag_set = current_tags.tag_set
-        current_vals = dict((tag["Key"], tag["Value"]) for tag in tag_set)
+        current_vals = bucket_info["tags"]
+        client = self.regional_client(bucket_info["location"])
 
         changes = list(Differ.compare_two_documents(json.dumps(current_vals), json.dumps(tags)))
         if changes:
@@ -91,7 +175,7 @@ class S3(AmazonMixin, object):
                 symbol = "M" if new_tag_set and current_vals else symbol
                 for _ in self.change(symbol, "bucket_tags", bucket=name, changes=changes):
                     if not new_tag_set:
-                        bucket_info.Tagging().delete()
+                        client.delete_bucket_tagging(Bucket=name)
                     else:
-                        bucket_info.Tagging().put(Tagging={"TagSet": new_tag_set})
-
+                        client.put_bucket_tagging(Bucket=name, Tagging={"TagSet": new_tag_set})
+                    bucket_info["tags"] = dict(tags)
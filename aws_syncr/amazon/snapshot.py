@@ -0,0 +1,113 @@
+"""
+Record everything a sync reads from amazon into a file, and read it back later.
+
+We hook into the botocore events of our session. When recording, every
+response is remembered by the method, url (which includes the region) and
+body of its request. When replaying, those responses are given back instead
+of talking to amazon at all.
+
+A request that isn't in the snapshot is treated as asking about something
+that doesn't exist yet. So a listing that needs no arguments comes back
+empty and anything else comes back as a 404.
+
+Only dry runs may use a snapshot, so replaying never needs to make changes.
+"""
+
+from aws_syncr.errors import BadOption
+
+import threading
+import logging
+import gzip
+import json
+import time
+import copy
+import six
+
+log = logging.getLogger("aws_syncr.amazon.snapshot")
+
+class SnapshotResponse(object):
+    """Looks enough like a botocore http response for _make_api_call"""
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.content = b""
+
+class Snapshot(object):
+    def __init__(self, environment, account_id=None, responses=None):
+        self.environment = environment
+        self.account_id = account_id
+        self.responses = responses or {}
+        self.lock = threading.Lock()
+
+    @classmethod
+    def load(kls, location, environment):
+        """Read a snapshot for this environment"""
+        try:
+            with gzip.open(location, "rb") as fle:
+                data = json.loads(fle.read().decode('utf-8'))
+        except (IOError, OSError, ValueError) as error:
+            raise BadOption("Couldn't read snapshot", location=location, error=error)
+
+        if data.get("environment") != environment:
+            raise BadOption("Snapshot is for a different environment", location=location, wanted=environment, got=data.get("environment"))
+
+        log.info("Read snapshot\tlocation=%s\ttaken=%s\tresponses=%s", location, time.ctime(data["taken"]), len(data["responses"]))
+        return kls(environment, data["account_id"], data["responses"])
+
+    def save(self, location):
+        """Write this snapshot as compressed json"""
+        data = {"environment": self.environment, "account_id": self.account_id, "taken": time.time(), "responses": self.responses}
+        with gzip.open(location, "wb") as fle:
+            fle.write(json.dumps(data, sort_keys=True).encode('utf-8'))
+        log.info("Wrote snapshot\tlocation=%s\tresponses=%s", location, len(self.responses))
+
+    def key_for(self, request_dict):
+        body = request_dict.get("body")
+        if isinstance(body, dict):
+            body = json.dumps(body, sort_keys=True)
+        elif isinstance(body, six.binary_type):
+            body = body.decode('utf-8')
+        return "{0} {1} {2}".format(request_dict["method"], request_dict["url"], body or "")
+
+    def attach(self, session, replay=False):
+        """Make this session record into, or replay from, this snapshot"""
+        events = session.events
+        if replay:
+            # What we recorded has already been through these
+            from botocore.handlers import BUILTIN_HANDLERS
+            for spec in BUILTIN_HANDLERS:
+                if spec[0].startswith("after-call"):
+                    events.unregister(spec[0], spec[1])
+            events.register("before-call", self.respond)
+        else:
+            events.register("before-call", self.remember_key)
+            events.register("after-call", self.remember_response)
+
+    def remember_key(self, params, context, **kwargs):
+        context["aws_syncr_snapshot_key"] = self.key_for(params)
+
+    def remember_response(self, http_response, parsed, context, **kwargs):
+        key = context.get("aws_syncr_snapshot_key")
+        if key is not None:
+            # Through json so it's what we'd read back and later changes to parsed don't matter
+            recorded = json.loads(json.dumps(parsed, default=str))
+            with self.lock:
+                self.responses[key] = {"status": http_response.status_code, "parsed": recorded}
+
+    def respond(self, model, params, **kwargs):
+        """Return (http_response, parsed) from the snapshot"""
+        key = self.key_for(params)
+        if key in self.responses:
+            response = self.responses[key]
+            return SnapshotResponse(response["status"]), copy.deepcopy(response["parsed"])
+
+        log.debug("Request isn't in the snapshot\tkey=%s", key)
+        if model.input_shape is None or not model.input_shape.required_members:
+            parsed = {"ResponseMetadata": {"HTTPStatusCode": 200}}
+            if model.output_shape is not None:
+                for name, shape in model.output_shape.members.items():
+                    if shape.type_name == "list":
+                        parsed[name] = []
+            return SnapshotResponse(200), parsed
+
+        error = {"Code": "NotFoundException", "Message": "Not in the snapshot"}
+        return SnapshotResponse(404), {"Error": error, "ResponseMetadata": {"HTTPStatusCode": 404}}
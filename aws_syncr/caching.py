@@ -0,0 +1,55 @@
+"""
+Caches that live as long as a configuration stays the same.
+
+option_merge stores every update to a configuration as a new layer in its
+storage, including the values converters produce, and the storage counts
+every layer it adds or deletes. So that count tells us when anything we
+derived from the configuration may be stale.
+
+Caches are kept per storage in a WeakKeyDictionary, so each configuration
+(i.e. one per task in the server) gets its own and they go away with it.
+"""
+
+from weakref import WeakKeyDictionary
+
+class ConfigurationCache(object):
+    """
+    A dictionary per configuration that forgets everything when that configuration changes
+
+    Usage is like::
+
+        cache = ConfigurationCache()
+        found = cache.get(configuration)
+        if found is not None:
+            found["key"] = "value"
+
+    ``get`` returns None for objects we can't track (i.e. plain dictionaries),
+    in which case nothing should be cached.
+    """
+    def __init__(self):
+        self.caches = WeakKeyDictionary()
+
+    def version_of(self, storage):
+        """The number of times this storage has changed, which only ever goes up"""
+        return getattr(storage, "_version", None)
+
+    def get(self, options):
+        """Return the cache dictionary for this configuration"""
+        storage = getattr(options, "storage", None)
+        version = self.version_of(storage)
+        if version is None:
+            return None
+
+        try:
+            current_version, cache = self.caches.get(storage, (None, None))
+            if current_version != version:
+                cache = {}
+                self.caches[storage] = (version, cache)
+        except TypeError:
+            return None
+
+        prefix = tuple(getattr(options, "prefix_list", None) or ())
+        return cache.setdefault(prefix, {})
+
+    def clear(self):
+        self.caches = WeakKeyDictionary()
@@ -0,0 +1,72 @@
+"""
+A thin client for running tasks on an aws_syncr server (see aws_syncr.server).
+
+It takes the same arguments as aws_syncr::
+
+    $ aws_syncr_client ./dev --task deploy_lambda --artifact my-function
+
+And only uses the standard library, so it starts quickly. The server is found
+at ``$AWS_SYNCR_SERVER``, or ``~/.aws_syncr/server.sock``.
+
+Tasks run with the server's credentials, so the server refuses a client whose
+``AWS_*`` environment variables are different from its own. We only send a
+hash of those variables.
+"""
+
+import hashlib
+import socket
+import json
+import sys
+import os
+
+def socket_location(location=None):
+    """Return where the server listens"""
+    return os.path.expanduser(location or os.environ.get("AWS_SYNCR_SERVER") or "~/.aws_syncr/server.sock")
+
+def aws_environment(environ):
+    """Return a hash of the AWS_* environment variables, except our own AWS_SYNCR_* ones"""
+    found = sorted((key, val) for key, val in environ.items() if key.startswith("AWS_") and not key.startswith("AWS_SYNCR_"))
+    return hashlib.sha256(json.dumps(found).encode('utf-8')).hexdigest()
+
+def request_for(argv, cwd, environ):
+    """Return the request to send the server for these arguments"""
+    argv = list(argv)
+    if "AWS_SYNCR_CONFIG_FOLDER" in environ and "--config-folder" not in argv:
+        # The server has its own environment, so say what our default is
+        index = argv.index("--") if "--" in argv else len(argv)
+        argv[index:index] = ["--config-folder", environ["AWS_SYNCR_CONFIG_FOLDER"]]
+    return {"argv": argv, "cwd": cwd, "aws_environment": aws_environment(environ)}
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    location = socket_location()
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(location)
+    except socket.error as error:
+        sys.stderr.write("Couldn't connect to the aws_syncr server\tlocation={0}\terror={1}\n".format(location, error))
+        sys.exit(1)
+
+    try:
+        sock.sendall("{0}\n".format(json.dumps(request_for(argv, os.getcwd(), os.environ))).encode('utf-8'))
+        for line in sock.makefile("rb"):
+            message = json.loads(line.decode('utf-8'))
+            if "output" in message:
+                sys.stdout.write(message["output"])
+                sys.stdout.flush()
+            elif "log" in message:
+                sys.stderr.write("{0}\n".format(message["log"]))
+            elif "error" in message:
+                sys.stdout.write("\n{0}\nSomething went wrong! -- {1}\n\t{2}\n".format("!" * 80, message["kind"], message["error"]))
+                sys.exit(1)
+            elif message.get("finished"):
+                return
+    finally:
+        sock.close()
+
+    sys.stderr.write("The aws_syncr server went away before the task finished\n")
+    sys.exit(1)
+
+if __name__ == '__main__':
+    main()
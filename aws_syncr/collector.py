@@ -3,6 +3,7 @@ Collects then parses configuration files and verifies that they are valid.
 """
 
 from aws_syncr.errors import BadConfiguration, BadYaml, BadOption, BadImport
+from aws_syncr.actions import available_actions
 from aws_syncr.option_spec.aws_syncr_specs import AwsSyncrSpec
 from aws_syncr.amazon import Amazon
 
@@ -13,11 +14,11 @@ from option_merge.collector import Collector
 from option_merge import MergedOptions
 from option_merge import Converter
 
-import pkg_resources
 import tempfile
+import hashlib
 import logging
-import yaml
 import json
+import copy
 import imp
 import os
 
@@ -63,6 +64,7 @@ class Collector(Collector):
     def extra_prepare(self, configuration, cli_args):
         """Called before the configuration.converters are activated"""
         aws_syncr = cli_args.pop("aws_syncr")
+        self.offline = getattr(available_actions.get(aws_syncr.get("chosen_task")), "offline", False)
 
         self.configuration.update(
             { "$@": aws_syncr.get("extra", "")
@@ -76,7 +78,22 @@ class Collector(Collector):
     def extra_prepare_after_activation(self, configuration, cli_args):
         """Setup our connection to amazon"""
         aws_syncr = configuration['aws_syncr']
-        configuration["amazon"] = Amazon(configuration['aws_syncr'].environment, configuration['accounts'], debug=aws_syncr.debug, dry_run=aws_syncr.dry_run)
+        if getattr(self, "offline", False):
+            return
+
+        if getattr(self, "amazon", None) is not None:
+            # Keep the clients and what we know about the account from last time
+            configuration["amazon"] = self.amazon
+            return
+
+        assume_role = AwsSyncrSpec().assume_role_for(configuration, aws_syncr.environment)
+        configuration["amazon"] = Amazon(configuration['aws_syncr'].environment, configuration['accounts'], debug=aws_syncr.debug, dry_run=aws_syncr.dry_run, assume_role=assume_role)
+
+        if aws_syncr.against_snapshot:
+            if not aws_syncr.dry_run:
+                raise BadOption("Can only use --against-snapshot with --dry-run")
+            from aws_syncr.amazon.snapshot import Snapshot
+            configuration["amazon"].use_snapshot(Snapshot.load(aws_syncr.against_snapshot, aws_syncr.environment), replay=True)
 
     def home_dir_configuration_location(self):
         return os.path.expanduser("~/.aws_syncrrc.yml")
@@ -87,8 +104,19 @@ class Collector(Collector):
 
     def read_file(self, location):
         """Read in a yaml file and return as a python object"""
+        import yaml
         try:
-            return yaml.load(open(location))
+            parsed_files = getattr(self, "parsed_files", None)
+            if parsed_files is None:
+                return yaml.load(open(location))
+
+            # Only parse files again if they changed since we last parsed them
+            with open(location, "rb") as fle:
+                contents = fle.read()
+            digest = hashlib.sha1(contents).hexdigest()
+            if parsed_files.get(location, (None, ))[0] != digest:
+                parsed_files[location] = (digest, yaml.load(contents))
+            return copy.deepcopy(parsed_files[location][1])
         except (yaml.parser.ParserError, yaml.scanner.ScannerError) as error:
             raise self.BadFileErrorKls("Failed to read yaml", location=location, error_type=error.__class__.__name__, error="{0}{1}".format(error.problem, error.problem_mark))
 
@@ -103,7 +131,7 @@ class Collector(Collector):
         """Hook to do any extra configuration collection or converter registration"""
         aws_syncr_spec = AwsSyncrSpec()
         registered = {}
-        directory = pkg_resources.resource_filename("aws_syncr", "option_spec")
+        directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), "option_spec")
 
         for location in sorted(os.listdir(directory)):
             import_name = os.path.splitext(location)[0]
@@ -0,0 +1,151 @@
+"""
+Deploy (and test) many lambda functions at the same time.
+
+``--artifact`` for deploy_lambda, test_lambda and deploy_and_test_lambda can
+be a comma separated list of names and globs::
+
+    $ aws_syncr ./dev --task deploy_lambda --artifact "ingest-*,report"
+
+Making the zipfile for a directory happens in a pool of processes, because
+it's mostly compressing. Each function is uploaded as soon as its zipfile is
+ready, in a pool of threads that sends at most ``per_region`` requests to a
+region at a time. When we test as well, each function is invoked as soon as
+it's deployed.
+
+The processes are never forked from this one, because it may have other
+threads (i.e. in the server) and a forked child inherits whatever locks
+they were holding. On python2, where forking is the only option, we make
+the zipfiles in the upload threads instead when there are other threads.
+
+Every function gets a summary, even if something goes wrong with it, so one
+bad function doesn't hide what happened to the others.
+"""
+
+from aws_syncr.option_spec.lambdas import DirectoryCode
+
+from multiprocessing.pool import ThreadPool
+import multiprocessing
+import threading
+import tempfile
+import logging
+import os
+
+log = logging.getLogger("aws_syncr.deploys")
+
+def package(job):
+    """Make the zipfile for (name, directory, exclude) in a worker and return (name, location, error)"""
+    name, directory, exclude = job
+    fle = tempfile.NamedTemporaryFile(suffix=".zip", delete=False)
+    fle.close()
+    try:
+        DirectoryCode(directory=directory, exclude=exclude).write_zipfile(fle.name)
+    except Exception as error:
+        os.remove(fle.name)
+        return name, None, "Couldn't make zipfile: {0}".format(error)
+    return name, fle.name, None
+
+def process_pool(size):
+    """Return a pool of processes that aren't forked from this one, or None if we should use threads"""
+    if hasattr(multiprocessing, "get_all_start_methods"):
+        method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        return multiprocessing.get_context(method).Pool(size)
+    elif threading.active_count() > 1:
+        return None
+    return multiprocessing.Pool(size)
+
+def summary_line(summary):
+    """Return one line saying what happened to a function"""
+    parts = ["location={0}".format(summary["location"])]
+    if "deployed" in summary:
+        parts.append("code_sha256={0}".format(summary["deployed"]))
+    if "tested" in summary:
+        parts.append("status_code={0}".format(summary["tested"]["status_code"]))
+        if summary["tested"]["function_error"]:
+            parts.append("function_error={0}".format(summary["tested"]["function_error"]))
+    if "error" in summary:
+        parts.append("error={0}".format(summary["error"]))
+    return "{0} {1}({2})".format("!" if failed(summary) else "=", summary["name"], ", ".join(parts))
+
+def failed(summary):
+    return "error" in summary or bool(summary.get("tested", {}).get("function_error"))
+
+class Deploys(object):
+    def __init__(self, amazon, deploy=True, test=False, per_region=4, workers=10):
+        self.test = test
+        self.deploy = deploy
+        self.amazon = amazon
+        self.workers = workers
+        self.per_region = per_region
+
+    def run(self, functions):
+        """Deploy and/or test these functions and return a summary for each one, sorted by name"""
+        # Make the clients here because boto3 sessions aren't thread safe
+        for function in functions:
+            self.amazon.lambdas.client(function.location)
+        self.regions = dict((function.location, threading.BoundedSemaphore(self.per_region)) for function in functions)
+
+        directories = [function for function in functions if self.deploy and isinstance(function.code, DirectoryCode)]
+        others = [function for function in functions if function not in directories]
+
+        # Start the processes before any threads, in case we have to fork
+        packer = None
+        if directories:
+            packer = process_pool(min(multiprocessing.cpu_count(), len(directories)))
+
+        uploads = ThreadPool(min(self.workers, len(functions)))
+        try:
+            pending = [uploads.apply_async(self.one, (function, )) for function in others]
+            by_name = dict((function.name, function) for function in directories)
+            jobs = [(function.name, function.code.directory, list(function.code.exclude)) for function in directories]
+            if packer is not None:
+                for name, location, error in packer.imap_unordered(package, jobs):
+                    log.info("Made zipfile\tfunction=%s", name)
+                    pending.append(uploads.apply_async(self.one, (by_name[name], location, error)))
+            else:
+                pending.extend(uploads.apply_async(self.package_and_one, (by_name[job[0]], job)) for job in jobs)
+            summaries = [result.get() for result in pending]
+        finally:
+            if packer is not None:
+                packer.close()
+                packer.join()
+            uploads.close()
+            uploads.join()
+
+        return sorted(summaries, key=lambda summary: summary["name"])
+
+    def package_and_one(self, function, job):
+        """Make the zipfile in this thread and then deploy and/or test the function"""
+        _, location, error = package(job)
+        return self.one(function, location, error)
+
+    def one(self, function, packaged=None, error=None):
+        """Deploy and/or test one function and return its summary"""
+        summary = {"name": function.name, "location": function.location}
+        if error:
+            summary["error"] = error
+            return summary
+
+        lambdas = self.amazon.lambdas
+        try:
+            if self.deploy:
+                with self.regions[function.location]:
+                    result = lambdas.deploy_function(function.name, function.code, function.location, packaged=packaged)
+                summary["deployed"] = "dry_run" if result is None else result.get("CodeSha256")
+
+            if self.test:
+                with self.regions[function.location]:
+                    response, logs = lambdas.invoke_function(function.name, function.event, function.location)
+                summary["tested"] = {
+                      "status_code": response.get("StatusCode")
+                    , "function_error": response.get("FunctionError")
+                    , "payload": response.get("Payload")
+                    , "logs": logs
+                    }
+        except Exception as error:
+            # We want a summary for every function, even when some of them fail
+            summary["error"] = str(error)
+        finally:
+            if packaged:
+                os.remove(packaged)
+
+        return summary
@@ -1,4 +1,3 @@
-from datadiff import diff
 import logging
 import json
 import six
@@ -53,6 +52,7 @@ class Differ(object):
                         sort_key(statement, "Resource")
                         sort_key(statement, "NotResource")
 
+        from datadiff import diff
         difference = diff(first, second, fromfile="current", tofile="new").stringify()
         if difference:
             lines = difference.split('\n')
@@ -70,12 +70,56 @@ class App(App):
             , **defaults['--artifact']
             )
 
+        parser.add_argument("--convert-workers"
+            , help = "Number of processes to use when converting the items in each section"
+            , dest = "aws_syncr_convert_workers"
+            , type = int
+            , default = 1
+            )
+
         parser.add_argument("--stage"
             , help = "Extra argument to be used as the stage for deploying an api gateway"
             , dest = "aws_syncr_stage"
             , default = ""
             )
 
+        parser.add_argument("--select"
+            , help = "Only sync the items this selects, i.e. 'roles:team-a-*', 'label:team-a' or '*ingest*'. May be specified many times"
+            , dest = "aws_syncr_select"
+            , action = "append"
+            , default = []
+            )
+
+        parser.add_argument("--shard"
+            , help = "Only sync slice i of N, i.e. 2/4. Items that refer to each other are always in the same slice"
+            , dest = "aws_syncr_shard"
+            , default = ""
+            )
+
+        parser.add_argument("--report"
+            , help = "File to write the changes that were made to as json"
+            , dest = "aws_syncr_report"
+            , default = ""
+            )
+
+        parser.add_argument("--against-snapshot"
+            , help = "Snapshot from the snapshot task to read from instead of amazon. Only for a --dry-run"
+            , dest = "aws_syncr_against_snapshot"
+            , default = ""
+            )
+
+        parser.add_argument("--resume"
+            , help = "Skip items that an interrupted sync already finished"
+            , dest = "aws_syncr_resume"
+            , action = "store_true"
+            )
+
+        parser.add_argument("--since"
+            , help = "Only sync items whose configuration changed since this git ref"
+            , dest = "aws_syncr_since"
+            , default = ""
+            )
+
         return parser
 
 main = App.main
@@ -15,9 +15,30 @@ of MergedOptions to do the lookup for us.
 """
 
 from option_merge.formatter import MergedOptionStringFormatter as StringFormatter
+from aws_syncr.caching import ConfigurationCache
 from aws_syncr.errors import BadOptionFormat
 from input_algorithms.meta import Meta
 
+class FormatCache(ConfigurationCache):
+    """Remembers what format keys resolve to for each configuration"""
+    def __init__(self):
+        super(FormatCache, self).__init__()
+        self.keys = {}
+
+    def actual_key(self, key):
+        """Point lambda and apigateway keys at the items they refer to"""
+        if key not in self.keys:
+            actual = key
+            # Massive hack, lol
+            if key.startswith("lambda."):
+                actual = "lambda.items.{0}".format(key[7:])
+            if key.startswith("apigateway."):
+                actual = "apigateway.items.{0}".format(key[11:])
+            self.keys[key] = actual
+        return self.keys[key]
+
+format_cache = FormatCache()
+
 class MergedOptionStringFormatter(StringFormatter):
     """
     Resolve format options into a MergedOptions dictionary
@@ -46,15 +67,14 @@ class MergedOptionStringFormatter(StringFormatter):
         # val == {1:2, 3:4}
 
     For this to work, the object must be a subclass of dict and in the dont_prefix option of the configuration.
+
+    Resolved keys are remembered in ``format_cache`` until the configuration
+    changes. Formatters with a chain that isn't a plain list (i.e. one that
+    records what was looked up) always do the full lookup.
     """
     def get_string(self, key):
         """Get a string from all_options"""
-
-        # Massive hack, lol
-        if key.startswith("lambda."):
-            key = "lambda.items.{0}".format(key[7:])
-        if key.startswith("apigateway."):
-            key = "apigateway.items.{0}".format(key[11:])
+        key = format_cache.actual_key(key)
 
         # Make sure key is in all_options
         if key not in self.all_options:
@@ -65,6 +85,23 @@ class MergedOptionStringFormatter(StringFormatter):
 
         return super(MergedOptionStringFormatter, self).get_string(key)
 
+    def get_field(self, value, args, kwargs, format_spec=None):
+        """Remember what each key formats into"""
+        special = self.special_get_field(value, args, kwargs, format_spec)
+        if special is not None:
+            return special
+
+        cache = None
+        if type(self.chain) is list:
+            cache = format_cache.get(self.all_options)
+            if cache is not None and value in cache:
+                return cache[value], ()
+
+        result = self.with_option_path(value).format()
+        if cache is not None:
+            cache[value] = result
+        return result, ()
+
     def special_get_field(self, value, args, kwargs, format_spec=None):
         """Also take the spec into account"""
         if value in self.chain:
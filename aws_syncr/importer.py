@@ -0,0 +1,316 @@
+"""
+Turn what is already in an account into configuration for aws_syncr.
+
+We write roles and buckets the way someone would by hand. Resources in
+statements use the ``iam``, ``s3`` and ``kms`` shorthands, with ``__self__``
+for the item itself, and trust statements become ``allow_to_assume_me``.
+
+Each statement we write is normalised again and compared with what amazon
+gave us. If the shorthand doesn't give back the same statement, we write the
+statement exactly as amazon has it instead.
+
+Options that several items share are moved into ``templates`` that those
+items ``use``.
+"""
+
+from aws_syncr.option_spec.statements import trust_dict, permission_dict, resource_policy_dict
+from aws_syncr.option_spec.statements import trust_statement_spec, permission_statement_spec, resource_policy_statement_spec
+from aws_syncr.option_spec.buckets import buckets_spec
+from aws_syncr.option_spec.roles import role_spec
+from aws_syncr.differ import Differ
+
+from option_merge import MergedOptions
+from input_algorithms.meta import Meta
+import logging
+import json
+import re
+
+log = logging.getLogger("aws_syncr.importer")
+
+iam_arn = re.compile(r"^arn:aws:(iam|sts)::(\d+):(.+)$")
+kms_alias_arn = re.compile(r"^arn:aws:kms:([^:]+):(\d+):alias/(.+)$")
+s3_arn = re.compile(r"^arn:aws:s3:::(.+)$")
+
+def listed(val):
+    return val if isinstance(val, list) else [val]
+
+def single(lst):
+    """Our statements use a string instead of a list of one thing"""
+    return lst[0] if len(lst) == 1 else sorted(lst)
+
+def differs(current, wanted):
+    """Say whether these two documents are different"""
+    return bool(list(Differ.compare_two_documents(json.dumps(current), json.dumps(wanted))))
+
+def factor_templates(section, items, taken=()):
+    """
+    Move options that several items share into templates that those items use
+
+    Items are changed in place and the templates are returned as a dictionary
+    of name to options. Names in ``taken`` aren't used for new templates.
+    """
+    templates = {}
+    remaining = set(items)
+    dumped = lambda val: json.dumps(val, sort_keys=True)
+
+    index = 0
+    while True:
+        pairs = {}
+        for name in remaining:
+            for key, val in items[name].items():
+                pairs.setdefault((key, dumped(val)), set()).add(name)
+
+        shared = sorted((len(names), pair) for pair, names in pairs.items() if len(names) > 1)
+        if not shared:
+            break
+
+        names = sorted(pairs[shared[-1][1]])
+        common = dict(
+              (key, val) for key, val in items[names[0]].items()
+              if all(key in items[name] and dumped(items[name][key]) == dumped(val) for name in names)
+            )
+
+        index += 1
+        while "imported_{0}_{1}".format(section, index) in taken:
+            index += 1
+        template = "imported_{0}_{1}".format(section, index)
+
+        templates[template] = common
+        for name in names:
+            for key in common:
+                del items[name][key]
+            items[name]["use"] = template
+            remaining.remove(name)
+
+    return templates
+
+class Importer(object):
+    def __init__(self, aws_syncr, accounts):
+        self.accounts = accounts
+        self.aws_syncr = aws_syncr
+        self.templates = {}
+
+        self.account_id = str(accounts[aws_syncr.environment])
+        self.account_names = {self.account_id: aws_syncr.environment}
+        for name, account_id in sorted(accounts.items()):
+            self.account_names.setdefault(str(account_id), name)
+
+    def meta(self, section, name):
+        everything = {"accounts": self.accounts, "aws_syncr": self.aws_syncr, "templates": self.templates}
+        return Meta(everything, []).at(section).at(name)
+
+    def account_options(self, account_id):
+        """Return the options that say which account this is, or None if we don't know it"""
+        if account_id == self.account_id:
+            return {}
+        if account_id in self.account_names:
+            return {"account": self.account_names[account_id]}
+
+    def resources(self, arns, self_type, self_name):
+        """Return shorthands for these arns"""
+        iam = {}
+        kms = {}
+        s3 = set()
+        others = []
+
+        for arn in listed(arns):
+            found = iam_arn.match(arn)
+            if found:
+                service, account_id, name = found.groups()
+                account = self.account_options(account_id)
+                if account is not None and service == ("sts" if name.startswith("assumed-role") else "iam"):
+                    if self_type == "role" and account_id == self.account_id and name == "role/{0}".format(self_name):
+                        name = "__self__"
+                    iam.setdefault(tuple(account.items()), []).append(name)
+                    continue
+
+            found = kms_alias_arn.match(arn)
+            if found:
+                location, account_id, alias = found.groups()
+                account = self.account_options(account_id)
+                if account is not None:
+                    kms.setdefault((location, tuple(account.items())), []).append(alias)
+                    continue
+
+            found = s3_arn.match(arn)
+            if found:
+                s3.add(found.group(1))
+                continue
+
+            others.append(arn)
+
+        # The s3 shorthand for a bucket gives both the bucket and everything in it
+        keys = []
+        for key in sorted(s3):
+            if '/' not in key and "{0}/*".format(key) in s3:
+                keys.append(key)
+            elif key.endswith("/*") and '/' not in key[:-2] and key[:-2] in s3:
+                continue
+            elif '/' in key:
+                keys.append(key)
+            else:
+                others.append("arn:aws:s3:::{0}".format(key))
+
+        if self_type == "bucket":
+            keys = ["__self__{0}".format(key[len(self_name):]) if key == self_name or key.startswith("{0}/".format(self_name)) else key for key in keys]
+
+        result = sorted(others)
+        for account, names in sorted(iam.items()):
+            result.append(dict(account, iam=single(names)))
+        for (location, account), aliases in sorted(kms.items()):
+            options = dict(account, kms=single(aliases))
+            if location != self.aws_syncr.location:
+                options["location"] = location
+            result.append(options)
+        if keys:
+            result.append({"s3": single(keys)})
+        return result
+
+    def principals(self, principal, self_type, self_name):
+        """Return shorthands for a Principal or NotPrincipal"""
+        result = []
+        others = {}
+        for kind, val in sorted(principal.items()):
+            if kind == "AWS":
+                for resource in self.resources(val, self_type, self_name):
+                    if isinstance(resource, dict):
+                        result.append(resource)
+                    else:
+                        others.setdefault("AWS", []).append(resource)
+            elif kind == "Service" and listed(val) == ["ec2.amazonaws.com"]:
+                result.append({"service": "ec2"})
+            else:
+                others[kind] = val
+
+        for kind, val in list(others.items()):
+            if isinstance(val, list):
+                others[kind] = single(val)
+        if others:
+            result.append(others)
+
+        return result[0] if len(result) == 1 else result
+
+    def statement(self, original, kind, self_type, self_name):
+        """Return options for this statement using our shorthands"""
+        options = {}
+        for key, val in original.items():
+            if key in ("Resource", "NotResource"):
+                val = self.resources(val, self_type, self_name)
+            elif key in ("Principal", "NotPrincipal") and isinstance(val, dict):
+                val = self.principals(val, self_type, self_name)
+            options[key.lower()] = val
+
+        if kind != "permission" and options.get("sid") == "":
+            del options["sid"]
+
+        if kind == "trust":
+            if options.get("effect") == "Allow":
+                del options["effect"]
+
+            principal = original.get("Principal", original.get("NotPrincipal"))
+            action = "sts:AssumeRoleWithSAML" if isinstance(principal, dict) and "Federated" in principal else "sts:AssumeRole"
+            if options.get("action") == action:
+                del options["action"]
+
+            # allow_to_assume_me and disallow_to_assume_me take just the principal
+            principal_key = "notprincipal" if "NotPrincipal" in original else "principal"
+            if list(options) == [principal_key] and isinstance(options[principal_key], dict):
+                return options[principal_key]
+
+        return options
+
+    def normalise_statement(self, options, kind, self_type, self_name):
+        """Return the statement amazon would get for these options"""
+        meta = self.meta("{0}s".format(self_type), self_name)
+        if kind == "trust":
+            principal = "notprincipal" if "notprincipal" in options or "NotPrincipal" in options else "principal"
+            val = trust_dict(principal).normalise(meta, options)
+            return trust_statement_spec(self_type, self_name).normalise(meta, val).statement
+        elif kind == "permission":
+            val = permission_dict().normalise(meta, options)
+            return permission_statement_spec(self_type, self_name).normalise(meta, val).statement
+        else:
+            val = resource_policy_dict().normalise(meta, options)
+            return resource_policy_statement_spec(self_type, self_name).normalise(meta, val).statement
+
+    def converted(self, original, kind, self_type, self_name):
+        """Return options for this statement that give back the original statement"""
+        options = self.statement(original, kind, self_type, self_name)
+        try:
+            same = not differs({"Statement": [original]}, {"Statement": [self.normalise_statement(options, kind, self_type, self_name)]})
+        except Exception as error:
+            # Anything we can't normalise isn't something we can write
+            log.debug("Couldn't normalise shorthand for statement\tstatement=%s\terror=%s", original, error)
+            same = False
+
+        if not same:
+            log.debug("Using statement as amazon has it\tname=%s\tstatement=%s", self_name, original)
+            return dict(original)
+        return options
+
+    def role(self, info, policies, instance_profiles):
+        """Return (name, options) for this role"""
+        name = "{0}{1}".format(info["Path"].lstrip('/'), info["RoleName"])
+
+        allow, disallow = [], []
+        for statement in listed(info["AssumeRolePolicyDocument"].get("Statement", [])):
+            (disallow if "NotPrincipal" in statement else allow).append(self.converted(statement, "trust", "role", name))
+
+        permission = []
+        for policy_name, document in sorted(policies.items()):
+            permission.extend(self.converted(statement, "permission", "role", name) for statement in listed(document.get("Statement", [])))
+
+        options = {}
+        for key, val in (("allow_to_assume_me", allow), ("disallow_to_assume_me", disallow), ("permission", permission), ("description", info.get("Description"))):
+            if val:
+                options[key] = val
+        if info["RoleName"] in instance_profiles.get(info["RoleName"], []):
+            options["make_instance_profile"] = True
+
+        return name, options
+
+    def bucket(self, info):
+        """Return (name, options) for this bucket"""
+        options = {"location": info["location"]}
+        if info["policy"]:
+            statements = json.loads(info["policy"]).get("Statement", [])
+            options["permission"] = [self.converted(statement, "resource", "bucket", info["name"]) for statement in listed(statements)]
+        if info["tags"]:
+            options["tags"] = dict(info["tags"])
+        return info["name"], options
+
+    def problems_with_role(self, name, options, info, policies):
+        """Return what a sync would change for this role"""
+        try:
+            role = role_spec().normalise(self.meta("roles", name), MergedOptions.using(options))
+        except Exception as error:
+            return ["couldn't normalise: {0}".format(error)]
+
+        problems = []
+        if differs(info["AssumeRolePolicyDocument"], json.loads(role.trust.document)):
+            problems.append("trust document")
+
+        policy_name = "syncr_policy_{0}".format(name.replace('/', '__'))
+        if list(policies) != [policy_name]:
+            problems.append("inline policies aren't just {0}".format(policy_name))
+        elif differs(policies[policy_name], json.loads(role.permission.document)):
+            problems.append("permission document")
+        return problems
+
+    def problems_with_bucket(self, name, options, info):
+        """Return what a sync would change for this bucket"""
+        try:
+            bucket = buckets_spec().normalise(self.meta("buckets", name), MergedOptions.using(options))
+        except Exception as error:
+            return ["couldn't normalise: {0}".format(error)]
+
+        problems = []
+        if bucket.location != info["location"]:
+            problems.append("location")
+        if bool(info["policy"]) != bool(bucket.permission.statements):
+            problems.append("policy")
+        elif info["policy"] and differs(json.loads(info["policy"]), json.loads(bucket.permission.document)):
+            problems.append("policy")
+        if bucket.tags != info["tags"]:
+            problems.append("tags")
+        return problems
@@ -0,0 +1,129 @@
+"""
+Keep a journal of what a sync has done, so an interrupted sync can resume.
+
+Each run gets its own file under ``~/.aws_syncr/journal/<environment>`` (or
+wherever ``AWS_SYNCR_JOURNAL`` says) with one json object per line. We only
+ever append to it, and flush each line to disk before carrying on.
+
+Besides ``started`` and ``resumed`` events with the time, we have:
+
+``{"event": "item", "section", "name", "hash"}``
+    We started syncing this item
+
+``{"event": "change", "section", "name", "hash", "symbol", "type", "resource"}``
+    A change to amazon for this item completed
+
+``{"event": "done", "section", "name", "hash"}``
+    We finished syncing this item
+
+``{"event": "finished"}``
+    The whole sync finished
+
+The hash is of what ``render_one`` says we want for the item. With
+``--resume`` we skip items the interrupted run finished with the same hash,
+and sync everything else, including the item that was in flight.
+"""
+
+from input_algorithms.spec_base import NotSpecified
+
+from contextlib import contextmanager
+from datetime import datetime
+import hashlib
+import logging
+import json
+import time
+import os
+
+log = logging.getLogger("aws_syncr.journal")
+
+# How many journals to keep for each environment
+keep = 10
+
+def desired_hash(thing, aws_syncr, accounts, item):
+    """Hash what we want this item to look like"""
+    def default(obj):
+        if obj is NotSpecified:
+            return None
+        raise TypeError("{0!r} is not JSON serializable".format(obj))
+    desired = json.dumps(thing.render_one(aws_syncr, accounts, item), sort_keys=True, default=default)
+    return hashlib.sha256(desired.encode('utf-8')).hexdigest()
+
+class Journal(object):
+    def __init__(self, environment, location=None):
+        self.environment = environment
+        self.location = location or os.path.join(os.path.expanduser(os.environ.get("AWS_SYNCR_JOURNAL", "~/.aws_syncr/journal")), environment)
+        self.path = None
+        self.current = None
+
+    def journals(self):
+        """Return the journals for this environment from oldest to newest"""
+        if not os.path.isdir(self.location):
+            return []
+        return [os.path.join(self.location, name) for name in sorted(os.listdir(self.location)) if name.endswith(".jsonl")]
+
+    def read(self, path):
+        """Return the events in a journal, ignoring a half written last line"""
+        events = []
+        with open(path) as fle:
+            for line in fle:
+                try:
+                    events.append(json.loads(line))
+                except ValueError:
+                    log.warning("Ignoring broken line in journal\tjournal=%s", path)
+        return events
+
+    def start(self):
+        """Start a journal for a new run and return the items we don't need to sync, which is none of them"""
+        if not os.path.isdir(self.location):
+            os.makedirs(self.location)
+
+        for old in self.journals()[:-(keep - 1) or None]:
+            os.remove(old)
+
+        self.path = os.path.join(self.location, "{0}-{1}.jsonl".format(datetime.utcnow().strftime("%Y%m%dT%H%M%S.%f"), os.getpid()))
+        self.write({"event": "started", "time": time.time()})
+        return set()
+
+    def resume(self):
+        """Continue the last journal if its run didn't finish and return the (section, name, hash) it completed"""
+        journals = self.journals()
+        if not journals:
+            log.info("No journal to resume from, syncing everything")
+            return self.start()
+
+        events = self.read(journals[-1])
+        if any(event.get("event") == "finished" for event in events):
+            log.info("Last sync finished, syncing everything\tjournal=%s", journals[-1])
+            return self.start()
+
+        self.path = journals[-1]
+        done = set((event["section"], event["name"], event["hash"]) for event in events if event.get("event") == "done")
+        progress = [event for event in events if event.get("event") in ("item", "done")]
+        in_flight = "{section}/{name}".format(**progress[-1]) if progress and progress[-1]["event"] == "item" else None
+        log.info("Resuming sync\tjournal=%s\tdone=%s\tin_flight=%s", self.path, len(done), in_flight)
+        self.write({"event": "resumed", "time": time.time()})
+        return done
+
+    def write(self, event):
+        with open(self.path, "a") as fle:
+            fle.write("{0}\n".format(json.dumps(event, sort_keys=True)))
+            fle.flush()
+            os.fsync(fle.fileno())
+
+    @contextmanager
+    def item(self, section, name, hash):
+        """Record that we started and then finished syncing this item"""
+        self.current = {"section": section, "name": name, "hash": hash}
+        self.write(dict(self.current, event="item"))
+        try:
+            yield
+        finally:
+            current, self.current = self.current, None
+        self.write(dict(current, event="done"))
+
+    def change(self, symbol, typ, resource):
+        """Record a change to amazon that completed"""
+        self.write(dict(self.current or {}, event="change", symbol=symbol, type=typ, resource=resource))
+
+    def finish(self):
+        self.write({"event": "finished", "time": time.time()})
@@ -1,10 +1,9 @@
-from aws_syncr.errors import BadTemplate, UnknownStage, UnsyncedGateway
+from aws_syncr.option_spec.templates import template_engine
+from aws_syncr.option_spec.items import items_spec
+from aws_syncr.errors import UnknownStage, UnsyncedGateway
 from aws_syncr.formatter import MergedOptionStringFormatter
 from aws_syncr.option_spec.lambdas import Lambda
 
-from Crypto.Util import Counter
-from Crypto.Cipher import AES
-
 from input_algorithms.spec_base import NotSpecified
 from input_algorithms.validators import Validator
 from input_algorithms.errors import BadSpecValue
@@ -12,7 +11,6 @@ from input_algorithms import spec_base as sb
 from input_algorithms.spec_base import Spec
 from input_algorithms.dictobj import dictobj
 
-from option_merge import MergedOptions
 import logging
 import base64
 import six
@@ -47,6 +45,7 @@ secret_spec = lambda: sb.create_spec(Secret
     , kms = sb.optional_spec(formatted_string())
     , location = sb.optional_spec(formatted_string())
     , kms_data_key = sb.optional_spec(formatted_string())
+    , nonce = sb.optional_spec(formatted_string())
     )
 
 class certificate_spec(Spec):
@@ -90,23 +89,22 @@ class post_lambda_spec(Spec):
     def normalise(self, meta, val):
         result = sb.create_spec(LambdaPostMethod
             , function = formatted_string()
-            , location = formatted_string()
+            , location = sb.optional_spec(formatted_string())
             , account = sb.optional_spec(formatted_string())
             , require_api_key = sb.defaulted(sb.boolean(), False)
             , mapping = sb.defaulted(mapping_spec(), Mapping("application/json", "$input.json('$')"))
             ).normalise(meta, val)
 
         function = result.function
-        location = None
-
-        if result.location is not NotSpecified and location is not None:
-            raise BadSpecValue("Please don't specify a defined lambda function and location at the same time", meta=meta)
+        location = result.location
 
         if not isinstance(function, six.string_types):
+            if location is not NotSpecified:
+                raise BadSpecValue("Please don't specify a defined lambda function and location at the same time", meta=meta)
             location = function.location
             function = function.name
 
-        if location is None and result.location is NotSpecified:
+        if location is NotSpecified:
             raise BadSpecValue("Location is a required key!", meta=meta)
 
         result.function = function
@@ -147,6 +145,31 @@ class Mapping(dictobj):
 class ResourceOptions(dictobj):
     fields = ['method_request', 'integration_request', 'method_response', 'integration_response']
 
+    def swagger(self, http_method, gateway_location, accounts, environment):
+        """Return the swagger operation object for these options"""
+        integration = self.integration_request.put_kwargs(gateway_location, accounts, environment)
+        integration['type'] = integration['type'].lower()
+        integration['httpMethod'] = http_method
+
+        integration['responses'] = {}
+        for status_code, mappings in self.integration_response.responses.items():
+            pattern = "default" if str(status_code) == "200" else str(status_code)
+            integration['responses'][pattern] = {
+                  "statusCode": str(status_code)
+                , "responseTemplates": dict((m.content_type, m.template) for m in mappings)
+                }
+
+        operation = {
+              "produces": sorted(set(self.method_response.responses.values()))
+            , "responses": dict((str(status_code), {"description": "{0} response".format(status_code)}) for status_code in self.method_response.responses)
+            , "x-amazon-apigateway-integration": integration
+            }
+
+        if self.method_request.require_api_key:
+            operation["security"] = [{"api_key": []}]
+
+        return operation
+
 class MethodExecutionRequest(dictobj):
     fields = ['require_api_key']
 
@@ -223,13 +246,7 @@ class GatewayResource(dictobj):
 
 class gateways_spec(Spec):
     def normalise(self, meta, val):
-        if 'use' in val:
-            template = val['use']
-            if template not in meta.everything['templates']:
-                available = list(meta.everything['templates'].keys())
-                raise BadTemplate("Template doesn't exist!", wanted=template, available=available, meta=meta)
-
-            val = MergedOptions.using(meta.everything['templates'][template], val)
+        val = template_engine.apply(meta, val)
 
         gateway_name = meta.key_names()['_key_name_0']
         gateway_location = formatted_string().normalise(meta.at('location'), val.get('location', ''))
@@ -241,17 +258,25 @@ class gateways_spec(Spec):
             , api_keys = sb.listof(api_key_spec())
             , domain_names = sb.dictof(sb.string_spec(), custom_domain_name_spec(gateway_location))
             , resources = sb.listof(gateway_resource_spec())
+            , apply_mode = sb.defaulted(sb.string_choice_spec(["fine_grained", "overwrite", "merge"]), "fine_grained")
+            , labels = sb.listof(sb.string_spec())
             ).normalise(meta, val)
 
 class Secret(dictobj):
-    fields = ['plain', 'kms', 'location', 'kms_data_key']
+    fields = ['plain', 'kms', 'location', 'kms_data_key', 'nonce']
 
     def resolve(self, amazon):
         if self.plain is not NotSpecified:
             return self.plain
         else:
+            from Crypto.Util import Counter
+            from Crypto.Cipher import AES
+
             data_key = amazon.kms.decrypt(self.location, self.kms_data_key)
-            counter = Counter.new(128)
+            if self.nonce is NotSpecified:
+                counter = Counter.new(128)
+            else:
+                counter = Counter.new(64, prefix=base64.b64decode(self.nonce))
             decryptor = AES.new(data_key[:32], AES.MODE_CTR, counter=counter)
             return decryptor.decrypt(base64.b64decode(self.kms)).decode('utf-8')
 
@@ -265,9 +290,25 @@ class Gateways(dictobj):
         """Make sure this gateway exists and has only attributes we want it to have"""
         gateway_info = amazon.apigateway.gateway_info(gateway.name, gateway.location)
         if not gateway_info:
-            amazon.apigateway.create_gateway(gateway.name, gateway.location, gateway.stages, gateway.resources, gateway.api_keys, gateway.domain_names)
+            amazon.apigateway.create_gateway(gateway.name, gateway.location, gateway.stages, gateway.resources, gateway.api_keys, gateway.domain_names, apply_mode=gateway.apply_mode)
         else:
-            amazon.apigateway.modify_gateway(gateway_info, gateway.name, gateway.location, gateway.stages, gateway.resources, gateway.api_keys, gateway.domain_names)
+            amazon.apigateway.modify_gateway(gateway_info, gateway.name, gateway.location, gateway.stages, gateway.resources, gateway.api_keys, gateway.domain_names, apply_mode=gateway.apply_mode)
+
+    def render_one(self, aws_syncr, accounts, gateway):
+        """Return what we would sync for this gateway, leaving out any secrets"""
+        resources = {}
+        for resource in gateway.resources:
+            for http_method, options in resource.method_options:
+                resources.setdefault(resource.name, {})[http_method] = options.swagger(http_method, gateway.location, accounts, aws_syncr.environment)
+
+        return {
+              "location": gateway.location
+            , "stages": list(gateway.stages)
+            , "apply_mode": gateway.apply_mode
+            , "api_keys": [{"name": key.name, "stages": list(key.stages)} for key in gateway.api_keys]
+            , "domain_names": dict((domain.full_name, {"stage": domain.stage, "base_path": domain.base_path, "certificate": domain.certificate.name}) for domain in gateway.domain_names.values())
+            , "resources": resources
+            }
 
 class Gateway(dictobj):
     fields = {
@@ -277,6 +318,8 @@ class Gateway(dictobj):
         , 'resources': "The resources in the gateway"
         , "api_keys": "The api keys to associate with this gateway"
         , "domain_names": "The custom domain names to associate with the gateway"
+        , "apply_mode": "fine_grained to apply resources call by call, or overwrite/merge to import them as one swagger document"
+        , ("labels", list): "Labels for choosing this gateway with ``--select label:<label>``"
         }
 
     @property
@@ -299,5 +342,5 @@ class Gateway(dictobj):
         amazon.apigateway.deploy_stage(gateway_info, self.location, stage, aws_syncr.extra)
 
 def __register__():
-    return {(99, "apigateway"): sb.container_spec(Gateways, sb.dictof(sb.string_spec(), gateways_spec()))}
+    return {(99, "apigateway"): sb.container_spec(Gateways, items_spec(gateways_spec()))}
 
@@ -11,17 +11,20 @@ from aws_syncr.option_spec.roles import role_spec, Roles
 from aws_syncr.errors import BadOption
 
 from input_algorithms.spec_base import (
-      defaulted, boolean, string_spec, formatted, create_spec, dictionary_spec
-    , directory_spec, dictof, string_or_int_as_string_spec, container_spec
+      defaulted, boolean, string_spec, formatted, create_spec, dictionary_spec, integer_spec
+    , directory_spec, dictof, string_or_int_as_string_spec, container_spec, required, listof
+    , Spec, NotSpecified
     )
 from input_algorithms.validators import Validator
 from input_algorithms.dictobj import dictobj
+from input_algorithms.meta import Meta
 
 import six
 import re
 
 regexes = {
       "amazon_account_id": re.compile('\d{12}')
+    , "shard": re.compile(r'^(\d+)/(\d+)$')
     }
 
 class AwsSyncr(dictobj):
@@ -32,8 +35,15 @@ class AwsSyncr(dictobj):
         , "stage": "Stage to deploy for an api gateway when deploy_gateway is used"
         , "location": "The location to base everything in"
         , "artifact": "Arbitrary argument"
+        , "select": "Selectors for the items to sync, see aws_syncr.selection"
+        , "against_snapshot": "Snapshot to read from instead of amazon when doing a dry run"
+        , "resume": "Whether to skip items an interrupted sync already finished"
+        , "since": "Only sync items that changed since this git ref"
+        , "shard": "(index, count) for the slice of items to sync, from ``i/N``, or None"
+        , "report": "File to write the changes we made (or would make) to as json"
         , "environment": "The environment to sync"
         , "config_folder": "The folder where the configuration can be found"
+        , "convert_workers": "Number of processes to normalise the items of each section with"
         }
 
 class valid_account_id(Validator):
@@ -44,6 +54,33 @@ class valid_account_id(Validator):
             raise BadOption("Account id must match a particular regex", got=val, should_match=regexes['amazon_account_id'].pattern)
         return val
 
+class shard_spec(Spec):
+    def normalise(self, meta, val):
+        """Turn ``i/N`` into (i, N), or None if we aren't sharding"""
+        val = string_spec().normalise(meta, val)
+        if not val:
+            return None
+
+        m = regexes['shard'].match(val)
+        if not m:
+            raise BadOption("Shard must look like i/N", got=val, meta=meta)
+
+        index, count = int(m.group(1)), int(m.group(2))
+        if not 1 <= index <= count:
+            raise BadOption("Shard index must be between 1 and the number of shards", got=val, meta=meta)
+        return index, count
+
+class account_spec(Spec):
+    def normalise(self, meta, val):
+        """Normalise an account into just its id"""
+        if isinstance(val, dict) or getattr(val, "is_dict", False):
+            val = dictionary_spec().normalise(meta, val)
+            unknown = set(val.keys()) - set(["id", "assume_role"])
+            if unknown:
+                raise BadOption("Account has unknown options", unknown=sorted(unknown), meta=meta)
+            return required(formatted(valid_account_id(), MergedOptionStringFormatter, expected_type=six.string_types)).normalise(meta.at("id"), val.get("id", NotSpecified))
+        return formatted(valid_account_id(), MergedOptionStringFormatter, expected_type=six.string_types).normalise(meta, val)
+
 class AwsSyncrSpec(object):
     """Knows about aws_syncr specific configuration"""
 
@@ -57,16 +94,36 @@ class AwsSyncrSpec(object):
             , debug = defaulted(boolean(), False)
             , dry_run = defaulted(boolean(), False)
             , location = defaulted(formatted_string, "ap-southeast-2")
+            , select = listof(formatted_string)
+            , resume = defaulted(boolean(), False)
+            , against_snapshot = defaulted(formatted_string, "")
+            , since = defaulted(formatted_string, "")
+            , shard = defaulted(shard_spec(), None)
+            , report = defaulted(formatted_string, "")
             , artifact = formatted_string
             , environment = formatted_string
             , config_folder = directory_spec()
+            , convert_workers = defaulted(integer_spec(), 1)
             )
 
     @property
     def accounts_spec(self):
-        """Spec for accounts options"""
-        formatted_account_id = formatted(valid_account_id(), MergedOptionStringFormatter, expected_type=six.string_types)
-        return dictof(string_spec(), formatted_account_id)
+        """
+        Spec for accounts options
+
+        Each account is the account id, or ``{id: <account_id>, assume_role: <role>}``
+        """
+        return dictof(string_spec(), account_spec())
+
+    def assume_role_for(self, configuration, environment):
+        """Return the role to assume for this environment, or None"""
+        account = configuration.get(["accounts", environment], None, ignore_converters=True)
+        if not isinstance(account, dict) and not getattr(account, "is_dict", False):
+            return None
+
+        role = account.get("assume_role")
+        if role:
+            return formatted(string_spec(), MergedOptionStringFormatter).normalise(Meta(configuration, []).at("accounts").at(environment).at("assume_role"), role)
 
     @property
     def templates_spec(self):
@@ -1,25 +1,20 @@
+from aws_syncr.option_spec.templates import template_engine
+from aws_syncr.option_spec.items import items_spec
 from aws_syncr.option_spec.statements import resource_policy_statement_spec, resource_policy_dict
 from aws_syncr.formatter import MergedOptionStringFormatter
 from aws_syncr.option_spec.documents import Document
-from aws_syncr.errors import BadTemplate
 
 from input_algorithms.spec_base import NotSpecified
 from input_algorithms import spec_base as sb
 from input_algorithms.spec_base import Spec
 from input_algorithms.dictobj import dictobj
 
-from option_merge import MergedOptions
+import json
 import six
 
 class buckets_spec(Spec):
     def normalise(self, meta, val):
-        if 'use' in val:
-            template = val['use']
-            if template not in meta.everything['templates']:
-                available = list(meta.everything['templates'].keys())
-                raise BadTemplate("Template doesn't exist!", wanted=template, available=available, meta=meta)
-
-            val = MergedOptions.using(meta.everything['templates'][template], val)
+        val = template_engine.apply(meta, val)
 
         formatted_string = sb.formatted(sb.string_or_int_as_string_spec(), MergedOptionStringFormatter, expected_type=six.string_types)
         bucket_name = meta.key_names()['_key_name_0']
@@ -35,11 +30,16 @@ class buckets_spec(Spec):
             , location = sb.required(formatted_string)
             , permission = sb.container_spec(Document, sb.listof(resource_policy_statement_spec('bucket', bucket_name)))
             , tags = sb.dictof(sb.string_spec(), formatted_string)
+            , labels = sb.listof(sb.string_spec())
             ).normalise(meta, val)
 
 class Buckets(dictobj):
     fields = ['items']
 
+    def prefetch(self, amazon, buckets):
+        """Find out about the buckets we are about to sync in one go"""
+        amazon.s3.discover([bucket.name for bucket in buckets])
+
     def sync_one(self, aws_syncr, amazon, bucket):
         """Make sure this bucket exists and has only attributes we want it to have"""
         if bucket.permission.statements:
@@ -53,14 +53,23 @@ class Buckets(dictobj):
         else:
             amazon.s3.modify_bucket(bucket_info, bucket.name, permission_document, bucket.location, bucket.tags)
 
+    def render_one(self, aws_syncr, accounts, bucket):
+        """Return what we would sync for this bucket"""
+        return {
+              "location": bucket.location
+            , "policy": json.loads(bucket.permission.document) if bucket.permission.statements else None
+            , "tags": dict(bucket.tags)
+            }
+
 class Bucket(dictobj):
     fields = {
           'name': "Name of the bucket"
         , 'location': "The region the bucket exists in"
         , 'permission': "The permission statements to attach to the bucket"
         , 'tags': "The tags to associate with the bucket"
+        , ('labels', list): "Labels for choosing this bucket with ``--select label:<label>``"
         }
 
 def __register__():
-    return {(80, "buckets"): sb.container_spec(Buckets, sb.dictof(sb.string_spec(), buckets_spec()))}
+    return {(80, "buckets"): sb.container_spec(Buckets, items_spec(buckets_spec()))}
 
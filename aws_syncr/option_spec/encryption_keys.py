@@ -1,24 +1,19 @@
+from aws_syncr.option_spec.templates import template_engine
+from aws_syncr.option_spec.items import items_spec
 from aws_syncr.option_spec.statements import grant_statement_spec, resource_policy_statement_spec
 from aws_syncr.formatter import MergedOptionStringFormatter
 from aws_syncr.option_spec.documents import Document
-from aws_syncr.errors import BadTemplate
 
 from input_algorithms import spec_base as sb
 from input_algorithms.spec_base import Spec
 from input_algorithms.dictobj import dictobj
 
-from option_merge import MergedOptions
+import json
 import six
 
 class encryption_keys_spec(Spec):
     def normalise(self, meta, val):
-        if 'use' in val:
-            template = val['use']
-            if template not in meta.everything['templates']:
-                available = list(meta.everything['templates'].keys())
-                raise BadTemplate("Template doesn't exist!", wanted=template, available=available, meta=meta)
-
-            val = MergedOptions.using(meta.everything['templates'][template], val)
+        val = template_engine.apply(meta, val)
 
         formatted_string = sb.formatted(sb.string_or_int_as_string_spec(), MergedOptionStringFormatter, expected_type=six.string_types)
         key_name = meta.key_names()['_key_name_0']
@@ -29,6 +24,7 @@ class encryption_keys_spec(Spec):
             , description = formatted_string
             , grant = sb.listof(grant_statement_spec('key', key_name))
             , admin_users = sb.listof(sb.any_spec())
+            , labels = sb.listof(sb.string_spec())
             ).normalise(meta, val)
 
         statements = [{"principal": {"iam": "root"}, "action": "kms:*", "resource": "*", "Sid": ""}]
@@ -50,6 +46,15 @@ class EncryptionKeys(dictobj):
         else:
             amazon.kms.modify_key(key_info, key.name, key.description, key.location, key.grant, key.policy.document)
 
+    def render_one(self, aws_syncr, accounts, key):
+        """Return what we would sync for this key"""
+        return {
+              "location": key.location
+            , "description": key.description
+            , "policy": json.loads(key.policy.document)
+            , "grants": [grant.statement for grant in key.grant]
+            }
+
 class EncryptionKey(dictobj):
     fields = {
           'name': "Name of the key"
@@ -57,8 +62,9 @@ class EncryptionKey(dictobj):
         , 'description': "Description of the key"
         , 'admin_users': "The admin_users for this key"
         , 'grant': "The grants given to the key"
+        , ('labels', list): "Labels for choosing this key with ``--select label:<label>``"
         }
 
 def __register__():
-    return {(10, "encryption_keys"): sb.container_spec(EncryptionKeys, sb.dictof(sb.string_spec(), encryption_keys_spec()))}
+    return {(10, "encryption_keys"): sb.container_spec(EncryptionKeys, items_spec(encryption_keys_spec()))}
 
@@ -0,0 +1,106 @@
+"""
+Here we normalise the items of a registered section (roles, buckets, etc).
+
+Items in a section don't depend on each other's normalised form, so when
+``aws_syncr.convert_workers`` is more than one we normalise them in a pool
+of forked processes. Each worker gets the configuration as it was when the
+pool was made and sends back the pickled result.
+
+The workers rely on being forked, so we ask for a fork context explicitly
+(spawn and forkserver are the default on some platforms) and normalise in
+this process when we can't fork. We also don't fork when other threads are
+running (i.e. in the server), because a forked child inherits whatever locks
+those threads were holding.
+
+Any item that fails in a worker, or whose result can't be pickled, is
+normalised again in this process. That way errors keep the original meta.
+
+When ``aws_syncr.select`` is given, only the items it chooses are normalised.
+"""
+
+from aws_syncr.selection import selection
+
+from input_algorithms import spec_base as sb
+
+import multiprocessing
+import threading
+import logging
+import pickle
+import six
+import os
+
+log = logging.getLogger("aws_syncr.option_spec.items")
+
+# What a worker normalises, set by the pool's initializer in each worker
+snapshot = None
+
+def fork_context():
+    """Return something that makes pools of forked processes, or None if we can't safely fork"""
+    if os.name != "posix" or threading.active_count() > 1:
+        return None
+    if not hasattr(multiprocessing, "get_context"):
+        # python2 always forks on posix
+        return multiprocessing
+    if "fork" not in multiprocessing.get_all_start_methods():
+        return None
+    return multiprocessing.get_context("fork")
+
+def set_snapshot(spec, meta, val):
+    """Remember what to normalise in this worker"""
+    global snapshot
+    snapshot = (spec, meta, val)
+
+def normalise_in_worker(key):
+    """Normalise one item from the snapshot and return it pickled, or None if that fails"""
+    try:
+        spec, meta, val = snapshot
+        return key, pickle.dumps(spec.normalise(meta.at(key), val[key]), pickle.HIGHEST_PROTOCOL)
+    except Exception as error:
+        log.debug("Couldn't normalise in worker\tkey=%s\terror=%s", key, error)
+        return key, None
+
+class items_spec(sb.dictof):
+    def setup(self, spec):
+        super(items_spec, self).setup(sb.string_spec(), spec)
+
+    def workers(self, meta):
+        everything = meta.everything
+        if "aws_syncr" not in everything or fork_context() is None:
+            return 1
+        return getattr(everything["aws_syncr"], "convert_workers", 1) or 1
+
+    def normalise_filled(self, meta, val):
+        chosen = selection.chosen(meta.everything, meta.key_names()['_key_name_0'])
+        if chosen is not None:
+            val = dict((key, val[key]) for key in val.keys() if key in chosen)
+
+        workers = self.workers(meta)
+        if workers < 2 or len(val) < 2:
+            return super(items_spec, self).normalise_filled(meta, val)
+
+        converted = self.convert_in_pool(meta, sb.dictionary_spec().normalise_filled(meta, val), workers)
+        result = super(items_spec, self).normalise_filled(meta, dict((key, value) for key, value in val.items() if key not in converted))
+        result.update(converted)
+        return result
+
+    def convert_in_pool(self, meta, val, workers):
+        keys = [key for key in sorted(val.keys()) if isinstance(key, six.string_types)]
+
+        # Forked workers get these as they are, without pickling them
+        pool = fork_context().Pool(min(workers, len(keys)), initializer=set_snapshot, initargs=(self.value_spec, meta, val))
+        try:
+            found = pool.map(normalise_in_worker, keys)
+        finally:
+            pool.close()
+            pool.join()
+
+        converted = {}
+        for key, data in found:
+            if data is not None:
+                try:
+                    converted[key] = pickle.loads(data)
+                except Exception as error:
+                    log.debug("Couldn't load item from worker\tkey=%s\terror=%s", key, error)
+
+        log.info("Converted items in %s workers\tconverted=%s\ttotal=%s", min(workers, len(keys)), len(converted), len(keys))
+        return converted
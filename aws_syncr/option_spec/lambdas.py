@@ -1,13 +1,13 @@
+from aws_syncr.option_spec.templates import template_engine
+from aws_syncr.option_spec.items import items_spec
 from aws_syncr.formatter import MergedOptionStringFormatter
 from aws_syncr.option_spec.resources import resource_spec
-from aws_syncr.errors import BadTemplate
 
 from input_algorithms.spec_base import NotSpecified
 from input_algorithms.errors import BadSpecValue
 from input_algorithms import spec_base as sb
 from input_algorithms.dictobj import dictobj
 from input_algorithms.spec_base import Spec
-from option_merge import MergedOptions
 from contextlib import contextmanager
 from textwrap import dedent
 import tempfile
@@ -105,13 +105,7 @@ class function_code_spec(sb.Spec):
 
 class lambdas_spec(Spec):
     def normalise(self, meta, val):
-        if 'use' in val:
-            template = val['use']
-            if template not in meta.everything['templates']:
-                available = list(meta.everything['templates'].keys())
-                raise BadTemplate("Template doesn't exist!", wanted=template, available=available, meta=meta)
-
-            val = MergedOptions.using(meta.everything['templates'][template], val)
+        val = template_engine.apply(meta, val)
 
         formatted_string = sb.formatted(sb.string_or_int_as_string_spec(), MergedOptionStringFormatter, expected_type=six.string_types)
         function_name = meta.key_names()['_key_name_0']
@@ -127,6 +121,7 @@ class lambdas_spec(Spec):
             , description = formatted_string
             , sample_event = sb.defaulted(sb.or_spec(sb.dictionary_spec(), sb.string_spec()), "")
             , memory_size = sb.defaulted(divisible_by_spec(64), 128)
+            , labels = sb.listof(sb.string_spec())
             ).normalise(meta, val)
 
 class Lambdas(dictobj):
@@ -140,6 +135,19 @@ class Lambdas(dictobj):
         else:
             amazon.lambdas.modify_function(function_info, function.name, function.description, function.location, function.runtime, function.role, function.handler, function.timeout, function.memory_size, function.code)
 
+    def render_one(self, aws_syncr, accounts, function):
+        """Return the settings we would sync for this function"""
+        return {
+              "role": function.role
+            , "handler": function.handler
+            , "timeout": function.timeout
+            , "runtime": function.runtime
+            , "location": function.location
+            , "description": function.description
+            , "memory_size": function.memory_size
+            , "code": function.code.render()
+            }
+
 class Lambda(dictobj):
     fields = {
           'name': "Alias of the function"
@@ -152,16 +160,22 @@ class Lambda(dictobj):
         , 'description': "Description of the function"
         , 'sample_event': "A sample event to test with"
         , 'memory_size': "Max memory size for the function"
+        , ('labels', list): "Labels for choosing this function with ``--select label:<label>``"
         }
 
     def deploy(self, aws_syncr, amazon):
         print(json.dumps(amazon.lambdas.deploy_function(self.name, self.code, self.location), indent=4))
 
     def test(self, aws_syncr, amazon):
+        print(json.dumps(amazon.lambdas.test_function(self.name, self.event, self.location), indent=4))
+
+    @property
+    def event(self):
+        """The sample_event as a string or a plain dictionary"""
         sample_event = self.sample_event
         if not isinstance(sample_event, six.string_types):
             sample_event = sample_event.as_dict()
-        print(json.dumps(amazon.lambdas.test_function(self.name, sample_event, self.location), indent=4))
+        return sample_event
 
 class S3Code(dictobj):
     fields = ["key", "bucket", "version"]
@@ -170,6 +184,9 @@ class S3Code(dictobj):
     def s3_address(self):
         return "s3://{0}/{1}".format(self.bucket, self.key)
 
+    def render(self):
+        return {"s3_address": self.s3_address, "version": None if self.version is NotSpecified else self.version}
+
     @contextmanager
     def zipfile(self):
         yield
@@ -178,6 +195,9 @@ class InlineCode(dictobj):
     fields = ["code", "runtime"]
     s3_address = None
 
+    def render(self):
+        return {"inline": self.arcname}
+
     @property
     def arcname(self):
         if self.runtime == "python2.7":
@@ -207,6 +227,9 @@ class DirectoryCode(dictobj):
     fields = ["directory", "exclude"]
     s3_address = None
 
+    def render(self):
+        return {"directory": self.directory, "exclude": list(self.exclude)}
+
     def files(self):
         for root, dirs, files in os.walk(self.directory):
             for fle in files:
@@ -214,15 +237,19 @@ class DirectoryCode(dictobj):
                 if not any(fnmatch.fnmatch(location, os.path.join(self.directory, ex)) for ex in self.exclude):
                     yield location, os.path.relpath(location, self.directory)
 
+    def write_zipfile(self, location):
+        """Write our files into a zipfile at this location"""
+        log.info("Making zipfile\tdirectory=%s", self.directory)
+        with zipfile.ZipFile(location, "w") as zf:
+            for filename, arcname in self.files():
+                zf.write(filename, arcname)
+
     @contextmanager
     def zipfile(self):
         with tempfile.NamedTemporaryFile(suffix=".zip") as fle:
-            log.info("Making zipfile")
-            with zipfile.ZipFile(fle.name, "w") as zf:
-                for filename, arcname in self.files():
-                    zf.write(filename, arcname)
+            self.write_zipfile(fle.name)
             yield fle.name
 
 def __register__():
-    return {(22, "lambda"): sb.container_spec(Lambdas, sb.dictof(sb.string_spec(), lambdas_spec()))}
+    return {(22, "lambda"): sb.container_spec(Lambdas, items_spec(lambdas_spec()))}
 
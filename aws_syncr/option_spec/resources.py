@@ -132,22 +132,17 @@ class resource_spec(sb.Spec):
 
     def normalise(self, meta, val):
         result = []
+        types = (("iam", iam_specs), ("kms", kms_specs), ("s3", s3_specs), ("arn", arn_specs))
         for index, item in enumerate(sb.listof(sb.any_spec()).normalise(meta, val)):
-            s3_spec = s3_specs(item, self.self_type, self.self_name)
-            iam_spec = iam_specs(item, self.self_type, self.self_name)
-            kms_spec = kms_specs(item, self.self_type, self.self_name)
-            arn_spec = arn_specs(item, self.self_type, self.self_name)
-
             if isinstance(item, six.string_types):
                 result.append(item)
             else:
-                types = (("iam", iam_spec), ("kms", kms_spec), ("s3", s3_spec), ("arn", arn_spec))
-                for typ, spec in types:
+                for typ, kls in types:
                     if typ in item:
                         if self.only and typ not in self.only:
                             raise BadPolicy("Sorry, don't support this resource type here", wanted=typ, available=self.only, meta=meta)
 
+                        spec = kls(item, self.self_type, self.self_name)
                         for found in spec.normalise(meta.indexed_at(index).at(typ), item[typ]):
                             result.append(found)
         return sorted(result)
-
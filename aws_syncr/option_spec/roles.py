@@ -1,27 +1,23 @@
+from aws_syncr.option_spec.templates import template_engine
+from aws_syncr.option_spec.items import items_spec
 from aws_syncr.option_spec.statements import trust_statement_spec, permission_statement_spec, permission_dict, trust_dict
 from aws_syncr.formatter import MergedOptionStringFormatter
 from aws_syncr.option_spec.documents import Document
-from aws_syncr.errors import BadOption, BadTemplate
+from aws_syncr.errors import BadOption
 
 from input_algorithms.spec_base import NotSpecified
 from input_algorithms.dictobj import dictobj
 from input_algorithms import spec_base as sb
 
-from option_merge import MergedOptions
 import logging
+import json
 import six
 
 log = logging.getLogger("aws_syncr.option_spec.roles")
 
 class role_spec(object):
     def normalise(self, meta, val):
-        if 'use' in val:
-            template = val['use']
-            if template not in meta.everything['templates']:
-                available = list(meta.everything['templates'].keys())
-                raise BadTemplate("Template doesn't exist!", wanted=template, available=available, meta=meta)
-
-            val = MergedOptions.using(meta.everything['templates'][template], val)
+        val = template_engine.apply(meta, val)
 
         formatted_string = sb.formatted(sb.string_spec(), MergedOptionStringFormatter, expected_type=six.string_types)
         role_name = meta.key_names()['_key_name_0']
@@ -42,6 +38,7 @@ class role_spec(object):
             , trust = sb.container_spec(Document, sb.listof(trust_statement_spec('role', role_name)))
             , permission = sb.container_spec(Document, sb.listof(permission_statement_spec('role', role_name)))
             , make_instance_profile = sb.defaulted(sb.boolean(), False)
+            , labels = sb.listof(sb.string_spec())
             ).normalise(meta, val)
 
 class Roles(dictobj):
@@ -62,16 +59,26 @@ class Roles(dictobj):
         if role.make_instance_profile:
             amazon.iam.make_instance_profile(role.name)
 
+    def render_one(self, aws_syncr, accounts, role):
+        """Return what we would sync for this role"""
+        return {
+              "policy_name": "syncr_policy_{0}".format(role.name.replace('/', '__'))
+            , "trust": json.loads(role.trust.document)
+            , "permission": json.loads(role.permission.document)
+            , "make_instance_profile": role.make_instance_profile
+            }
+
 class Role(dictobj):
     fields = {
         "name": "The name of the role"
       , "description": "The description of the role!"
       , "make_instance_profile": "Whether to make an instance profile for this role as well"
+      , ("labels", list): "Labels for choosing this role with ``--select label:<label>``"
 
       , "trust": "The trust document"
       , "permission": "Combination of allow_permission and deny_permission"
       }
 
 def __register__():
-    return {(21, "roles"): sb.container_spec(Roles, sb.dictof(sb.string_spec(), role_spec()))}
+    return {(21, "roles"): sb.container_spec(Roles, items_spec(role_spec()))}
 
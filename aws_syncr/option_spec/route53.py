@@ -1,22 +1,16 @@
+from aws_syncr.option_spec.templates import template_engine
+from aws_syncr.option_spec.items import items_spec
 from aws_syncr.formatter import MergedOptionStringFormatter
-from aws_syncr.errors import BadTemplate
 
 from input_algorithms.errors import BadSpecValue
 from input_algorithms.dictobj import dictobj
 from input_algorithms import spec_base as sb
 
-from option_merge import MergedOptions
 import six
 
 class route_spec(sb.Spec):
     def normalise(self, meta, val):
-        if 'use' in val:
-            template = val['use']
-            if template not in meta.everything['templates']:
-                available = list(meta.everything['templates'].keys())
-                raise BadTemplate("Template doesn't exist!", wanted=template, available=available, meta=meta)
-
-            val = MergedOptions.using(meta.everything['templates'][template], val)
+        val = template_engine.apply(meta, val)
 
         formatted_string = sb.formatted(sb.string_spec(), MergedOptionStringFormatter)
         route_name = meta.key_names()['_key_name_0']
@@ -26,6 +20,7 @@ class route_spec(sb.Spec):
             , zone = formatted_string
             , record_type = sb.string_choice_spec(["CNAME"])
             , record_target = formatted_string
+            , labels = sb.listof(sb.string_spec())
             ).normalise(meta, val)
 
         if not val.zone.endswith("."):
@@ -53,14 +48,22 @@ class DNSRoutes(dictobj):
         else:
             amazon.route53.modify_route(route_info, route.name, route.zone, route.record_type, target)
 
+    def render_one(self, aws_syncr, accounts, route):
+        """Return what we would sync for this route, without asking amazon for any cname"""
+        target = route.record_target
+        if callable(target):
+            target = {"cname_of": target.__self__.full_name}
+        return {"zone": route.zone, "record_type": route.record_type, "record_target": target}
+
 class DNSRoute(dictobj):
     fields = {
         "name": "The name of the record"
       , "zone": "The zone this record sits in"
       , "record_type": "The type of the record"
       , "record_target": "Where the record points at"
+      , ("labels", list): "Labels for choosing this record with ``--select label:<label>``"
       }
 
 def __register__():
-    return {(100, "dns"): sb.container_spec(DNSRoutes, sb.dictof(sb.string_spec(), route_spec()))}
+    return {(100, "dns"): sb.container_spec(DNSRoutes, items_spec(route_spec()))}
 
@@ -48,6 +48,12 @@ class statement_spec(sb.Spec):
                 raise BadOption("Cannot specify arg in this statement", arg=arg, capitalized=capitalized, meta=meta)
 
     def make_spec(self):
+        """Make the spec once for all the statements this spec normalises"""
+        if getattr(self, "compiled", None) is None:
+            self.compiled = self.compile_spec()
+        return self.compiled
+
+    def compile_spec(self):
         nsd = lambda spec: sb.defaulted(spec, NotSpecified)
         args = {}
         for arg, spec in self.args(self.self_type, self.self_name).items():
@@ -63,10 +69,12 @@ class statement_spec(sb.Spec):
     def make_kwargs(self, meta, args, normalised):
         kwargs = {}
         for (arg, capitalized) in args:
-            if normalised.get(arg, NotSpecified) is not NotSpecified and normalised.get(capitalized, NotSpecified) is not NotSpecified:
-                raise BadOption("Cannot specify arg as special and capitalized at the same time", arg=arg, special_val=normalised.get(arg), capitalized_val=normalised.get(capitalized), meta=meta)
+            special = normalised.get(arg, NotSpecified)
+            capitalized_val = normalised.get(capitalized, NotSpecified)
+            if special is not NotSpecified and capitalized_val is not NotSpecified:
+                raise BadOption("Cannot specify arg as special and capitalized at the same time", arg=arg, special_val=special, capitalized_val=capitalized_val, meta=meta)
             else:
-                kwargs[arg] = normalised[capitalized] if normalised.get(capitalized, NotSpecified) is not NotSpecified else normalised[arg]
+                kwargs[arg] = capitalized_val if capitalized_val is not NotSpecified else special
         return kwargs
 
     def complain_about_missing_args(self, meta, kwargs):
@@ -195,15 +203,16 @@ class principal_spec(sb.Spec):
     def setup(self, self_type, self_name):
         self.self_type = self_type
         self.self_name = self_name
+        self.capitalized_spec = sb.set_options(
+              Service = sb.listof(sb.string_spec())
+            , Federated = sb.listof(sb.string_spec())
+            , AWS = sb.listof(sb.string_spec())
+            )
 
     def normalise(self, meta, val):
         iam_spec = iam_specs(val, self.self_type, self.self_name)
 
-        result = sb.set_options(
-              Service = sb.listof(sb.string_spec())
-            , Federated = sb.listof(sb.string_spec())
-            , AWS = sb.listof(sb.string_spec())
-            ).normalise(meta, val)
+        result = self.capitalized_spec.normalise(meta, val)
 
         special = sb.set_options(
               service = sb.listof(principal_service_spec())
@@ -0,0 +1,59 @@
+"""
+Here we apply the ``use: <template>`` option that every item may have.
+
+A template may itself ``use`` another template. Each template is flattened
+once per configuration into a plain dictionary, which is then shared as the
+bottom layer of every item that uses it.
+"""
+
+from aws_syncr.caching import ConfigurationCache
+from aws_syncr.errors import BadTemplate
+
+from option_merge import MergedOptions
+
+class TemplateEngine(object):
+    """
+    Usage is like::
+
+        val = template_engine.apply(meta, val)
+
+    Where ``meta.everything['templates']`` holds the available templates.
+    """
+    def __init__(self):
+        self.cache = ConfigurationCache()
+
+    def apply(self, meta, val):
+        """Return val layered on top of the template it uses"""
+        if 'use' not in val:
+            return val
+        return MergedOptions.using(self.base_for(meta, val['use']), val)
+
+    def base_for(self, meta, name, chain=None):
+        """Return the flattened template with this name"""
+        bases = self.cache.get(meta.everything)
+        if bases is not None and name in bases:
+            return bases[name]
+
+        chain = chain or []
+        if name in chain:
+            raise BadTemplate("Template uses itself", chain=chain + [name], meta=meta)
+
+        templates = meta.everything['templates']
+        if name not in templates:
+            available = list(templates.keys())
+            raise BadTemplate("Template doesn't exist!", wanted=name, available=available, meta=meta)
+
+        template = templates[name]
+        if 'use' in template:
+            template = MergedOptions.using(self.base_for(meta, template['use'], chain + [name]), template)
+        else:
+            template = MergedOptions.using(template)
+
+        base = template.as_dict()
+        base.pop('use', None)
+
+        if bases is not None:
+            bases[name] = base
+        return base
+
+template_engine = TemplateEngine()
@@ -0,0 +1,183 @@
+"""
+Choose which items to normalise and sync from the ``--select`` and ``--shard`` options.
+
+Each selector is one of:
+
+``<section>:<glob>``
+    Items in that section whose name matches the glob, i.e. ``roles:team-a-*``
+
+``label:<glob>``
+    Items with a matching label in their ``labels`` option (or the
+    ``labels`` of the template they use)
+
+``<glob>``
+    Items in any section whose name matches the glob
+
+Items that a selected item refers to with a format string, like
+``{lambda.ingest.arn}``, are selected as well so that they can be resolved.
+
+We can also choose a slice of the items with ``--shard i/N``. Items that
+refer to each other are grouped together and each group goes to the shard
+given by a stable hash of its first item, so the same configuration is always
+sliced the same way.
+
+Everything is worked out from the configuration before it's normalised, so
+that items we don't want are never normalised.
+"""
+
+from aws_syncr.caching import ConfigurationCache
+from aws_syncr.errors import BadOption
+
+import fnmatch
+import hashlib
+import logging
+import six
+import re
+
+log = logging.getLogger("aws_syncr.selection")
+
+format_reference_regex = re.compile(r"{([^{}:!]+)")
+
+class Selection(object):
+    def __init__(self):
+        self.cache = ConfigurationCache()
+
+    def chosen(self, configuration, section):
+        """Return the names of the items we want from this section, or None if we want all of them"""
+        if "aws_syncr" not in configuration:
+            return None
+
+        aws_syncr = configuration["aws_syncr"]
+        selectors = getattr(aws_syncr, "select", None)
+        shard = getattr(aws_syncr, "shard", None)
+        if not selectors and not shard:
+            return None
+
+        cache = self.cache.get(configuration)
+        if cache is not None and "chosen" in cache:
+            chosen = cache["chosen"]
+        else:
+            chosen = None
+            if selectors:
+                chosen = self.choose(configuration, selectors)
+            if shard:
+                chosen = self.sharded(configuration, shard, chosen)
+            if cache is not None:
+                cache["chosen"] = chosen
+
+        return chosen.get(section, set())
+
+    def raw(self, configuration):
+        """Return (registered, sections, templates) from the configuration before it's normalised"""
+        registered = configuration["__registered__"]
+        templates = configuration.as_dict("templates") if "templates" in configuration else {}
+        sections = dict((typ, configuration.as_dict(typ)) for typ in registered if typ in configuration)
+        return registered, sections, templates
+
+    def choose(self, configuration, selectors):
+        """Return {section: set(names)} for what these selectors and their references want"""
+        registered, sections, templates = self.raw(configuration)
+
+        chosen = {}
+        for selector in selectors:
+            section, pattern = selector.split(":", 1) if ":" in selector else (None, selector)
+            if section not in (None, "label") and section not in registered:
+                raise BadOption("Selector is for an unknown section", selector=selector, available=["label"] + list(registered))
+
+            for typ, items in sections.items():
+                if section not in (None, "label") and typ != section:
+                    continue
+
+                for name, options in items.items():
+                    if section == "label":
+                        labels = self.inherited(templates, options, "labels") or []
+                        found = any(fnmatch.fnmatchcase(label, pattern) for label in labels)
+                    else:
+                        found = fnmatch.fnmatchcase(name, pattern)
+
+                    if found:
+                        chosen.setdefault(typ, set()).add(name)
+
+        # Add anything the chosen items refer to
+        remaining = [(typ, name) for typ in chosen for name in chosen[typ]]
+        while remaining:
+            typ, name = remaining.pop()
+            for reference in self.references(sections, templates, sections[typ][name]):
+                if reference[1] not in chosen.get(reference[0], ()):
+                    chosen.setdefault(reference[0], set()).add(reference[1])
+                    remaining.append(reference)
+
+        log.info("Selected items\t%s", "\t".join("{0}={1}".format(typ, len(names)) for typ, names in sorted(chosen.items())))
+        return chosen
+
+    def sharded(self, configuration, shard, chosen=None):
+        """Return {section: set(names)} for the items in this shard, out of chosen or everything"""
+        registered, sections, templates = self.raw(configuration)
+        index, count = shard
+
+        # Group items that refer to each other
+        group = {}
+        def root_of(item):
+            while group.get(item, item) != item:
+                item = group[item]
+            return item
+
+        for typ, items in sections.items():
+            for name, options in items.items():
+                for reference in self.references(sections, templates, options):
+                    first, second = sorted([root_of((typ, name)), root_of(reference)])
+                    if first != second:
+                        group[second] = first
+
+        found = {}
+        for typ, items in sections.items():
+            for name in items:
+                if chosen is not None and name not in chosen.get(typ, ()):
+                    continue
+
+                root = root_of((typ, name))
+                digest = hashlib.md5("{0}:{1}".format(*root).encode('utf-8')).hexdigest()
+                if int(digest, 16) % count == index - 1:
+                    found.setdefault(typ, set()).add(name)
+
+        log.info("Items in shard %s/%s\t%s", index, count, "\t".join("{0}={1}".format(typ, len(names)) for typ, names in sorted(found.items())))
+        return found
+
+    def inherited(self, templates, options, key, seen=()):
+        """Find key in these options or the templates they use"""
+        if key in options:
+            return options[key]
+
+        use = options.get("use")
+        if isinstance(use, six.string_types) and use in templates and use not in seen:
+            return self.inherited(templates, templates[use], key, seen + (use, ))
+
+    def references(self, sections, templates, options, seen=()):
+        """Yield (section, name) for every item these options refer to with a format string"""
+        for value in self.strings(options):
+            for key in format_reference_regex.findall(value):
+                if "." in key:
+                    typ, rest = key.split(".", 1)
+                    for name in sections.get(typ, {}):
+                        if rest == name or rest.startswith("{0}.".format(name)):
+                            yield typ, name
+
+        use = options.get("use")
+        if isinstance(use, six.string_types) and use in templates and use not in seen:
+            for reference in self.references(sections, templates, templates[use], seen + (use, )):
+                yield reference
+
+    def strings(self, value):
+        """Yield every string inside this value"""
+        if isinstance(value, six.string_types):
+            yield value
+        elif isinstance(value, dict):
+            for val in value.values():
+                for string in self.strings(val):
+                    yield string
+        elif isinstance(value, (list, tuple)):
+            for val in value:
+                for string in self.strings(val):
+                    yield string
+
+selection = Selection()
@@ -0,0 +1,228 @@
+"""
+A long lived process that runs tasks for aws_syncr_client over a unix socket.
+
+CI runs aws_syncr many times in a row, and each time we import boto3, read
+all the yaml and check the account again. Instead start a server once::
+
+    $ aws_syncr ./dev --task serve &
+
+And then run tasks with ``aws_syncr_client`` (see aws_syncr.client). Each
+request is a line of json with the arguments and working directory of the
+client. We send back lines of json with what the task prints and logs,
+finishing with ``{"finished": true}`` or ``{"error", "kind"}``.
+
+Each request runs in its own thread and the server keeps:
+
+* The yaml it has parsed, which is parsed again when a file's contents change
+* Pools of connections to amazon for each environment. A task has a
+  connection to itself while it runs, so tasks that run at the same time
+  don't share their changes. A pool is emptied when the accounts file (or
+  snapshot) it was made from changes, and connections with assumed role
+  credentials aren't kept longer than those credentials are good for.
+  Only the session, clients and validated account are kept between tasks.
+  What a task found in the account is forgotten, because anything may have
+  changed it since.
+
+Tasks use the credentials the server was started with. A client whose
+``AWS_*`` environment variables are different from the server's is refused,
+rather than quietly running with credentials it didn't ask for.
+
+Paths in ``--artifact`` and after ``--`` must be absolute, because every task
+shares the working directory of the server.
+"""
+
+from aws_syncr.amazon.credentials import expiry_margin
+from aws_syncr.client import aws_environment
+from aws_syncr.actions import available_actions
+from aws_syncr.errors import AwsSyncrError, BadTask, BadOption
+from aws_syncr.watch import modified_times
+from aws_syncr.collector import Collector
+
+from six.moves import socketserver
+from delfick_error import DelfickError
+import threading
+import logging
+import socket
+import json
+import time
+import sys
+import os
+
+log = logging.getLogger("aws_syncr.server")
+
+# Don't keep connections with assumed credentials for longer than this
+max_assumed_age = expiry_margin - 60
+
+class AmazonPool(object):
+    """Connections to amazon that tasks take and give back when they're done"""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.idle = {}
+        self.signatures = {}
+
+    def take(self, key, signature):
+        """Return (connection, when it was made) for this key, or (None, None) if we don't have one"""
+        with self.lock:
+            if self.signatures.get(key) != signature:
+                if key in self.idle:
+                    log.info("Configuration for connections changed, making new ones\tenvironment=%s", key[0])
+                self.idle[key] = []
+                self.signatures[key] = signature
+
+            while self.idle[key]:
+                amazon, made = self.idle[key].pop()
+                if amazon.assume_role and time.time() - made > max_assumed_age:
+                    continue
+
+                amazon.changes = False
+                amazon.journal = None
+                amazon.recorded = []
+                amazon.forget_discovered()
+                return amazon, made
+
+            return None, None
+
+    def give(self, key, signature, amazon, made):
+        """Keep this connection for the next task with this key"""
+        with self.lock:
+            if self.signatures.get(key) == signature:
+                self.idle[key].append((amazon, made))
+
+class ThreadOutput(object):
+    """Stands in for sys.stdout and sends what a request's thread writes to its client"""
+    def __init__(self, original):
+        self.local = threading.local()
+        self.original = original
+
+    def write(self, data):
+        send = getattr(self.local, "send", None)
+        if send is None:
+            self.original.write(data)
+        else:
+            send({"output": data})
+
+    def flush(self):
+        if getattr(self.local, "send", None) is None:
+            self.original.flush()
+
+class ThreadLogHandler(logging.Handler):
+    """Sends the logs from a request's thread to its client"""
+    def __init__(self, output):
+        logging.Handler.__init__(self)
+        self.output = output
+        self.setFormatter(logging.Formatter("%(asctime)s %(levelname)-7s %(name)-15s %(message)s"))
+
+    def emit(self, record):
+        send = getattr(self.output.local, "send", None)
+        if send is not None and record.levelno >= getattr(self.output.local, "level", logging.INFO):
+            send({"log": self.format(record)})
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        lock = threading.Lock()
+        def send(message):
+            with lock:
+                self.wfile.write("{0}\n".format(json.dumps(message)).encode('utf-8'))
+                self.wfile.flush()
+
+        output = self.server.output
+        output.local.send = send
+        try:
+            self.server.run(json.loads(self.rfile.readline().decode('utf-8')), output)
+            send({"finished": True})
+        except DelfickError as error:
+            send({"error": str(error), "kind": error.__class__.__name__})
+        except Exception as error:
+            log.exception("Task failed")
+            send({"error": repr(error), "kind": error.__class__.__name__})
+        finally:
+            output.local.send = None
+
+class Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, location):
+        self.location = location
+        self.pool = AmazonPool()
+        self.parsed_files = {}
+        self.output = ThreadOutput(sys.stdout)
+
+        if os.path.exists(location):
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                sock.connect(location)
+            except socket.error:
+                log.info("Removing socket left behind by an old server\tlocation=%s", location)
+                os.remove(location)
+            else:
+                raise AwsSyncrError("A server is already listening", location=location)
+            finally:
+                sock.close()
+        elif not os.path.exists(os.path.dirname(location)):
+            os.makedirs(os.path.dirname(location))
+
+        socketserver.UnixStreamServer.__init__(self, location, RequestHandler)
+
+    def serve(self):
+        """Answer requests until we're interrupted"""
+        handler = ThreadLogHandler(self.output)
+        logging.getLogger("").addHandler(handler)
+        sys.stdout = self.output
+        log.info("Waiting for tasks\tlocation=%s", self.location)
+        try:
+            self.serve_forever()
+        finally:
+            sys.stdout = self.output.original
+            logging.getLogger("").removeHandler(handler)
+            self.server_close()
+            os.remove(self.location)
+
+    def interpret(self, request):
+        """Return (args, cli_args) for the arguments in this request"""
+        from aws_syncr.executor import App
+        try:
+            args, extra_args, cli_args = App().make_cli_parser().interpret_args(list(request["argv"]), App.cli_categories)
+        except SystemExit:
+            raise BadOption("Couldn't understand the arguments", argv=request["argv"])
+
+        options = cli_args["aws_syncr"]
+        options["extra"] = extra_args
+        options["debug"] = args.debug
+        for name in ("config_folder", "environment", "report", "against_snapshot"):
+            if options.get(name):
+                options[name] = os.path.join(request["cwd"], options[name])
+        return args, cli_args
+
+    def run(self, request, output):
+        """Run the task in this request"""
+        if request.get("aws_environment") != aws_environment(os.environ):
+            raise BadOption("The client's AWS_* environment variables are different from the server's, please restart the server with them")
+
+        args, cli_args = self.interpret(request)
+        output.local.level = logging.DEBUG if args.verbose or args.debug else logging.INFO
+
+        options = cli_args["aws_syncr"]
+        task = options["chosen_task"]
+        if task not in available_actions or task == "serve":
+            raise BadTask("Unknown task", available=sorted(name for name in available_actions if name != "serve"), wanted=task)
+
+        accounts_file = os.path.join(options["environment"], "..", "accounts.yaml")
+        key = (os.path.realpath(options["environment"]), bool(options["dry_run"]), options["against_snapshot"], args.debug)
+        signature = modified_times([accounts_file] + ([options["against_snapshot"]] if options["against_snapshot"] else []))
+
+        start = time.time()
+        collector = Collector()
+        collector.amazon, made = self.pool.take(key, signature)
+        collector.parsed_files = self.parsed_files
+        collector.prepare(options["config_folder"], cli_args, options["environment"])
+        log.info("Running task\ttask=%s\tenvironment=%s\tartifact=%s\twarm=%s", task, key[0], options["artifact"], collector.amazon is not None)
+
+        amazon = collector.configuration.get("amazon")
+        snapshot = getattr(amazon, "snapshot", None)
+        try:
+            available_actions[task](collector)
+        finally:
+            # Tasks like snapshot change how the connection behaves, so we don't keep those
+            if amazon is not None and amazon.dry_run == key[1] and amazon.snapshot is snapshot:
+                self.pool.give(key, signature, amazon, made or start)
+            log.info("Finished task\ttask=%s\ttook=%.2fs", task, time.time() - start)
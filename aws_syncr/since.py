@@ -0,0 +1,96 @@
+"""
+Work out which items changed in the configuration since some git ref.
+
+We ask git which files under the configuration folder are different from the
+ref (including files git doesn't know about yet) and then use the sources
+MergedOptions remembers for each value to find the items they define.
+
+An item is also changed if it uses a template that changed, or that uses
+a changed template and so on.
+
+Changes we can't attribute to particular items, like accounts or any other
+top level option that items may refer to with a format string, mean we
+sync everything.
+"""
+
+from aws_syncr.errors import BadOption
+
+import subprocess
+import logging
+import six
+import os
+
+log = logging.getLogger("aws_syncr.since")
+
+def git(folder, *args):
+    try:
+        return subprocess.check_output(("git", ) + args, cwd=folder, stderr=subprocess.STDOUT).decode('utf-8')
+    except (OSError, subprocess.CalledProcessError) as error:
+        raise BadOption("Failed to ask git about changes", folder=folder, command=" ".join(("git", ) + args), error=getattr(error, "output", error))
+
+def changed_files(folder, ref):
+    """Return the real paths of the files under folder that are different from ref"""
+    root = git(folder, "rev-parse", "--show-toplevel").strip()
+    changed = git(folder, "diff", "--name-only", ref, "--", ".").splitlines()
+    changed.extend(git(folder, "ls-files", "--full-name", "--others", "--exclude-standard", "--", ".").splitlines())
+    return set(os.path.realpath(os.path.join(root, name)) for name in changed if name)
+
+def sources_of(configuration, path):
+    """Return the real paths of the files that define this path"""
+    sources = configuration.source_for(path)
+    if not isinstance(sources, list):
+        sources = [sources]
+    return set(os.path.realpath(source) for source in sources if isinstance(source, six.string_types))
+
+def changed_templates(configuration, changed):
+    """Return the names of templates that changed or use a template that changed"""
+    templates = configuration.get("templates", {}, ignore_converters=True)
+    names = set(name for name in templates.keys() if sources_of(configuration, ["templates", name]) & changed)
+
+    found = True
+    while found:
+        found = False
+        for name in templates.keys():
+            if name not in names and templates[name].get("use") in names:
+                names.add(name)
+                found = True
+
+    return names
+
+def changed_items(configuration, folder, ref):
+    """
+    Return {section: set(item names)} for everything that changed since ref
+
+    Or None if we can't tell and should sync everything
+    """
+    changed = changed_files(folder, ref)
+    log.info("Found changed files since %s\tchanged=%s", ref, len(changed))
+    return items_from_files(configuration, changed)
+
+def items_from_files(configuration, changed):
+    """
+    Return {section: set(item names)} for the items these files change
+
+    Or None if we can't tell and should sync everything
+    """
+    if not changed:
+        return {}
+
+    registered = configuration["__registered__"]
+    for key in configuration.keys():
+        if key in registered or key in ("templates", "aws_syncr", "amazon", "__registered__", "$@", "config_folder"):
+            continue
+        if sources_of(configuration, [key]) & changed:
+            log.info("Changed option isn't part of a section, so syncing everything\toption=%s", key)
+            return None
+
+    templates = changed_templates(configuration, changed)
+
+    found = {}
+    for typ in registered:
+        if typ in configuration:
+            section = configuration.get(typ, {}, ignore_converters=True)
+            for name in section.keys():
+                if section[name].get("use") in templates or sources_of(configuration, [typ, name]) & changed:
+                    found.setdefault(typ, set()).add(name)
+    return found
@@ -0,0 +1,144 @@
+"""
+Watch the configuration for an environment and sync whatever changes.
+
+We sync everything once and then look at the files for the environment every
+``interval`` seconds. When some of them change we collect the configuration
+again with a new Collector, but:
+
+* Files that didn't change aren't parsed again
+* Only the items in the changed files, or using a template that changed,
+  whose options (including what they get from templates) are different from
+  last time are normalised and synced (we select them with ``aws_syncr.select``)
+* We keep the same Amazon object, so the boto clients and the validated
+  account are kept. What we found in the account is looked up again each
+  time, because anything may have changed it since
+
+If a sync fails we log why and keep watching. The items it was syncing are
+tried again the next time their files change. If the accounts change we start again with a new Amazon. We poll rather than
+use inotify so that we don't need anything else installed.
+"""
+
+from aws_syncr.since import items_from_files
+from aws_syncr.selection import selection
+
+from delfick_error import DelfickError
+import logging
+import json
+import time
+import re
+import os
+
+log = logging.getLogger("aws_syncr.watch")
+
+def modified_times(locations):
+    """Return {real path: (mtime, size)} for these files and the files in these folders"""
+    found = {}
+    for location in locations:
+        if os.path.isdir(location):
+            paths = [os.path.join(root, filename) for root, _, files in os.walk(location) for filename in files]
+        else:
+            paths = [location]
+
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            found[os.path.realpath(path)] = (stat.st_mtime, stat.st_size)
+    return found
+
+def selector_for(section, name):
+    """Return a selector that chooses only this item"""
+    return "{0}:{1}".format(section, re.sub(r"([*?[])", r"[\1]", name))
+
+class Watcher(object):
+    def __init__(self, collector, action, interval=1):
+        self.action = action
+        self.interval = interval
+        self.parsed_files = {}
+
+        aws_syncr = collector.configuration["aws_syncr"]
+        self.aws_syncr = aws_syncr.clone()
+        self.aws_syncr.since = ""
+        self.aws_syncr.resume = False
+
+        self.environment_folder = os.path.join(aws_syncr.config_folder, aws_syncr.environment)
+        self.accounts_file = os.path.realpath(os.path.join(self.environment_folder, "..", "accounts.yaml"))
+        self.amazon = collector.configuration["amazon"]
+        self.synced = {}
+
+    def signatures(self, configuration):
+        """Return {(section, name): json of the item and the templates it uses} before anything is normalised"""
+        registered, sections, templates = selection.raw(configuration)
+        signatures = {}
+        for section, items in sections.items():
+            for name, options in items.items():
+                chain = [options]
+                while isinstance(chain[-1], dict) and chain[-1].get("use") in templates and len(chain) <= len(templates):
+                    chain.append(templates[chain[-1]["use"]])
+                signatures[(section, name)] = json.dumps(chain, sort_keys=True, default=repr)
+        return signatures
+
+    def collect(self):
+        """Return a new collector for the environment"""
+        from aws_syncr.collector import Collector
+        collector = Collector()
+        collector.amazon = self.amazon
+        collector.parsed_files = self.parsed_files
+        collector.prepare(self.aws_syncr.config_folder, {"aws_syncr": self.aws_syncr.clone()}, self.environment_folder)
+        return collector
+
+    def watch(self):
+        """Sync everything and then anything that changes, forever"""
+        seen = modified_times([self.environment_folder, self.accounts_file])
+        self.cycle(set())
+
+        while True:
+            time.sleep(self.interval)
+            current = modified_times([self.environment_folder, self.accounts_file])
+            changed = set(path for path in set(seen) | set(current) if seen.get(path) != current.get(path))
+            seen = current
+
+            if changed:
+                log.info("Files changed\tchanged=%s", sorted(changed))
+                self.cycle(changed)
+
+    def cycle(self, changed):
+        """Sync the items these files change, or everything if we aren't given any files"""
+        start = time.time()
+        try:
+            if self.accounts_file in changed:
+                log.info("Accounts changed, starting again with a new connection to amazon")
+                self.amazon = None
+
+            collector = self.collect()
+            configuration = collector.configuration
+            self.amazon = configuration["amazon"]
+
+            signatures = self.signatures(configuration)
+            if changed:
+                found = items_from_files(configuration, changed)
+                if found is not None:
+                    selectors = sorted(
+                          selector_for(section, name) for section, names in found.items() for name in names
+                          if self.synced.get((section, name)) != signatures[(section, name)]
+                        )
+                    if not selectors:
+                        log.info("No items changed")
+                        return
+
+                    # Nothing is normalised yet, so this decides what will be
+                    configuration["aws_syncr"].select = selectors
+
+            self.amazon.changes = False
+            self.amazon.recorded = []
+            self.amazon.forget_discovered()
+            self.action(collector)
+            self.synced = signatures
+        except DelfickError as error:
+            log.error("Failed to sync\terror=%s", error)
+        except Exception as error:
+            # Anything else (i.e. a ClientError boto didn't wrap) shouldn't stop us watching
+            log.exception("Failed to sync\terror=%s", error)
+        finally:
+            log.info("Watching for changes\ttook=%.2fs", time.time() - start)
@@ -32,6 +32,7 @@ setup(
     , entry_points =
       { 'console_scripts' :
         [ 'aws_syncr = aws_syncr.executor:main'
+        , 'aws_syncr_client = aws_syncr.client:main'
         ]
       }
 
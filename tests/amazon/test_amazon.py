@@ -83,6 +83,7 @@ describe TestCase, "Amazon":
 
             class sub(Amazon):
                 iam = mock.Mock(name="iam", resource=iam_resource)
+                access_key = lambda s: None
 
             instance = sub("dev", {"dev": "383902804"})
             with self.fuzzyAssertRaisesError(BadCredentials, "Don't have credentials for the correct account!", got="123456789123", wanted="383902804"):
@@ -102,6 +103,7 @@ describe TestCase, "Amazon":
 
             class sub(Amazon):
                 iam = mock.Mock(name="iam", resource=iam_resource)
+                access_key = lambda s: None
 
             instance = sub("dev", {"dev": "123456789123"})
             assert not hasattr(instance, "_validating")
@@ -110,3 +112,20 @@ describe TestCase, "Amazon":
 
             self.assertEqual(instance._validating, False)
             self.assertEqual(instance._validated, True)
+
+        it "uses and remembers the account id for the access key":
+            iam_resource = mock.Mock(name="iam_resource")
+            identifiers = mock.Mock(name="identifiers")
+            identifiers.get.return_value = "123456789123"
+
+            class sub(Amazon):
+                iam = mock.Mock(name="iam", resource=iam_resource)
+                access_key = lambda s: "AKIA"
+
+            instance = sub("dev", {"dev": "123456789123"})
+            instance.identifiers = identifiers
+            instance.validate_account()
+
+            self.assertEqual(instance._validated, True)
+            identifiers.get.assert_called_once_with("account", "AKIA")
+            self.assertEqual(iam_resource.roles.limit.mock_calls, [])
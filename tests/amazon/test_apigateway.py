@@ -0,0 +1,275 @@
+# coding: spec
+
+from aws_syncr.option_spec.apigateway import GatewayResource, GatewayMethods, MockGetMethod, LambdaPostMethod, Mapping, DomainName, Certificate, Secret
+from aws_syncr.amazon.apigateway import ApiGateway, GatewayInventory, paginated
+from aws_syncr.amazon.identifiers import IdentifierCache
+from aws_syncr.actions import encrypt_file
+from aws_syncr.amazon.kms import Kms
+
+from noseOfYeti.tokeniser.support import noy_sup_setUp
+from input_algorithms.spec_base import NotSpecified
+from tests.helpers import TestCase
+
+from six import StringIO
+import json
+import mock
+import os
+
+def a_resource(name, get_mock=NotSpecified, post_lambda=NotSpecified):
+    return GatewayResource(name=name, methods=GatewayMethods(GET_mock=get_mock, POST_lambda=post_lambda))
+
+default_mapping = Mapping("application/json", "$input.json('$')")
+
+def pages(*pages):
+    """Return a list call that gives these pages, following position"""
+    def call(limit, position=None, **kwargs):
+        index = 0 if position is None else int(position)
+        result = {"items": pages[index]}
+        if index + 1 < len(pages):
+            result["position"] = str(index + 1)
+        return result
+    return mock.Mock(name="list_call", side_effect=call)
+
+describe TestCase, "paginated":
+    it "follows position until there are no more pages":
+        call = pages([1, 2], [3], [4])
+        self.assertEqual(list(paginated(call, "items", restApiId="abc")), [1, 2, 3, 4])
+        self.assertEqual(call.mock_calls,
+            [ mock.call(limit=500, restApiId="abc")
+            , mock.call(limit=500, restApiId="abc", position="1")
+            , mock.call(limit=500, restApiId="abc", position="2")
+            ]
+        )
+
+describe TestCase, "GatewayInventory":
+    it "lists rest apis, domains with their mappings and api keys once":
+        client = mock.Mock(name="client")
+        client.get_rest_apis = pages([{"name": "one", "id": "1"}], [{"name": "two", "id": "2"}])
+        client.get_domain_names = pages([{"domainName": "api.blah.com"}])
+        client.get_base_path_mappings = pages([{"basePath": "(none)", "restApiId": "1", "stage": "prod"}])
+        client.get_api_keys = pages([{"name": "key"}])
+
+        inventory = GatewayInventory(client, "ap-southeast-2")
+        self.assertEqual(inventory.rest_apis, {"one": {"name": "one", "id": "1"}, "two": {"name": "two", "id": "2"}})
+        self.assertEqual(inventory.domain("api.blah.com")["mappings"], [{"basePath": "(none)", "restApiId": "1", "stage": "prod"}])
+        self.assertIs(inventory.domain("other.blah.com"), None)
+        self.assertEqual(inventory.api_keys, [{"name": "key"}])
+
+        inventory.add_rest_api({"name": "three", "id": "3"})
+        inventory.add_domain({"domainName": "new.blah.com"})
+        self.assertEqual(sorted(inventory.rest_apis), ["one", "three", "two"])
+        self.assertEqual(inventory.domain("new.blah.com"), {"domainName": "new.blah.com", "mappings": []})
+
+        inventory.rest_apis, inventory.domains, inventory.api_keys
+        self.assertEqual((client.get_rest_apis.call_count, client.get_domain_names.call_count, client.get_api_keys.call_count), (2, 1, 1))
+
+describe TestCase, "ApiGateway":
+    def gateway(self, dry_run=False):
+        amazon = mock.Mock(name="amazon")
+        return ApiGateway(amazon, "dev", {"dev": "123456789123"}, dry_run)
+
+    describe "gateway_info":
+        before_each:
+            self.gateway_api = self.gateway()
+            self.gateway_api.amazon.identifiers = IdentifierCache("dev", persist=False)
+            self.client = mock.Mock(name="client")
+            self.client.get_rest_apis = pages([{"name": "my-gateway", "id": "abc"}])
+            self.client.get_stages.return_value = {"item": [{"stageName": "prod", "deploymentId": "d1"}]}
+            self.client.get_resources = pages([{"path": "/", "id": "root"}])
+            self.client.get_deployments = pages([{"id": "d1"}])
+            self.client.get_domain_names = pages([])
+            self.client.get_api_keys = pages([])
+            self.gateway_api.clients["ap-southeast-2"] = self.client
+
+        it "finds the gateway once and remembers its id":
+            info = self.gateway_api.gateway_info("my-gateway", "ap-southeast-2")
+            self.assertEqual(info,
+                { "identity": "abc", "name": "my-gateway", "location": "ap-southeast-2"
+                , "stages": [{"stageName": "prod", "deploymentId": "d1"}]
+                , "resources": [{"path": "/", "id": "root"}]
+                , "deployment": [{"id": "d1"}]
+                , "api_keys": [], "domains": []
+                }
+            )
+            self.assertIs(self.gateway_api.gateway_info("my-gateway", "ap-southeast-2"), info)
+            self.assertEqual(self.gateway_api.amazon.identifiers.get("rest_api", "ap-southeast-2/my-gateway"), "abc")
+            self.assertEqual(self.gateway_api.gateway_info("other", "ap-southeast-2"), None)
+
+        it "looks again after forgetting what it found":
+            info = self.gateway_api.gateway_info("my-gateway", "ap-southeast-2")
+            self.gateway_api.forget_discovered()
+
+            self.client.get_rest_api.return_value = {"name": "my-gateway"}
+            again = self.gateway_api.gateway_info("my-gateway", "ap-southeast-2")
+            self.assertIsNot(again, info)
+            self.assertEqual(again, info)
+
+            # We used the id we remembered rather than listing rest apis again
+            self.client.get_rest_api.assert_called_once_with(restApiId="abc")
+            self.assertEqual(self.client.get_rest_apis.call_count, 1)
+
+    describe "modify_resources":
+        def modify(self, gateway, gateway_info, resources):
+            client = mock.Mock(name="client")
+            ids = iter(["r{0}".format(i) for i in range(10)])
+            client.create_resource.side_effect = lambda restApiId, parentId, pathPart: {"id": next(ids), "path": "{0}/{1}".format("" if parentId == "root" else "/things", pathPart), "ResponseMetadata": {}}
+            client.put_method.side_effect = lambda **kwargs: {"httpMethod": kwargs["httpMethod"], "apiKeyRequired": kwargs["apiKeyRequired"], "ResponseMetadata": {}}
+            client.put_method_response.side_effect = lambda **kwargs: {"statusCode": kwargs["statusCode"], "ResponseMetadata": {}}
+            client.put_integration.side_effect = lambda **kwargs: {"type": kwargs["type"], "ResponseMetadata": {}}
+            client.put_integration_response.side_effect = lambda **kwargs: {"statusCode": kwargs["statusCode"], "responseTemplates": kwargs["responseTemplates"], "ResponseMetadata": {}}
+
+            with mock.patch("sys.stdout", new_callable=StringIO) as stdout:
+                gateway.modify_resources(client, gateway_info, "ap-southeast-2", "my-gateway", resources)
+            return client, stdout.getvalue()
+
+        it "keeps gateway_info up to date with what it changes":
+            gateway = self.gateway()
+            gateway_info = {"identity": "abc", "resources": [{"path": "/", "id": "root"}]}
+            resources = [a_resource("/things/more", get_mock=MockGetMethod(mapping=default_mapping, require_api_key=True))]
+
+            client, printed = self.modify(gateway, gateway_info, resources)
+            self.assertEqual(client.create_resource.call_count, 2)
+            self.assertEqual(sorted(r["path"] for r in gateway_info["resources"]), ["/", "/things", "/things/more"])
+
+            more = [r for r in gateway_info["resources"] if r["path"] == "/things/more"][0]
+            self.assertEqual(more["resourceMethods"]["GET"],
+                { "httpMethod": "GET", "apiKeyRequired": True
+                , "methodResponses": {"200": {"statusCode": "200"}}
+                , "methodIntegration": {"type": "MOCK", "integrationResponses": {"200": {"statusCode": "200", "responseTemplates": {"application/json": "$input.json('$')"}}}}
+                }
+            )
+
+            # So syncing again doesn't change anything
+            client, printed = self.modify(gateway, gateway_info, resources)
+            self.assertEqual(printed, "")
+            self.assertEqual([call for call in client.mock_calls if not call[0].startswith("get_")], [])
+
+        it "forgets removed resources and everything under them":
+            gateway = self.gateway()
+            gateway_info = {"identity": "abc", "resources":
+                [ {"path": "/", "id": "root"}
+                , {"path": "/things", "id": "t", "resourceMethods": {}}
+                , {"path": "/things/more", "id": "m", "resourceMethods": {}}
+                , {"path": "/thingsandstuff", "id": "s", "resourceMethods": {}}
+                ]
+            }
+
+            client, printed = self.modify(gateway, gateway_info, [a_resource("/thingsandstuff")])
+            client.delete_resource.assert_called_once_with(restApiId="abc", resourceId="t")
+            self.assertEqual([line for line in printed.split("\n") if line.startswith("-")], ["- gateway resource(gateway=my-gateway, resource=/things)"])
+            self.assertEqual(sorted(r["path"] for r in gateway_info["resources"]), ["/", "/thingsandstuff"])
+
+    describe "swagger_document":
+        it "has an operation for each method with the api key security definition when needed":
+            resources = [
+                  a_resource("things", get_mock=MockGetMethod(mapping=default_mapping, require_api_key=True))
+                , a_resource("/stuff", post_lambda=LambdaPostMethod(function="fn", location="us-east-1", account=NotSpecified, require_api_key=False, mapping=default_mapping))
+                ]
+            document = self.gateway().swagger_document("my-gateway", "ap-southeast-2", resources)
+
+            function_arn = "arn:aws:lambda:us-east-1:123456789123:function:fn"
+            self.assertEqual(document,
+                { "swagger": "2.0"
+                , "info": {"title": "my-gateway", "version": "1.0"}
+                , "schemes": ["https"]
+                , "securityDefinitions": {"api_key": {"type": "apiKey", "name": "x-api-key", "in": "header"}}
+                , "paths":
+                  { "/things":
+                    { "get":
+                      { "produces": ["application/json"]
+                      , "responses": {"200": {"description": "200 response"}}
+                      , "security": [{"api_key": []}]
+                      , "x-amazon-apigateway-integration":
+                        { "type": "mock", "httpMethod": "GET"
+                        , "responses": {"default": {"statusCode": "200", "responseTemplates": {"application/json": "$input.json('$')"}}}
+                        }
+                      }
+                    }
+                  , "/stuff":
+                    { "post":
+                      { "produces": ["application/json"]
+                      , "responses": {"200": {"description": "200 response"}}
+                      , "x-amazon-apigateway-integration":
+                        { "type": "aws", "httpMethod": "POST"
+                        , "uri": "arn:aws:apigateway:ap-southeast-2:lambda:path/2015-03-31/functions/{0}/invocations".format(function_arn)
+                        , "responses": {"default": {"statusCode": "200", "responseTemplates": {"application/json": "$input.json('$')"}}}
+                        }
+                      }
+                    }
+                  }
+                }
+            )
+
+    describe "import_resources":
+        def import_resources(self, gateway, mode, resources):
+            client = mock.Mock(name="client")
+            client.get_resources = pages([{"path": "/", "id": "root"}, {"path": "/things", "id": "t"}])
+            self.gateway_info = {"identity": "abc", "resources": [{"path": "/", "id": "root"}, {"path": "/old", "id": "old"}]}
+            with mock.patch("sys.stdout", new_callable=StringIO) as stdout:
+                gateway.import_resources(client, self.gateway_info, "ap-southeast-2", "my-gateway", resources, mode)
+            return client, [line for line in stdout.getvalue().split("\n") if line and not line.startswith("\t")]
+
+        it "prints the fine grained diff and records the import as one change":
+            gateway = self.gateway()
+            client, printed = self.import_resources(gateway, "overwrite", [a_resource("/things", get_mock=MockGetMethod(mapping=default_mapping, require_api_key=False))])
+
+            self.assertIn("- gateway resource(gateway=my-gateway, resource=/old)", printed)
+            self.assertIn("+ gateway resource(gateway=my-gateway, resource=/things)", printed)
+            self.assertEqual(printed[-1], "M gateway swagger import(gateway=my-gateway, mode=overwrite)")
+
+            gateway.amazon.record_change.assert_called_once_with("M", "gateway swagger import", applied=True, gateway="my-gateway", mode="overwrite")
+            self.assertEqual(client.put_rest_api.call_count, 1)
+            self.assertEqual(self.gateway_info["resources"], [{"path": "/", "id": "root"}, {"path": "/things", "id": "t"}])
+            self.assertEqual(client.put_rest_api.call_args[1]["mode"], "overwrite")
+            self.assertEqual(list(json.loads(client.put_rest_api.call_args[1]["body"].decode('utf-8'))["paths"]), ["/things"])
+            for method in ("delete_resource", "create_resource", "put_method", "put_integration"):
+                self.assertEqual(getattr(client, method).mock_calls, [])
+
+        it "doesn't say it removes anything when merging":
+            gateway = self.gateway()
+            client, printed = self.import_resources(gateway, "merge", [a_resource("/things", get_mock=MockGetMethod(mapping=default_mapping, require_api_key=False))])
+            self.assertNotIn("- gateway resource(gateway=my-gateway, resource=/old)", printed)
+            self.assertEqual(printed[-1], "M gateway swagger import(gateway=my-gateway, mode=merge)")
+
+        it "doesn't import when merging would change nothing":
+            gateway = self.gateway()
+            client, printed = self.import_resources(gateway, "merge", [])
+            self.assertEqual(printed, [])
+            self.assertEqual(client.put_rest_api.mock_calls, [])
+            self.assertEqual(gateway.amazon.record_change.mock_calls, [])
+
+        it "only records the import in a dry run":
+            gateway = self.gateway(dry_run=True)
+            client, printed = self.import_resources(gateway, "overwrite", [])
+            self.assertEqual(printed, ["- gateway resource(gateway=my-gateway, resource=/old)", "M gateway swagger import(gateway=my-gateway, mode=overwrite)"])
+            gateway.amazon.record_change.assert_called_once_with("M", "gateway swagger import", applied=False, gateway="my-gateway", mode="overwrite")
+            self.assertEqual(client.put_rest_api.mock_calls, [])
+
+    describe "modify_gateway":
+        it "decrypts the data keys for new domains together before making them":
+            data_key = os.urandom(32)
+            gateway = self.gateway()
+            gateway.amazon.kms = Kms(gateway.amazon, "dev", {"dev": "123456789123"}, False)
+            kms_client = mock.Mock(name="kms_client")
+            kms_client.decrypt.return_value = {"Plaintext": data_key}
+            gateway.amazon.kms.clients["ap-southeast-2"] = kms_client
+
+            def secret(contents):
+                with self.a_file(contents) as filename:
+                    kms, nonce = encrypt_file(data_key, filename)
+                return Secret(plain=NotSpecified, kms=kms, location="ap-southeast-2", kms_data_key="ZGF0YSBrZXk=", nonce=nonce)
+
+            certificate = Certificate(name="my-cert", body=secret("body"), key=secret("key"), chain=Secret(plain="chain", kms=NotSpecified, location=NotSpecified, kms_data_key=NotSpecified, nonce=NotSpecified))
+            domains = {"api": DomainName(name="api", zone="example.com", stage="prod", base_path=NotSpecified, certificate=certificate, gateway_location="ap-southeast-2")}
+
+            client = gateway.clients["ap-southeast-2"] = mock.Mock(name="client")
+            client.get_domain_names = pages([])
+            client.create_domain_name.return_value = {"domainName": "api.example.com"}
+
+            with mock.patch("sys.stdout", new_callable=StringIO):
+                with mock.patch.multiple(gateway, modify_resources=mock.DEFAULT, modify_stages=mock.DEFAULT, modify_domains=mock.DEFAULT, modify_api_keys=mock.DEFAULT):
+                    gateway.modify_gateway({"domains": []}, "my-gateway", "ap-southeast-2", [], [], [], domains)
+
+            kms_client.decrypt.assert_called_once_with(CiphertextBlob=b"data key")
+            client.create_domain_name.assert_called_once_with(domainName="api.example.com", certificateName="my-cert", certificateBody="body", certificateChain="chain", certificatePrivateKey="key")
+            self.assertEqual(gateway.inventory("ap-southeast-2").domains, [{"domainName": "api.example.com", "mappings": []}])
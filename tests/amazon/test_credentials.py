@@ -0,0 +1,109 @@
+# coding: spec
+
+from aws_syncr.amazon.credentials import CredentialsCache
+
+from noseOfYeti.tokeniser.support import noy_sup_setUp, noy_sup_tearDown
+from tests.helpers import TestCase
+import tempfile
+import shutil
+import json
+import time
+import mock
+import os
+
+describe TestCase, "CredentialsCache":
+    before_each:
+        self.folder = tempfile.mkdtemp()
+        self.location = os.path.join(self.folder, "credentials")
+        self.cache = CredentialsCache(self.location)
+        self.role_arn = "arn:aws:iam::123456789123:role/deployer"
+        self.credentials = {"RoleArn": self.role_arn, "AccessKeyId": "AKID", "SecretAccessKey": "secret", "SessionToken": "token", "Expiration": int(time.time()) + 3600, "AccountId": "123456789123"}
+
+    after_each:
+        shutil.rmtree(self.folder)
+
+    def write_key(self, contents):
+        os.makedirs(self.location)
+        with open(os.path.join(self.location, "key"), "wb") as fle:
+            fle.write(contents)
+
+    describe "get":
+        it "returns what was set":
+            self.cache.set("dev", self.credentials)
+            self.assertEqual(self.cache.get("dev", self.role_arn), self.credentials)
+            self.assertEqual(CredentialsCache(self.location).get("dev", self.role_arn), self.credentials)
+
+            with open(self.cache.path_for("dev")) as fle:
+                self.assertNotIn("secret", fle.read())
+
+        it "returns None when there is nothing cached":
+            self.assertIs(self.cache.get("dev", self.role_arn), None)
+
+        it "returns None when the credentials expire soon":
+            self.credentials["Expiration"] = int(time.time()) + 60
+            self.cache.set("dev", self.credentials)
+            self.assertIs(self.cache.get("dev", self.role_arn), None)
+
+        it "returns None for a different role":
+            self.cache.set("dev", self.credentials)
+            self.assertIs(self.cache.get("dev", "arn:aws:iam::123456789123:role/other"), None)
+
+        it "returns None when the signature doesn't match":
+            self.cache.set("dev", self.credentials)
+            with open(self.cache.path_for("dev")) as fle:
+                stored = json.load(fle)
+            stored["signature"] = "0" * len(stored["signature"])
+            with open(self.cache.path_for("dev"), "w") as fle:
+                json.dump(stored, fle)
+
+            self.assertIs(self.cache.get("dev", self.role_arn), None)
+
+        it "returns None when the file can't be read":
+            self.cache.ensure_folder()
+            with open(self.cache.path_for("dev"), "w") as fle:
+                fle.write("{not json")
+            self.assertIs(self.cache.get("dev", self.role_arn), None)
+
+            os.remove(self.cache.path_for("dev"))
+            os.makedirs(self.cache.path_for("dev"))
+            self.assertIs(self.cache.get("dev", self.role_arn), None)
+
+    describe "key":
+        it "is made once, only readable by us, and shared":
+            key = self.cache.key
+            self.assertEqual(len(key), 64)
+            self.assertEqual(CredentialsCache(self.location).key, key)
+            self.assertEqual(os.stat(os.path.join(self.location, "key")).st_mode & 0o777, 0o600)
+            self.assertEqual(os.listdir(self.location), ["key"])
+
+        it "replaces a key that is empty or the wrong length":
+            self.write_key(b"")
+            key = self.cache.key
+            self.assertEqual(len(key), 64)
+
+            with open(os.path.join(self.location, "key"), "wb") as fle:
+                fle.write(b"short")
+            self.cache.set("dev", self.credentials)
+            self.assertEqual(self.cache.get("dev", self.role_arn), self.credentials)
+            self.assertNotEqual(self.cache.key, key)
+
+        it "doesn't save credentials when it can't make a key":
+            self.cache.ensure_folder()
+            os.makedirs(os.path.join(self.location, "key"))
+            self.cache.set("dev", self.credentials)
+            self.assertEqual(os.listdir(self.location), ["key"])
+            self.assertIs(self.cache.get("dev", self.role_arn), None)
+
+    describe "assumed":
+        it "only assumes the role when nothing is cached":
+            expiration = mock.Mock(name="expiration")
+            expiration.utctimetuple.return_value = time.gmtime(self.credentials["Expiration"])
+            session = mock.Mock(name="session")
+            session.client.return_value.assume_role.return_value = {
+                  "Credentials": {"AccessKeyId": "AKID", "SecretAccessKey": "secret", "SessionToken": "token", "Expiration": expiration}
+                , "AssumedRoleUser": {"Arn": "arn:aws:sts::123456789123:assumed-role/deployer/aws_syncr-dev"}
+                }
+
+            self.assertEqual(self.cache.assumed("dev", self.role_arn, session), self.credentials)
+            self.assertEqual(self.cache.assumed("dev", self.role_arn, session), self.credentials)
+            session.client.return_value.assume_role.assert_called_once_with(RoleArn=self.role_arn, RoleSessionName="aws_syncr-dev")
@@ -0,0 +1,80 @@
+# coding: spec
+
+from aws_syncr.amazon.iam import Iam
+
+from noseOfYeti.tokeniser.support import noy_sup_setUp
+from botocore.exceptions import ClientError
+from tests.helpers import TestCase
+
+from six import StringIO
+import mock
+
+def not_found(operation):
+    return ClientError({"Error": {"Code": "NoSuchEntity", "Message": "not found"}, "ResponseMetadata": {"HTTPStatusCode": 404}}, operation)
+
+describe TestCase, "Iam":
+    before_each:
+        self.amazon = mock.Mock(name="amazon")
+        self.client = self.amazon.session.client.return_value
+        self.iam = Iam(self.amazon, "dev", {"dev": "123456789123"}, False)
+
+    describe "role_info":
+        it "returns the role with its inline policies from every page":
+            self.client.get_role.return_value = {"Role": {"RoleName": "bob", "AssumeRolePolicyDocument": {"Statement": []}}}
+            self.client.get_paginator.return_value.paginate.return_value = [{"PolicyNames": ["one", "two"]}, {"PolicyNames": ["three"]}]
+            self.client.get_role_policy.side_effect = lambda RoleName, PolicyName: {"PolicyDocument": {"Name": PolicyName}}
+
+            self.assertEqual(self.iam.role_info("team/bob"),
+                { "RoleName": "bob", "AssumeRolePolicyDocument": {"Statement": []}
+                , "RolePolicies": {"one": {"Name": "one"}, "two": {"Name": "two"}, "three": {"Name": "three"}}
+                }
+            )
+            self.client.get_role.assert_called_once_with(RoleName="bob")
+            self.client.get_paginator.assert_called_once_with("list_role_policies")
+            self.client.get_paginator.return_value.paginate.assert_called_once_with(RoleName="bob")
+
+        it "returns no policies for a role without inline policies":
+            self.client.get_role.return_value = {"Role": {"RoleName": "bob"}}
+            self.client.get_paginator.return_value.paginate.return_value = [{"PolicyNames": []}]
+
+            self.assertEqual(self.iam.role_info("bob"), {"RoleName": "bob", "RolePolicies": {}})
+            self.assertEqual(self.client.get_role_policy.mock_calls, [])
+
+        it "returns None for a role that doesn't exist":
+            self.client.get_role.side_effect = not_found("GetRole")
+            self.assertIs(self.iam.role_info("bob"), None)
+            self.assertEqual(self.client.get_paginator.mock_calls, [])
+
+    describe "make_instance_profile":
+        def make(self, name):
+            with mock.patch("sys.stdout", new_callable=StringIO) as stdout:
+                self.iam.make_instance_profile(name)
+            return [line for line in stdout.getvalue().split("\n") if line]
+
+        it "creates a missing instance profile with the role in it":
+            self.client.get_instance_profile.side_effect = not_found("GetInstanceProfile")
+
+            self.assertEqual(self.make("team/bob"), ["+ instance_profile(profile=team/bob)", "+ instance_profile_role(profile=bob, role=bob)"])
+            self.client.create_instance_profile.assert_called_once_with(InstanceProfileName="bob")
+            self.client.add_role_to_instance_profile.assert_called_once_with(InstanceProfileName="bob", RoleName="bob")
+
+        it "adds the role to an instance profile that already exists without it":
+            self.client.get_instance_profile.side_effect = not_found("GetInstanceProfile")
+            self.client.create_instance_profile.side_effect = ClientError({"Error": {"Code": "EntityAlreadyExists", "Message": "exists"}, "ResponseMetadata": {"HTTPStatusCode": 409}}, "CreateInstanceProfile")
+
+            self.make("bob")
+            self.client.add_role_to_instance_profile.assert_called_once_with(InstanceProfileName="bob", RoleName="bob")
+
+        it "replaces other roles in the instance profile":
+            self.client.get_instance_profile.return_value = {"InstanceProfile": {"Roles": [{"RoleName": "alice"}]}}
+
+            self.assertEqual(self.make("bob"), ["- instance_profile_role(profile=bob, role=alice)", "+ instance_profile_role(profile=bob, role=bob)"])
+            self.assertEqual(self.client.create_instance_profile.mock_calls, [])
+            self.client.remove_role_from_instance_profile.assert_called_once_with(InstanceProfileName="bob", RoleName="alice")
+            self.client.add_role_to_instance_profile.assert_called_once_with(InstanceProfileName="bob", RoleName="bob")
+
+        it "does nothing when the instance profile already has the role":
+            self.client.get_instance_profile.return_value = {"InstanceProfile": {"Roles": [{"RoleName": "bob"}]}}
+
+            self.assertEqual(self.make("bob"), [])
+            self.assertEqual(self.amazon.record_change.mock_calls, [])
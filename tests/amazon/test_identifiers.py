@@ -0,0 +1,72 @@
+# coding: spec
+
+from aws_syncr.amazon.identifiers import IdentifierCache, is_not_found
+
+from noseOfYeti.tokeniser.support import noy_sup_setUp, noy_sup_tearDown
+from botocore.exceptions import ClientError
+from tests.helpers import TestCase
+import tempfile
+import shutil
+import mock
+import json
+import os
+
+def not_found():
+    return ClientError({"Error": {"Code": "NotFoundException", "Message": "gone"}}, "GetThing")
+
+describe TestCase, "IdentifierCache":
+    before_each:
+        self.directory = tempfile.mkdtemp()
+        self.location = os.path.join(self.directory, "cache", "identifiers.json")
+
+    after_each:
+        shutil.rmtree(self.directory)
+
+    it "remembers identifiers per environment on disk":
+        IdentifierCache("dev", self.location).set("bucket_location", "blah", "ap-southeast-2")
+
+        with open(self.location) as fle:
+            self.assertEqual(json.load(fle), {"dev": {"bucket_location": {"blah": "ap-southeast-2"}}})
+
+        self.assertEqual(IdentifierCache("dev", self.location).get("bucket_location", "blah"), "ap-southeast-2")
+        self.assertEqual(IdentifierCache("stg", self.location).get("bucket_location", "blah"), None)
+
+    it "only finds an identifier it doesn't already know":
+        find = mock.Mock(name="find", return_value="Z1")
+        cache = IdentifierCache("dev", self.location)
+        self.assertEqual(cache.lookup("hosted_zone", "blah.com.", find), "Z1")
+        self.assertEqual(cache.lookup("hosted_zone", "blah.com.", find), "Z1")
+        find.assert_called_once_with()
+
+    it "finds the identifier again if the cached one is stale":
+        cache = IdentifierCache("dev", self.location)
+        cache.set("rest_api", "blah", "old")
+
+        def use(identity):
+            if identity == "old":
+                raise not_found()
+            return identity
+
+        find = mock.Mock(name="find", return_value="new")
+        self.assertEqual(cache.validated("rest_api", "blah", find, use), "new")
+        self.assertEqual(IdentifierCache("dev", self.location).get("rest_api", "blah"), "new")
+
+    it "doesn't retry when the identifier wasn't cached":
+        cache = IdentifierCache("dev", self.location)
+        use = mock.Mock(name="use", side_effect=not_found())
+        with self.fuzzyAssertRaisesError(ClientError):
+            cache.validated("rest_api", "blah", lambda: "new", use)
+        use.assert_called_once_with("new")
+
+    it "ignores a corrupt cache file":
+        os.makedirs(os.path.dirname(self.location))
+        with open(self.location, "w") as fle:
+            fle.write("{")
+        self.assertEqual(IdentifierCache("dev", self.location).get("account", "AKIA"), None)
+
+describe TestCase, "is_not_found":
+    it "knows which errors mean an identifier is stale":
+        assert is_not_found(not_found())
+        assert is_not_found(ClientError({"Error": {"Code": "Blah"}, "ResponseMetadata": {"HTTPStatusCode": 301}}, "GetBucketPolicy"))
+        assert not is_not_found(ClientError({"Error": {"Code": "AccessDenied"}}, "GetThing"))
+        assert not is_not_found(ValueError("nope"))
@@ -0,0 +1,81 @@
+# coding: spec
+
+from aws_syncr.amazon import kms as kms_module
+from aws_syncr.amazon.kms import Kms
+
+from noseOfYeti.tokeniser.support import noy_sup_setUp
+from tests.helpers import TestCase
+import threading
+import base64
+import weakref
+import mock
+import gc
+
+describe TestCase, "Kms":
+    before_each:
+        self.client_threads = []
+        self.decrypt_threads = []
+        self.clients = {}
+
+        def decrypt(CiphertextBlob):
+            self.decrypt_threads.append(threading.current_thread())
+            return {"Plaintext": b"plain " + CiphertextBlob}
+
+        def client(service, location):
+            self.client_threads.append(threading.current_thread())
+            client = self.clients[location] = mock.Mock(name="client_{0}".format(location))
+            client.decrypt.side_effect = decrypt
+            return client
+
+        self.amazon = mock.Mock(name="amazon")
+        self.amazon.session.client.side_effect = client
+        self.kms = Kms(self.amazon, "dev", {"dev": "123456789123"}, False)
+
+    def secret(self, val):
+        return base64.b64encode(val).decode('utf-8')
+
+    describe "decrypt_many":
+        it "decrypts each distinct data key once, in other threads":
+            self.kms.decrypt_many([
+                  ("ap-southeast-2", self.secret(b"one"))
+                , ("ap-southeast-2", self.secret(b"two"))
+                , ("ap-southeast-2", self.secret(b"one"))
+                , ("us-east-1", self.secret(b"one"))
+                ])
+
+            self.assertEqual(sorted(self.clients), ["ap-southeast-2", "us-east-1"])
+            self.assertEqual(set(self.client_threads), set([threading.current_thread()]))
+            self.assertEqual(len(self.decrypt_threads), 3)
+            self.assertNotIn(threading.current_thread(), self.decrypt_threads)
+
+            self.assertEqual(self.kms.decrypt("ap-southeast-2", self.secret(b"one")), b"plain one")
+            self.assertEqual(self.kms.decrypt("ap-southeast-2", self.secret(b"two")), b"plain two")
+            self.assertEqual(self.kms.decrypt("us-east-1", self.secret(b"one")), b"plain one")
+            self.assertEqual(len(self.decrypt_threads), 3)
+
+        it "does nothing when it already has the data keys":
+            self.kms.decrypt("ap-southeast-2", self.secret(b"one"))
+            self.kms.decrypt_many([("ap-southeast-2", self.secret(b"one"))])
+            self.assertEqual(len(self.decrypt_threads), 1)
+
+    describe "forgetting data keys":
+        it "overwrites the plaintext before forgetting it":
+            self.kms.decrypt("ap-southeast-2", self.secret(b"one"))
+            plaintext = list(self.kms.data_keys.values())[0]
+
+            self.kms.forget_discovered()
+            self.assertEqual(self.kms.data_keys, {})
+            self.assertEqual(plaintext, bytearray(len(b"plain one")))
+
+        it "forgets the keys of every Kms still around at exit without keeping the rest alive":
+            self.kms.decrypt("ap-southeast-2", self.secret(b"one"))
+            other = Kms(self.amazon, "dev", {"dev": "123456789123"}, False)
+            self.assertIn(other, kms_module.instances)
+
+            ref = weakref.ref(other)
+            del other
+            gc.collect()
+            self.assertIs(ref(), None)
+
+            kms_module.forget_all_data_keys()
+            self.assertEqual(self.kms.data_keys, {})
@@ -0,0 +1,49 @@
+# coding: spec
+
+from aws_syncr.amazon.lambdas import Lambdas
+
+from noseOfYeti.tokeniser.support import noy_sup_setUp
+from botocore.exceptions import ClientError
+from tests.helpers import TestCase
+import mock
+
+describe TestCase, "Lambdas":
+    before_each:
+        self.client = mock.Mock(name="client")
+        self.client.get_paginator.return_value.paginate.return_value = [
+              {"Functions": [{"FunctionName": "one", "Runtime": "python2.7"}, {"FunctionName": "two", "Runtime": "python2.7"}]}
+            , {"Functions": [{"FunctionName": "three", "Runtime": "nodejs"}]}
+            , {}
+            ]
+
+        self.amazon = mock.Mock(name="amazon")
+        self.amazon.session.client.return_value = self.client
+        self.lambdas = Lambdas(self.amazon, "dev", {"dev": "123456789123"}, False)
+
+    describe "function_info":
+        it "finds functions from every page of one listing per region":
+            self.assertEqual(self.lambdas.function_info("three", "ap-southeast-2"), {"FunctionName": "three", "Runtime": "nodejs"})
+            self.assertEqual(self.lambdas.function_info("one", "ap-southeast-2"), {"FunctionName": "one", "Runtime": "python2.7"})
+
+            self.client.get_paginator.assert_called_once_with("list_functions")
+            self.assertEqual(self.client.get_function_configuration.mock_calls, [])
+            self.amazon.session.client.assert_called_once_with("lambda", "ap-southeast-2")
+
+        it "asks for functions that weren't in the listing and remembers them":
+            self.client.get_function_configuration.return_value = {"FunctionName": "four", "Runtime": "python2.7"}
+
+            self.assertEqual(self.lambdas.function_info("four", "ap-southeast-2"), {"FunctionName": "four", "Runtime": "python2.7"})
+            self.assertEqual(self.lambdas.function_info("four", "ap-southeast-2"), {"FunctionName": "four", "Runtime": "python2.7"})
+            self.client.get_function_configuration.assert_called_once_with(FunctionName="four")
+
+        it "returns None for functions that don't exist":
+            self.client.get_function_configuration.side_effect = ClientError({"Error": {"Code": "ResourceNotFoundException", "Message": "Function not found"}, "ResponseMetadata": {"HTTPStatusCode": 404}}, "GetFunctionConfiguration")
+
+            self.assertIs(self.lambdas.function_info("missing", "ap-southeast-2"), None)
+            self.assertNotIn("missing", self.lambdas.inventory("ap-southeast-2"))
+
+        it "lists the functions again after forgetting them":
+            self.lambdas.function_info("one", "ap-southeast-2")
+            self.lambdas.forget_discovered()
+            self.lambdas.function_info("one", "ap-southeast-2")
+            self.assertEqual(self.client.get_paginator.call_count, 2)
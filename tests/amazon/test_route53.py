@@ -0,0 +1,34 @@
+# coding: spec
+
+from aws_syncr.amazon.identifiers import IdentifierCache
+from aws_syncr.amazon.route53 import Route53
+from aws_syncr.errors import UnknownZone
+
+from noseOfYeti.tokeniser.support import noy_sup_setUp
+from tests.helpers import TestCase
+import mock
+
+describe TestCase, "Route53":
+    before_each:
+        self.amazon = mock.Mock(name="amazon")
+        self.amazon.identifiers = IdentifierCache("dev", persist=False)
+        self.client = self.amazon.session.client.return_value
+        self.route53 = Route53(self.amazon, "dev", {"dev": "123456789123"}, False)
+
+    describe "zone_id":
+        it "finds and remembers the id of the zone":
+            self.client.list_hosted_zones_by_name.return_value = {"HostedZones": [{"Name": "example.com.", "Id": "/hostedzone/Z1"}]}
+            self.assertEqual(self.route53.zone_id("example.com"), "/hostedzone/Z1")
+            self.assertEqual(self.route53.zone_id("example.com"), "/hostedzone/Z1")
+            self.client.list_hosted_zones_by_name.assert_called_once_with(DNSName="example.com")
+            self.assertEqual(self.amazon.identifiers.get("hosted_zone", "example.com"), "/hostedzone/Z1")
+
+        it "complains about a zone that doesn't exist without remembering the zone after it":
+            self.client.list_hosted_zones_by_name.return_value = {"HostedZones": [{"Name": "other.com.", "Id": "/hostedzone/Z2"}]}
+            with self.fuzzyAssertRaisesError(UnknownZone, zone="example.com"):
+                self.route53.zone_id("example.com")
+            self.assertIs(self.amazon.identifiers.get("hosted_zone", "example.com"), None)
+
+            self.client.list_hosted_zones_by_name.return_value = {"HostedZones": []}
+            with self.fuzzyAssertRaisesError(UnknownZone, zone="example.com"):
+                self.route53.zone_id("example.com")
@@ -0,0 +1,107 @@
+# coding: spec
+
+from aws_syncr.amazon.identifiers import IdentifierCache
+from aws_syncr.amazon.s3 import S3
+
+from noseOfYeti.tokeniser.support import noy_sup_setUp
+from botocore.exceptions import ClientError
+from tests.helpers import TestCase
+import threading
+import mock
+
+describe TestCase, "S3":
+    before_each:
+        self.clients = {}
+        self.client_threads = []
+        def client(service, location=None):
+            self.client_threads.append(threading.current_thread())
+            if location not in self.clients:
+                self.clients[location] = mock.Mock(name="client_{0}".format(location))
+            return self.clients[location]
+
+        self.amazon = mock.Mock(name="amazon")
+        self.amazon.session.client.side_effect = client
+        self.amazon.identifiers = IdentifierCache("dev", persist=False)
+        self.s3 = S3(self.amazon, "dev", {"dev": "123456789123"}, False)
+
+    describe "load_info":
+        it "says us-east-1 for buckets without a LocationConstraint":
+            self.clients[None].get_bucket_location.return_value = {"LocationConstraint": None}
+            self.s3.regional_client("us-east-1").get_bucket_policy.return_value = {"Policy": "{}"}
+            self.s3.regional_client("us-east-1").get_bucket_tagging.return_value = {"TagSet": []}
+
+            info = self.s3.load_info("virginia")
+            self.assertEqual(info, {"name": "virginia", "location": "us-east-1", "policy": "{}", "tags": {}})
+            self.assertEqual(self.amazon.identifiers.get("bucket_location", "virginia"), "us-east-1")
+
+    describe "discover":
+        def bucket(self, name, location, policy="", tags=None):
+            self.buckets[name] = (location, policy, tags or {})
+
+        before_each:
+            self.buckets = {}
+            self.clients[None].list_buckets.side_effect = lambda: {"Buckets": [{"Name": name} for name in self.buckets]}
+            self.clients[None].get_bucket_location.side_effect = lambda Bucket: {"LocationConstraint": self.buckets[Bucket][0]}
+
+            def policy(Bucket):
+                if not self.buckets[Bucket][1]:
+                    raise ClientError({"Error": {"Code": "NoSuchBucketPolicy", "Message": "none"}, "ResponseMetadata": {"HTTPStatusCode": 404}}, "GetBucketPolicy")
+                return {"Policy": self.buckets[Bucket][1]}
+
+            def client(service, location=None):
+                client = make_client(service, location)
+                if location:
+                    client.get_bucket_policy.side_effect = policy
+                    client.get_bucket_tagging.side_effect = lambda Bucket: {"TagSet": [{"Key": key, "Value": val} for key, val in self.buckets[Bucket][2].items()]}
+                return client
+            make_client = self.amazon.session.client.side_effect
+            self.amazon.session.client.side_effect = client
+
+        it "finds information for the buckets that exist and that it doesn't already know about":
+            self.bucket("one", "ap-southeast-2", policy='{"Statement": []}', tags={"team": "a"})
+            self.bucket("two", None)
+            self.bucket("three", "ap-southeast-2")
+            self.s3.infos["three"] = {"name": "three"}
+
+            self.s3.discover(["one", "some/path/two", "three", "missing"])
+            self.assertEqual(self.s3.infos,
+                { "one": {"name": "one", "location": "ap-southeast-2", "policy": '{"Statement": []}', "tags": {"team": "a"}}
+                , "two": {"name": "two", "location": "us-east-1", "policy": "", "tags": {}}
+                , "three": {"name": "three"}
+                }
+            )
+            self.assertEqual(sorted(call[2]["Bucket"] for call in self.clients[None].get_bucket_location.mock_calls), ["one", "two"])
+
+        it "makes clients in the calling thread":
+            self.bucket("one", "ap-southeast-2")
+            self.bucket("two", "eu-west-1")
+            self.bucket("three", "EU")
+
+            self.s3.discover(["one", "two", "three"])
+            self.assertEqual(self.s3.infos["three"]["location"], "eu-west-1")
+            self.assertEqual(set(self.client_threads), set([threading.current_thread()]))
+            self.assertEqual(sorted(location for location in self.clients if location), ["ap-southeast-2", "eu-west-1"])
+
+        it "uses locations it remembers, and finds them again when they are stale":
+            self.bucket("one", "us-east-1")
+            self.amazon.identifiers.set("bucket_location", "one", "ap-southeast-2")
+            self.s3.regional_client("ap-southeast-2")
+            self.clients["ap-southeast-2"].get_bucket_policy.side_effect = ClientError({"Error": {"Code": "PermanentRedirect", "Message": "moved"}, "ResponseMetadata": {"HTTPStatusCode": 301}}, "GetBucketPolicy")
+
+            self.s3.discover(["one"])
+            self.assertEqual(self.s3.infos["one"]["location"], "us-east-1")
+            self.assertEqual(self.amazon.identifiers.get("bucket_location", "one"), "us-east-1")
+
+    describe "create_bucket":
+        it "doesn't give a LocationConstraint for us-east-1":
+            self.s3.existing = set()
+            self.amazon.identifiers = mock.Mock(name="identifiers")
+            with mock.patch.object(self.s3, "change", return_value=[True]):
+                self.s3.create_bucket("virginia", "", "us-east-1", {})
+                self.s3.create_bucket("sydney", "", "ap-southeast-2", {})
+
+            self.assertEqual(self.clients[None].create_bucket.mock_calls, [
+                  mock.call(Bucket="virginia")
+                , mock.call(Bucket="sydney", CreateBucketConfiguration={"LocationConstraint": "ap-southeast-2"})
+                ])
+            self.assertEqual(self.s3.infos["virginia"]["location"], "us-east-1")
@@ -0,0 +1,63 @@
+# coding: spec
+
+from aws_syncr.amazon.snapshot import Snapshot, SnapshotResponse
+from aws_syncr.errors import BadOption
+
+from noseOfYeti.tokeniser.support import noy_sup_setUp, noy_sup_tearDown
+from botocore.exceptions import ClientError
+from tests.helpers import TestCase
+
+import tempfile
+import shutil
+import boto3
+import os
+
+describe TestCase, "Snapshot":
+    before_each:
+        self.directory = tempfile.mkdtemp()
+        self.location = os.path.join(self.directory, "snapshot.gz")
+
+    after_each:
+        shutil.rmtree(self.directory)
+
+    def session(self):
+        return boto3.session.Session(region_name="ap-southeast-2", aws_access_key_id="a", aws_secret_access_key="b")
+
+    def record(self):
+        snapshot = Snapshot("dev", "123456789012")
+        session = self.session()
+        snapshot.attach(session)
+
+        def amazon(model, params, **kwargs):
+            if model.name == "GetRole":
+                return SnapshotResponse(200), {"Role": {"RoleName": "x", "AssumeRolePolicyDocument": "%7B%22a%22%3A1%7D"}, "ResponseMetadata": {}}
+        session.events.register("before-call", amazon)
+
+        self.assertEqual(session.client("iam").get_role(RoleName="x")["Role"]["AssumeRolePolicyDocument"], {"a": 1})
+        snapshot.save(self.location)
+
+    def replaying(self):
+        session = self.session()
+        Snapshot.load(self.location, "dev").attach(session, replay=True)
+        return session
+
+    it "replays what was recorded":
+        self.record()
+        role = self.replaying().client("iam").get_role(RoleName="x")["Role"]
+        self.assertEqual(role, {"RoleName": "x", "AssumeRolePolicyDocument": {"a": 1}})
+
+    it "says things that weren't recorded don't exist":
+        self.record()
+        session = self.replaying()
+
+        with self.assertRaises(ClientError) as error:
+            session.client("iam").get_role(RoleName="y")
+        self.assertEqual(error.exception.response["ResponseMetadata"]["HTTPStatusCode"], 404)
+
+        pages = list(session.client("lambda", "us-east-1").get_paginator("list_functions").paginate())
+        self.assertEqual([page["Functions"] for page in pages], [[]])
+
+    it "complains about snapshots for other environments":
+        self.record()
+        with self.fuzzyAssertRaisesError(BadOption, "Snapshot is for a different environment", wanted="stg", got="dev"):
+            Snapshot.load(self.location, "stg")
@@ -0,0 +1,34 @@
+# coding: spec
+
+from aws_syncr.option_spec.apigateway import post_lambda_spec
+from aws_syncr.option_spec.lambdas import Lambda
+
+from input_algorithms.errors import BadSpecValue
+from input_algorithms.dictobj import dictobj
+from option_merge import MergedOptions
+from input_algorithms.meta import Meta
+from tests.helpers import TestCase
+
+describe TestCase, "post_lambda_spec":
+    def normalise(self, val):
+        function = Lambda(name="defined", role="role", code=None, handler="index.handler", timeout=30, runtime="python2.7"
+            , location="eu-west-1", description="", sample_event="", memory_size=128
+            )
+        everything = MergedOptions.using({"lambda": {"items": {"defined": function}}}, dont_prefix=[dictobj])
+        return post_lambda_spec().normalise(Meta(everything, []).at("apigateway").at("resources").indexed_at(0), val)
+
+    it "keeps the location given with a function name":
+        result = self.normalise({"function": "my-function", "location": "ap-southeast-2"})
+        self.assertEqual((result.function, result.location), ("my-function", "ap-southeast-2"))
+
+    it "needs a location with a function name":
+        with self.fuzzyAssertRaisesError(BadSpecValue, "Location is a required key!"):
+            self.normalise({"function": "my-function"})
+
+    it "takes the name and location from a defined function":
+        result = self.normalise({"function": "{lambda.defined}"})
+        self.assertEqual((result.function, result.location), ("defined", "eu-west-1"))
+
+    it "complains about a defined function and a location together":
+        with self.fuzzyAssertRaisesError(BadSpecValue, "Please don't specify a defined lambda function and location at the same time"):
+            self.normalise({"function": "{lambda.defined}", "location": "ap-southeast-2"})
@@ -1,9 +1,10 @@
 # coding: spec
 
-from aws_syncr.option_spec.aws_syncr_specs import AwsSyncrSpec
+from aws_syncr.option_spec.aws_syncr_specs import AwsSyncrSpec, shard_spec
 from aws_syncr.errors import BadOption
 
 from input_algorithms.meta import Meta
+from option_merge import MergedOptions
 from tests.helpers import TestCase
 
 describe TestCase, "Aws_syncr":
@@ -23,6 +24,28 @@ describe TestCase, "Aws_syncr":
         accounts = {"prod": "123456789012"}
         self.assertEqual(AwsSyncrSpec().accounts_spec.normalise(Meta({}, []), accounts), accounts)
 
+    it "allows accounts that say which role to assume":
+        accounts = {"prod": {"id": "123456789012", "assume_role": "role/deployer"}, "dev": "210987654321"}
+        self.assertEqual(AwsSyncrSpec().accounts_spec.normalise(Meta({}, []), accounts), {"prod": "123456789012", "dev": "210987654321"})
+
+        with self.fuzzyAssertRaisesError(BadOption, "Account has unknown options", unknown=["role"]):
+            AwsSyncrSpec().accounts_spec.normalise(Meta({}, []), {"prod": {"id": "123456789012", "role": "role/deployer"}})
+
+    it "finds the role to assume for an environment":
+        configuration = MergedOptions.using({"accounts": {"prod": {"id": "123456789012", "assume_role": "role/deployer"}, "dev": "210987654321"}})
+        self.assertEqual(AwsSyncrSpec().assume_role_for(configuration, "prod"), "role/deployer")
+        self.assertEqual(AwsSyncrSpec().assume_role_for(configuration, "dev"), None)
+
+    it "turns a shard into an index and count":
+        self.assertEqual(shard_spec().normalise(Meta({}, []), "2/4"), (2, 4))
+        self.assertEqual(shard_spec().normalise(Meta({}, []), ""), None)
+
+        with self.fuzzyAssertRaisesError(BadOption, "Shard must look like i/N", got="2-4"):
+            shard_spec().normalise(Meta({}, []), "2-4")
+
+        with self.fuzzyAssertRaisesError(BadOption, "Shard index must be between 1 and the number of shards", got="0/4"):
+            shard_spec().normalise(Meta({}, []), "0/4")
+
     it "allows a dictionary of string to dictionary for templates":
         templates = {"one": {"a": { 1: 2}}, "two": {"b":3, "c": 5}}
         self.assertEqual(AwsSyncrSpec().templates_spec.normalise(Meta({}, []), templates), templates)
@@ -31,6 +54,6 @@ describe TestCase, "Aws_syncr":
         with self.a_directory() as config_folder:
             aws_syncr = {"config_folder": config_folder, "location": "{loc}", "environment": "{env}"}
             everything = {"loc": "the_location", "env": "totes"}
-            expected = {"artifact": "", "stage": "", "debug": False, "extra": "", "dry_run": False, "location": "the_location", "environment": "totes", "config_folder": config_folder}
+            expected = {"artifact": "", "select": [], "resume": False, "against_snapshot": "", "since": "", "shard": None, "report": "", "stage": "", "debug": False, "extra": "", "dry_run": False, "location": "the_location", "environment": "totes", "config_folder": config_folder, "convert_workers": 1}
             self.assertEqual(AwsSyncrSpec().aws_syncr_spec.normalise(Meta(everything, []), aws_syncr), expected)
 
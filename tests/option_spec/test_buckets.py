@@ -84,6 +84,7 @@ describe TestCase, "Buckets":
             s3 = self.amazon.s3 = mock.Mock(name="s3")
             s3.bucket_info.return_value = {}
             self.buckets.sync_one(self.aws_syncr, self.amazon, self.bucket)
+            self.assertEqual(s3.discover.mock_calls, [])
             s3.bucket_info.assert_called_once_with(self.name)
             s3.create_bucket.assert_called_once_with(self.name, "", self.location, self.tags)
 
@@ -96,6 +97,25 @@ describe TestCase, "Buckets":
             s3.bucket_info.assert_called_once_with(self.name)
             s3.modify_bucket.assert_called_once_with(bucket_info, self.name, "", self.location, self.tags)
 
+        it "finds out about the buckets it's about to sync in one go":
+            s3 = self.amazon.s3 = mock.Mock(name="s3")
+            other = Bucket(name="other", location=self.location, permission=self.permission, tags=self.tags)
+            self.buckets.prefetch(self.amazon, [self.bucket, other])
+            s3.discover.assert_called_once_with([self.name, "other"])
+
+        it "renders what it would sync without amazon":
+            self.permission.statements = [mock.Mock(name="statement", statement={"Effect": "Allow"})]
+            self.permission.document = '{"Statement": [{"Effect": "Allow"}]}'
+            self.bucket.tags = {"team": "a"}
+
+            self.assertEqual(self.buckets.render_one(self.aws_syncr, {}, self.bucket)
+                , {"location": self.location, "policy": {"Statement": [{"Effect": "Allow"}]}, "tags": {"team": "a"}}
+                )
+
+            self.permission.statements = []
+            self.assertEqual(self.buckets.render_one(self.aws_syncr, {}, self.bucket)["policy"], None)
+            self.assertEqual(self.amazon.mock_calls, [])
+
 describe TestCase, "Registering buckets":
     before_each:
         # Need a valid folder to make aws_syncr
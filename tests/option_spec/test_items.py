@@ -0,0 +1,55 @@
+# coding: spec
+
+from aws_syncr.option_spec import items
+
+from input_algorithms import spec_base as sb
+from input_algorithms.meta import Meta
+from tests.helpers import TestCase
+import threading
+import mock
+import os
+
+class pid_spec(sb.Spec):
+    """Says which process normalised the value"""
+    def normalise(self, meta, val):
+        return (val, os.getpid())
+
+describe TestCase, "items_spec":
+    def normalise(self, val, convert_workers):
+        aws_syncr = mock.Mock(name="aws_syncr", convert_workers=convert_workers, select=[], shard=None, spec=["convert_workers", "select", "shard"])
+        meta = Meta({"aws_syncr": aws_syncr}, []).at("roles")
+        return items.items_spec(pid_spec()).normalise(meta, val)
+
+    it "normalises items in forked workers":
+        result = self.normalise({"one": 1, "two": 2, "three": 3}, 2)
+        self.assertEqual(dict((key, val) for key, (val, _) in result.items()), {"one": 1, "two": 2, "three": 3})
+        self.assertNotIn(os.getpid(), [pid for _, pid in result.values()])
+        self.assertIs(items.snapshot, None)
+
+    it "normalises in this process when it can't fork":
+        with mock.patch.object(items, "fork_context", lambda: None):
+            result = self.normalise({"one": 1, "two": 2}, 2)
+        self.assertEqual(result, {"one": (1, os.getpid()), "two": (2, os.getpid())})
+
+    it "normalises in this process when the worker has nothing to normalise":
+        self.assertEqual(items.normalise_in_worker("one"), ("one", None))
+
+    it "normalises in this process when other threads are running, and keeps conversions apart":
+        results = {}
+        started = threading.Event()
+        def convert(name, val):
+            started.wait()
+            results[name] = self.normalise(val, 2)
+
+        threads = [
+              threading.Thread(target=convert, args=("a", dict(("a{0}".format(i), i) for i in range(5))))
+            , threading.Thread(target=convert, args=("b", dict(("b{0}".format(i), i * 10) for i in range(5))))
+            ]
+        for thread in threads:
+            thread.start()
+        started.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results["a"], dict(("a{0}".format(i), (i, os.getpid())) for i in range(5)))
+        self.assertEqual(results["b"], dict(("b{0}".format(i), (i * 10, os.getpid())) for i in range(5)))
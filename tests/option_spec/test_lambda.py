@@ -227,6 +227,19 @@ describe TestCase, "Lambdas":
             lambdas.function_info.assert_called_once_with(self.name, self.location)
             lambdas.modify_function.assert_called_once_with(function_info, self.name, self.description, self.location, self.runtime, self.role, self.handler, self.timeout, self.memory_size, self.code)
 
+        it "renders the settings it would sync without amazon":
+            self.function.code = S3Code(key="key", bucket="bucket", version=NotSpecified)
+            self.assertEqual(self.lambdas.render_one(self.aws_syncr, {}, self.function)
+                , { "role": self.role, "handler": self.handler, "timeout": self.timeout
+                  , "runtime": self.runtime, "location": self.location, "description": self.description
+                  , "memory_size": self.memory_size, "code": {"s3_address": "s3://bucket/key", "version": None}
+                  }
+                )
+
+            self.function.code = DirectoryCode(directory="/somewhere", exclude=("*.pyc", ))
+            self.assertEqual(self.lambdas.render_one(self.aws_syncr, {}, self.function)["code"], {"directory": "/somewhere", "exclude": ["*.pyc"]})
+            self.assertEqual(self.amazon.mock_calls, [])
+
 describe TestCase, "S3Code":
     it "can get an s3 address":
         sc = S3Code(key="a/path/to/something", bucket="a_bucket", version=1)
@@ -130,6 +130,21 @@ describe TestCase, "Roles":
             self.assertEqual(iam.make_instance_profile.mock_calls, [])
             self.assertEqual(list(iam.create_role.mock_calls[0][2]['policies'].keys()), ["syncr_policy_role__somewhere__nice"])
 
+        it "renders what it would sync without amazon":
+            self.trust.document = '{"Statement": [{"Effect": "Allow"}]}'
+            self.permission.document = '{"Statement": [{"Effect": "Deny"}]}'
+            self.role.name = "role/somewhere/nice"
+            self.role.make_instance_profile = False
+
+            self.assertEqual(self.roles.render_one(self.aws_syncr, {}, self.role)
+                , { "policy_name": "syncr_policy_role__somewhere__nice"
+                  , "trust": {"Statement": [{"Effect": "Allow"}]}
+                  , "permission": {"Statement": [{"Effect": "Deny"}]}
+                  , "make_instance_profile": False
+                  }
+                )
+            self.assertEqual(self.amazon.mock_calls, [])
+
 describe TestCase, "__register__":
     before_each:
         # Need a valid folder to make aws_syncr
@@ -256,6 +256,34 @@ describe TestCase, "statement_spec":
                 , {"threefour": NotSpecified, "ThreeFour": "blah", "two": 1, "Two": NotSpecified}
                 )
 
+        it "only compiles the spec once for each instance":
+            args_lst = mock.Mock(name="args_lst", return_value={"two": sb.integer_spec()})
+
+            class sub(statement_spec):
+                args = args_lst
+                final_kls = type
+
+            instance = sub("role", "one")
+            self.assertIs(instance.make_spec(), instance.make_spec())
+            self.assertEqual(len(args_lst.mock_calls), 1)
+
+            self.assertIsNot(sub("role", "one").make_spec(), instance.make_spec())
+            self.assertEqual(len(args_lst.mock_calls), 2)
+
+        it "gives the same statements with a compiled spec as with a new one":
+            meta = Meta({"accounts": {"dev": "123456789123"}, "aws_syncr": mock.Mock(name="aws_syncr", environment="dev")}, [])
+            statements = [
+                  {"effect": "Allow", "action": "s3:Get*", "resource": {"s3": "one"}, "principal": {"iam": "role/bob"}}
+                , {"Effect": "Deny", "notaction": ["s3:Put*"], "resource": {"s3": "__self__"}, "principal": {"iam": "role/alice"}}
+                , {"effect": "Allow", "action": "s3:*", "notresource": "arn:aws:s3:::two/*", "principal": {"iam": "root"}}
+                ]
+
+            compiled = resource_policy_statement_spec("bucket", "my-bucket")
+            from_compiled = [compiled.normalise(meta.indexed_at(i), statement).statement for i, statement in enumerate(statements)]
+            from_new = [resource_policy_statement_spec("bucket", "my-bucket").normalise(meta.indexed_at(i), statement).statement for i, statement in enumerate(statements)]
+            self.assertEqual(from_compiled, from_new)
+            self.assertEqual(from_compiled[1]["Resource"], ["arn:aws:s3:::my-bucket", "arn:aws:s3:::my-bucket/*"])
+
     describe "make_kwargs":
         it "complains arg and capitalized for an arg both have values in normalised":
             arg = mock.Mock(name="arg")
@@ -0,0 +1,48 @@
+# coding: spec
+
+from aws_syncr.option_spec.templates import TemplateEngine
+from aws_syncr.errors import BadTemplate
+
+from noseOfYeti.tokeniser.support import noy_sup_setUp
+from option_merge import MergedOptions
+from input_algorithms.meta import Meta
+from tests.helpers import TestCase
+
+describe TestCase, "TemplateEngine":
+    before_each:
+        self.engine = TemplateEngine()
+
+    it "returns val as is if it doesn't use a template":
+        val = {"one": 1}
+        self.assertIs(self.engine.apply(Meta({}, []), val), val)
+
+    it "layers val on top of the template":
+        everything = {"templates": {"blah": {"one": 1, "two": 2}}}
+        result = self.engine.apply(Meta(everything, []), {"use": "blah", "two": 3})
+        self.assertEqual(result["one"], 1)
+        self.assertEqual(result["two"], 3)
+
+    it "follows templates that use other templates":
+        everything = {"templates": {"base": {"one": 1, "two": 2}, "middle": {"use": "base", "two": 3, "three": 4}}}
+        result = self.engine.apply(Meta(everything, []), {"use": "middle", "three": 5})
+        self.assertEqual(result.as_dict(), {"use": "middle", "one": 1, "two": 3, "three": 5})
+
+    it "complains about templates that don't exist":
+        everything = {"templates": {"blah": {}}}
+        meta = Meta(everything, [])
+        with self.fuzzyAssertRaisesError(BadTemplate, "Template doesn't exist!", wanted="other", available=["blah"], meta=meta):
+            self.engine.apply(meta, {"use": "other"})
+
+    it "complains about cycles":
+        everything = {"templates": {"one": {"use": "two"}, "two": {"use": "one"}}}
+        meta = Meta(everything, [])
+        with self.fuzzyAssertRaisesError(BadTemplate, "Template uses itself", chain=["one", "two", "one"], meta=meta):
+            self.engine.apply(meta, {"use": "one"})
+
+    it "only flattens a template once per configuration":
+        everything = MergedOptions.using({"templates": {"blah": {"one": 1}}})
+        meta = Meta(everything, [])
+        self.assertIs(self.engine.base_for(meta, "blah"), self.engine.base_for(meta, "blah"))
+
+        everything.update({"templates": {"blah": {"one": 2}}})
+        self.assertEqual(self.engine.base_for(meta, "blah"), {"one": 2})
@@ -0,0 +1,298 @@
+# coding: spec
+
+from aws_syncr.actions import audit, find_lambda_functions, encrypt_file
+from aws_syncr.option_spec.aws_syncr_specs import AwsSyncrSpec
+from aws_syncr.option_spec.apigateway import Secret
+from aws_syncr.collector import Collector
+from aws_syncr import actions, deploys
+from aws_syncr.option_spec.lambdas import DirectoryCode, S3Code
+from aws_syncr.option_spec.buckets import Buckets, Bucket
+from aws_syncr.option_spec.documents import Document
+from aws_syncr.amazon.identifiers import IdentifierCache
+from aws_syncr.amazon.s3 import S3
+from aws_syncr.errors import AwsSyncrError
+
+from input_algorithms.spec_base import NotSpecified
+from input_algorithms.meta import Meta
+from tests.helpers import TestCase
+
+from six import StringIO
+import zipfile
+import base64
+import mock
+import yaml
+import os
+
+def named(name, **kwargs):
+    thing = mock.Mock(name=name, **kwargs)
+    thing.name = name
+    return thing
+
+describe TestCase, "audit":
+    def collector(self, artifact=""):
+        amazon = mock.MagicMock(name="amazon")
+        amazon.iam.role_names.return_value = set(["deployer", "other"])
+        amazon.s3.existing_buckets.return_value = set(["blah", "old-bucket"])
+        amazon.kms.alias_names.return_value = set()
+        amazon.lambdas.inventory.return_value = {"fn": {}, "other-fn": {}}
+        amazon.apigateway.inventory.return_value.rest_apis = {}
+
+        configuration = {
+              "__registered__": ["roles", "buckets", "lambda"]
+            , "roles": mock.Mock(name="roles", items={"ci/deployer": named("ci/deployer")})
+            , "buckets": mock.Mock(name="buckets", items={"blah": named("blah")})
+            , "lambda": mock.Mock(name="lambda", items={"fn": named("fn", location="ap-southeast-2")})
+            , "amazon": amazon
+            , "aws_syncr": mock.Mock(name="aws_syncr", location="ap-southeast-2", artifact=artifact, report="")
+            }
+        return mock.Mock(name="collector", configuration=configuration)
+
+    def printed(self, collector):
+        with mock.patch("sys.stdout", new_callable=StringIO) as stdout:
+            audit(collector)
+        return stdout.getvalue().strip().split("\n")
+
+    it "reports resources that aren't in the configuration":
+        self.assertEqual(self.printed(self.collector()),
+            [ "? bucket(name=old-bucket)"
+            , "? function(name=other-fn, location=ap-southeast-2)"
+            , "? role(name=other)"
+            ]
+        )
+
+    it "only reports resources starting with the prefix in --artifact":
+        self.assertEqual(self.printed(self.collector(artifact="old")), ["? bucket(name=old-bucket)"])
+
+describe TestCase, "sync":
+    it "only asks amazon about the buckets that changed since a ref":
+        names = ["one", "two", "three"]
+        client = mock.Mock(name="client")
+        client.list_buckets.return_value = {"Buckets": [{"Name": name} for name in names]}
+        client.get_bucket_location.return_value = {"LocationConstraint": "ap-southeast-2"}
+        client.get_bucket_policy.return_value = {"Policy": ""}
+        client.get_bucket_tagging.return_value = {"TagSet": []}
+
+        amazon = mock.Mock(name="amazon", changes=False)
+        amazon.session.client.return_value = client
+        amazon.identifiers = IdentifierCache("dev", persist=False)
+        amazon.s3 = S3(amazon, "dev", {"dev": "123456789123"}, True)
+
+        buckets = Buckets(items=dict((name, Bucket(name=name, location="ap-southeast-2", permission=Document([]), tags={})) for name in names))
+        aws_syncr = mock.Mock(name="aws_syncr", since="origin/master", dry_run=True, artifact="", report=None, config_folder="/somewhere")
+        collector = mock.Mock(name="collector", configuration={"amazon": amazon, "aws_syncr": aws_syncr, "__registered__": ["buckets"], "buckets": buckets})
+
+        with mock.patch("aws_syncr.since.changed_items", return_value={"buckets": ["two"]}):
+            actions.sync(collector)
+
+        self.assertEqual(client.get_bucket_location.mock_calls, [mock.call(Bucket="two")])
+        self.assertEqual(client.get_bucket_policy.mock_calls, [mock.call(Bucket="two")])
+
+describe TestCase, "lambda functions in --artifact":
+    def collector(self, artifact, functions):
+        amazon = mock.MagicMock(name="amazon")
+        configuration = {
+              "lambda": mock.Mock(name="lambda", items=dict((function.name, function) for function in functions))
+            , "amazon": amazon
+            , "aws_syncr": mock.Mock(name="aws_syncr", artifact=artifact)
+            }
+        return mock.Mock(name="collector", configuration=configuration)
+
+    it "chooses functions with names and globs":
+        functions = [named(name) for name in ("ingest-one", "ingest-two", "report", "other")]
+        collector = self.collector("ingest-*, report,ingest-one", functions)
+        found = find_lambda_functions(collector.configuration["aws_syncr"], collector.configuration)
+        self.assertEqual([function.name for function in found], ["ingest-one", "ingest-two", "report"])
+
+        collector.configuration["aws_syncr"].artifact = "ingest-*,nope-*"
+        with self.fuzzyAssertRaisesError(AwsSyncrError, "Couldn't find specified lambda function", wanted="nope-*"):
+            find_lambda_functions(collector.configuration["aws_syncr"], collector.configuration)
+
+    def run_deploys(self, directory, name="from-directory"):
+        with open(os.path.join(directory, "index.js"), "w") as fle:
+            fle.write("exports.handler = function() {}")
+
+        zipped = {}
+        amazon = mock.Mock(name="amazon")
+        def deploy_function(name, code, location, packaged=None):
+            zipped[name] = zipfile.ZipFile(packaged).namelist()
+            return {"CodeSha256": "sha-{0}".format(name)}
+        amazon.lambdas.deploy_function.side_effect = deploy_function
+
+        function = named(name, location="ap-southeast-2", code=DirectoryCode(directory=directory, exclude=[]), event={})
+        summaries = deploys.Deploys(amazon).run([function])
+        self.assertEqual(summaries, [{"name": name, "location": "ap-southeast-2", "deployed": "sha-{0}".format(name)}])
+        return zipped
+
+    it "makes zipfiles in a pool of processes":
+        with self.a_directory() as directory:
+            self.assertEqual(self.run_deploys(directory), {"from-directory": ["index.js"]})
+
+    it "doesn't fork for zipfiles unless it has to and there are no other threads":
+        fake = mock.Mock(name="multiprocessing")
+        fake.get_all_start_methods.return_value = ["fork", "spawn", "forkserver"]
+        with mock.patch.object(deploys, "multiprocessing", fake):
+            self.assertIs(deploys.process_pool(2), fake.get_context.return_value.Pool.return_value)
+            fake.get_all_start_methods.return_value = ["spawn"]
+            deploys.process_pool(2)
+        self.assertEqual(fake.get_context.mock_calls, [mock.call("forkserver"), mock.call().Pool(2), mock.call("spawn"), mock.call().Pool(2)])
+
+        python2 = mock.Mock(name="multiprocessing", spec=["Pool"])
+        with mock.patch.object(deploys, "multiprocessing", python2):
+            with mock.patch("threading.active_count", lambda: 3):
+                self.assertIs(deploys.process_pool(2), None)
+            with mock.patch("threading.active_count", lambda: 1):
+                self.assertIs(deploys.process_pool(2), python2.Pool.return_value)
+        python2.Pool.assert_called_once_with(2)
+
+    it "makes zipfiles in threads when it can only fork and there are other threads":
+        with self.a_directory() as directory:
+            with mock.patch.object(deploys, "package", mock.Mock(name="package", wraps=deploys.package)) as package:
+                with mock.patch.object(deploys, "process_pool", lambda size: None):
+                    self.assertEqual(self.run_deploys(directory), {"from-directory": ["index.js"]})
+        package.assert_called_once_with(("from-directory", directory, []))
+
+    it "deploys and tests each function and says what happened to each one":
+        with self.a_directory() as directory:
+            with open(os.path.join(directory, "index.js"), "w") as fle:
+                fle.write("exports.handler = function() {}")
+
+            functions = [
+                  named("from-directory", location="ap-southeast-2", code=DirectoryCode(directory=directory, exclude=[]), event={"one": 1})
+                , named("from-s3", location="us-east-1", code=S3Code(key="key", bucket="bucket", version=None), event={"two": 2})
+                ]
+            collector = self.collector("from-*", functions)
+            lambdas = collector.configuration["amazon"].lambdas
+
+            zipped = {}
+            def deploy_function(name, code, location, packaged=None):
+                if packaged:
+                    zipped[name] = zipfile.ZipFile(packaged).namelist()
+                return {"CodeSha256": "sha-{0}".format(name)}
+            lambdas.deploy_function.side_effect = deploy_function
+
+            def invoke_function(name, event, location):
+                if name == "from-s3":
+                    return {"StatusCode": 200, "FunctionError": "Unhandled", "Payload": {}}, "it broke"
+                return {"StatusCode": 200, "Payload": event}, None
+            lambdas.invoke_function.side_effect = invoke_function
+
+            with mock.patch("sys.stdout", new_callable=StringIO) as stdout:
+                with self.fuzzyAssertRaisesError(AwsSyncrError, "Some lambda functions failed", failed=["from-s3"]):
+                    actions.deploy_and_test_lambda(collector)
+
+        self.assertEqual(zipped, {"from-directory": ["index.js"]})
+        self.assertEqual(stdout.getvalue().strip().split("\n")[-2:],
+            [ "= from-directory(location=ap-southeast-2, code_sha256=sha-from-directory, status_code=200)"
+            , "! from-s3(location=us-east-1, code_sha256=sha-from-s3, status_code=200, function_error=Unhandled)"
+            ]
+        )
+        self.assertIn("Logs for from-s3\nit broke", stdout.getvalue())
+
+describe TestCase, "encrypting certificates":
+    def amazon(self, data_key):
+        amazon = mock.Mock(name="amazon")
+        amazon.kms.decrypt.return_value = data_key
+        amazon.kms.generate_data_key.return_value = {"Plaintext": data_key, "CiphertextBlob": b"encrypted data key"}
+        return amazon
+
+    def resolve(self, amazon, kms, nonce=NotSpecified):
+        return Secret(plain=NotSpecified, kms=kms, location="ap-southeast-2", kms_data_key="data key", nonce=nonce).resolve(amazon)
+
+    it "decrypts what encrypt_file encrypted, with a different nonce each time":
+        data_key = os.urandom(32)
+        with self.a_file("-----BEGIN CERTIFICATE-----\nblah\n") as filename:
+            kms, nonce = encrypt_file(data_key, filename)
+            kms2, nonce2 = encrypt_file(data_key, filename)
+
+        self.assertEqual(len(base64.b64decode(nonce)), 8)
+        self.assertNotEqual(nonce, nonce2)
+        self.assertNotEqual(kms, kms2)
+        amazon = self.amazon(data_key)
+        self.assertEqual(self.resolve(amazon, kms, nonce), "-----BEGIN CERTIFICATE-----\nblah\n")
+        self.assertEqual(self.resolve(amazon, kms2, nonce2), "-----BEGIN CERTIFICATE-----\nblah\n")
+        amazon.kms.decrypt.assert_called_with("ap-southeast-2", "data key")
+
+    it "encrypts files bigger than a chunk":
+        data_key = os.urandom(32)
+        contents = "".join("line {0}\n".format(i) for i in range(20000))
+        self.assertGreater(len(contents), 64 * 1024 * 2)
+
+        with self.a_file(contents) as filename:
+            kms, nonce = encrypt_file(data_key, filename)
+        self.assertEqual(self.resolve(self.amazon(data_key), kms, nonce), contents)
+
+    it "decrypts secrets from before there was a nonce":
+        from Crypto.Util import Counter
+        from Crypto.Cipher import AES
+
+        data_key = os.urandom(32)
+        encryptor = AES.new(data_key, AES.MODE_CTR, counter=Counter.new(128))
+        kms = base64.b64encode(encryptor.encrypt(b"old secret")).decode('utf-8')
+        self.assertEqual(self.resolve(self.amazon(data_key), kms), "old secret")
+
+    describe "encrypt_secrets":
+        def write(self, folder, name, contents):
+            location = os.path.join(folder, name)
+            if not os.path.exists(os.path.dirname(location)):
+                os.makedirs(os.path.dirname(location))
+            with open(location, "w") as fle:
+                fle.write(contents)
+            return location
+
+        it "encrypts each file in the manifest into the configuration with one data key per kms key":
+            data_key = os.urandom(32)
+            amazon = self.amazon(data_key)
+
+            with self.a_directory() as folder:
+                self.write(folder, "accounts.yaml", "accounts:\n  dev: '123456789123'\n")
+                gateways = self.write(folder, "dev/gateways.yaml", "\n".join([
+                      "apigateway:"
+                    , "  my-gateway:"
+                    , "    location: ap-southeast-2"
+                    , "    domain_names:"
+                    , "      api:"
+                    , "        zone: example.com"
+                    , "        stage: prod"
+                    , "        certificate:"
+                    , "          name: my-cert"
+                    , "      other:"
+                    , "        zone: example.com"
+                    , "        stage: prod"
+                    , "        certificate:"
+                    , "          name: other-cert"
+                    ]) + "\n")
+
+                for name in ("body", "key", "chain"):
+                    self.write(folder, "certs/api.{0}".format(name), "api {0}".format(name))
+                self.write(folder, "certs/other.body", "other body")
+                manifest = self.write(folder, "certs/manifest.yaml", "\n".join([
+                      "key_id: alias/my-key"
+                    , "region: ap-southeast-2"
+                    , "certificates:"
+                    , "  api.example.com: {body: api.body, key: api.key, chain: api.chain}"
+                    , "  other.example.com: {body: other.body}"
+                    ]) + "\n")
+
+                aws_syncr = AwsSyncrSpec().aws_syncr_spec.normalise(Meta({}, []), {"environment": "dev", "config_folder": folder, "artifact": manifest})
+                collector = Collector()
+                collector.amazon = amazon
+                collector.prepare(folder, {"aws_syncr": aws_syncr}, os.path.join(folder, "dev"))
+
+                actions.encrypt_secrets(collector)
+
+                with open(gateways) as fle:
+                    domain_names = yaml.safe_load(fle)["apigateway"]["my-gateway"]["domain_names"]
+
+            amazon.kms.generate_data_key.assert_called_once_with("ap-southeast-2", "alias/my-key")
+
+            api = domain_names["api"]["certificate"]
+            self.assertEqual(api["name"], "my-cert")
+            for name in ("body", "key", "chain"):
+                self.assertEqual(sorted(api[name]), ["kms", "kms_data_key", "location", "nonce"])
+                self.assertEqual(api[name]["location"], "ap-southeast-2")
+                self.assertEqual(api[name]["kms_data_key"], base64.b64encode(b"encrypted data key").decode('utf-8'))
+                self.assertEqual(self.resolve(amazon, api[name]["kms"], api[name]["nonce"]), "api {0}".format(name))
+
+            other = domain_names["other"]["certificate"]
+            self.assertEqual(sorted(other), ["body", "name"])
+            self.assertEqual(self.resolve(amazon, other["body"]["kms"], other["body"]["nonce"]), "other body")
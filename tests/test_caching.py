@@ -0,0 +1,49 @@
+# coding: spec
+
+from aws_syncr.caching import ConfigurationCache
+
+from option_merge import MergedOptions
+from tests.helpers import TestCase
+import gc
+
+describe TestCase, "ConfigurationCache":
+    it "gives the same dictionary for a configuration and prefix until the configuration changes":
+        cache = ConfigurationCache()
+        configuration = MergedOptions.using({"roles": {"one": 1}, "buckets": {"two": 2}})
+
+        found = cache.get(configuration)
+        found["thing"] = 1
+        self.assertIs(cache.get(configuration), found)
+        self.assertEqual(cache.get(configuration["roles"]), {})
+        self.assertIsNot(cache.get(configuration["roles"]), found)
+
+        configuration["roles.three"] = 3
+        self.assertEqual(cache.get(configuration), {})
+
+    it "forgets everything when a layer is replaced by another":
+        cache = ConfigurationCache()
+        configuration = MergedOptions.using({"roles": {"one": 1}})
+        configuration["roles.two"] = 2
+        cache.get(configuration)["thing"] = 1
+
+        # The same number of layers as before
+        del configuration["roles.two"]
+        configuration["roles.two"] = 3
+        self.assertEqual(cache.get(configuration), {})
+
+    it "keeps a cache per configuration and doesn't keep configurations alive":
+        cache = ConfigurationCache()
+        one = MergedOptions.using({"roles": {"one": 1}})
+        two = MergedOptions.using({"roles": {"one": 1}})
+
+        cache.get(one)["thing"] = 1
+        self.assertEqual(cache.get(two), {})
+
+        del one
+        gc.collect()
+        self.assertEqual(len(cache.caches), 1)
+
+    it "returns None for things it can't track":
+        cache = ConfigurationCache()
+        self.assertIs(cache.get({"roles": {}}), None)
+        self.assertIs(cache.get(None), None)
@@ -0,0 +1,91 @@
+# coding: spec
+
+from aws_syncr.option_spec.aws_syncr_specs import AwsSyncrSpec
+from aws_syncr.importer import Importer, factor_templates
+
+from noseOfYeti.tokeniser.support import noy_sup_setUp
+from input_algorithms.meta import Meta
+from tests.helpers import TestCase
+
+describe TestCase, "Importer":
+    before_each:
+        # Need a valid folder to make aws_syncr
+        with self.a_directory() as config_folder:
+            aws_syncr = AwsSyncrSpec().aws_syncr_spec.normalise(Meta({}, []), {"environment": "dev", "config_folder": config_folder, "location": "ap-southeast-2"})
+        self.importer = Importer(aws_syncr, {"dev": "123456789123", "stg": "445829383783"})
+
+    it "uses our shorthands for a role":
+        trust = {"Version": "2012-10-17", "Statement": [
+              {"Sid": "", "Effect": "Allow", "Action": "sts:AssumeRole", "Principal": {"AWS": "arn:aws:iam::445829383783:role/bamboo/agent"}}
+            , {"Sid": "", "Effect": "Allow", "Action": "sts:AssumeRole", "Principal": {"Service": "ec2.amazonaws.com"}}
+            ]}
+        permission = {"Version": "2012-10-17", "Statement": [
+              {"Effect": "Allow", "Action": "s3:*", "Resource": ["arn:aws:s3:::blah", "arn:aws:s3:::blah/*", "arn:aws:s3:::other/path"]}
+            , {"Effect": "Allow", "Action": ["iam:Get*", "kms:Decrypt"], "Resource": ["arn:aws:iam::123456789123:role/ci/deployer", "arn:aws:kms:ap-southeast-2:123456789123:alias/mykey"]}
+            , {"Effect": "Deny", "Action": "s3:*", "Resource": "arn:aws:s3:::lonely"}
+            ]}
+        info = {"Path": "/ci/", "RoleName": "deployer", "AssumeRolePolicyDocument": trust}
+        policies = {"syncr_policy_ci__deployer": permission}
+
+        name, options = self.importer.role(info, policies, {"deployer": ["deployer"]})
+        self.assertEqual(name, "ci/deployer")
+        self.assertEqual(options,
+            { "allow_to_assume_me": [{"iam": "role/bamboo/agent", "account": "stg"}, {"service": "ec2"}]
+            , "permission":
+              [ {"effect": "Allow", "action": "s3:*", "resource": [{"s3": ["blah", "other/path"]}]}
+              , {"effect": "Allow", "action": ["iam:Get*", "kms:Decrypt"], "resource": [{"iam": "__self__"}, {"kms": "mykey"}]}
+              , {"effect": "Deny", "action": "s3:*", "resource": ["arn:aws:s3:::lonely"]}
+              ]
+            , "make_instance_profile": True
+            }
+        )
+        self.assertEqual(self.importer.problems_with_role(name, options, info, policies), [])
+
+    it "uses the statement as amazon has it when the shorthand doesn't give it back":
+        # We always give trust statements a Sid, so this won't sync without changes either
+        statement = {"Effect": "Allow", "Action": "sts:AssumeRole", "Principal": {"AWS": "arn:aws:iam::123456789123:root"}}
+        info = {"Path": "/", "RoleName": "odd", "AssumeRolePolicyDocument": {"Version": "2012-10-17", "Statement": [statement]}}
+
+        name, options = self.importer.role(info, {}, {})
+        self.assertEqual(options, {"allow_to_assume_me": [statement]})
+        self.assertEqual(self.importer.problems_with_role(name, options, info, {}), ["trust document", "inline policies aren't just syncr_policy_odd"])
+
+    it "uses __self__ for the bucket in a bucket policy":
+        policy = '{"Version": "2012-10-17", "Statement": [{"Sid": "", "Effect": "Allow", "Action": "s3:GetObject", "Resource": "arn:aws:s3:::blah/public/*", "Principal": {"AWS": "arn:aws:iam::445829383783:root"}}]}'
+        info = {"name": "blah", "location": "ap-southeast-2", "policy": policy, "tags": {"team": "a"}}
+
+        name, options = self.importer.bucket(info)
+        self.assertEqual(options,
+            { "location": "ap-southeast-2"
+            , "permission": [{"effect": "Allow", "action": "s3:GetObject", "resource": [{"s3": "__self__/public/*"}], "principal": {"iam": "root", "account": "stg"}}]
+            , "tags": {"team": "a"}
+            }
+        )
+        self.assertEqual(self.importer.problems_with_bucket(name, options, info), [])
+
+    it "round trips a bucket in us-east-1":
+        # S3 says us-east-1 buckets have no LocationConstraint, which S3.load_bucket turns into us-east-1
+        info = {"name": "virginia", "location": "us-east-1", "policy": "", "tags": {}}
+
+        name, options = self.importer.bucket(info)
+        self.assertEqual(options, {"location": "us-east-1"})
+        self.assertEqual(self.importer.problems_with_bucket(name, options, info), [])
+
+describe TestCase, "factor_templates":
+    it "moves shared options into templates":
+        items = {
+              "one": {"location": "ap-southeast-2", "tags": {"team": "a"}}
+            , "two": {"location": "ap-southeast-2", "tags": {"team": "a"}}
+            , "three": {"location": "ap-southeast-2", "tags": {"team": "b"}}
+            , "four": {"location": "us-west-2"}
+            }
+        templates = factor_templates("buckets", items, taken=set(["imported_buckets_1"]))
+
+        self.assertEqual(templates, {"imported_buckets_2": {"location": "ap-southeast-2"}})
+        self.assertEqual(items,
+            { "one": {"use": "imported_buckets_2", "tags": {"team": "a"}}
+            , "two": {"use": "imported_buckets_2", "tags": {"team": "a"}}
+            , "three": {"use": "imported_buckets_2", "tags": {"team": "b"}}
+            , "four": {"location": "us-west-2"}
+            }
+        )
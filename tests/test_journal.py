@@ -0,0 +1,57 @@
+# coding: spec
+
+from aws_syncr.journal import Journal
+
+from noseOfYeti.tokeniser.support import noy_sup_setUp, noy_sup_tearDown
+from tests.helpers import TestCase
+
+import tempfile
+import shutil
+import os
+
+describe TestCase, "Journal":
+    before_each:
+        self.directory = tempfile.mkdtemp()
+
+    after_each:
+        shutil.rmtree(self.directory)
+
+    def interrupted_run(self):
+        journal = Journal("dev", self.directory)
+        self.assertEqual(journal.start(), set())
+
+        with journal.item("roles", "one", "hash1"):
+            journal.change("+", "role", {"role": "one"})
+
+        try:
+            with journal.item("roles", "two", "hash2"):
+                raise ValueError("Expired token")
+        except ValueError:
+            pass
+
+        return journal
+
+    it "remembers the items an interrupted run finished":
+        self.interrupted_run()
+        self.assertEqual(Journal("dev", self.directory).resume(), set([("roles", "one", "hash1")]))
+
+    it "appends to the interrupted journal when resuming":
+        path = self.interrupted_run().path
+        journal = Journal("dev", self.directory)
+        journal.resume()
+        self.assertEqual(journal.path, path)
+
+        events = [event["event"] for event in journal.read(path)]
+        self.assertEqual(events, ["started", "item", "change", "done", "item", "resumed"])
+
+    it "starts again if the last run finished":
+        self.interrupted_run().finish()
+        journal = Journal("dev", self.directory)
+        self.assertEqual(journal.resume(), set())
+        self.assertEqual(len(journal.journals()), 2)
+
+    it "ignores a half written line":
+        path = self.interrupted_run().path
+        with open(path, "a") as fle:
+            fle.write('{"event": "do')
+        self.assertEqual(Journal("dev", self.directory).resume(), set([("roles", "one", "hash1")]))
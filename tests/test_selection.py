@@ -0,0 +1,56 @@
+# coding: spec
+
+from aws_syncr.selection import Selection
+from aws_syncr.errors import BadOption
+
+from noseOfYeti.tokeniser.support import noy_sup_setUp
+from tests.helpers import TestCase
+
+from option_merge import MergedOptions
+
+describe TestCase, "Selection":
+    before_each:
+        self.configuration = MergedOptions.using(
+              { "__registered__": ["roles", "lambda", "apigateway"]
+              , "templates": {"team_a": {"labels": ["team-a"]}, "ingest": {"use": "team_a"}}
+              , "roles": {"team-a-reader": {"use": "team_a"}, "team-b-reader": {}}
+              , "lambda": {"ingest": {"use": "ingest", "labels": ["ingest"]}, "other": {"labels": ["team-a"]}}
+              , "apigateway": {"gw": {"resources": [{"methods": {"function": "{lambda.other.arn}"}}]}}
+              }
+            )
+
+    def choose(self, *selectors):
+        return Selection().choose(self.configuration, selectors)
+
+    it "chooses items by section and glob":
+        self.assertEqual(self.choose("roles:team-a-*"), {"roles": set(["team-a-reader"])})
+        self.assertEqual(self.choose("*reader"), {"roles": set(["team-a-reader", "team-b-reader"])})
+
+    it "chooses items by label, including labels from templates":
+        self.assertEqual(self.choose("label:team-a"), {"roles": set(["team-a-reader"]), "lambda": set(["other"])})
+        self.assertEqual(self.choose("label:ingest"), {"lambda": set(["ingest"])})
+
+    it "chooses the items that chosen items refer to":
+        self.assertEqual(self.choose("apigateway:gw"), {"apigateway": set(["gw"]), "lambda": set(["other"])})
+
+    it "complains about unknown sections":
+        with self.fuzzyAssertRaisesError(BadOption, "Selector is for an unknown section"):
+            self.choose("nope:*")
+
+    it "puts every item in exactly one shard and keeps items that refer to each other together":
+        found = [Selection().sharded(self.configuration, (index, 3)) for index in range(1, 4)]
+
+        everything = [(typ, name) for chosen in found for typ, names in chosen.items() for name in names]
+        self.assertEqual(sorted(everything), sorted(
+            [("roles", "team-a-reader"), ("roles", "team-b-reader"), ("lambda", "ingest"), ("lambda", "other"), ("apigateway", "gw")]
+        ))
+
+        together = [chosen for chosen in found if "gw" in chosen.get("apigateway", ())]
+        self.assertEqual(len(together), 1)
+        self.assertIn("other", together[0]["lambda"])
+
+    it "only shards what was chosen":
+        chosen = {"roles": set(["team-a-reader"])}
+        found = [Selection().sharded(self.configuration, (index, 2), chosen) for index in range(1, 3)]
+        self.assertEqual(sorted(found, key=len), [{}, chosen])
+
@@ -0,0 +1,108 @@
+# coding: spec
+
+from aws_syncr.server import AmazonPool, ThreadOutput, Server, max_assumed_age
+from aws_syncr.client import request_for, aws_environment
+from aws_syncr.amazon.amazon import Amazon
+from aws_syncr.errors import BadOption
+
+from tests.helpers import TestCase
+
+from six import StringIO
+import threading
+import time
+import mock
+import os
+
+describe TestCase, "AmazonPool":
+    it "gives back connections for the same key with a clean slate":
+        pool = AmazonPool()
+        self.assertEqual(pool.take("dev", "sig"), (None, None))
+
+        amazon = mock.Mock(name="amazon", assume_role=None, changes=True, recorded=[1])
+        pool.give("dev", "sig", amazon, 1)
+
+        self.assertEqual(pool.take("stg", "sig"), (None, None))
+        self.assertEqual(pool.take("dev", "sig"), (amazon, 1))
+        self.assertEqual((amazon.changes, amazon.recorded, amazon.journal), (False, [], None))
+
+        # Only one task has it at a time
+        self.assertEqual(pool.take("dev", "sig"), (None, None))
+
+    it "forgets what the last task found in the account":
+        pool = AmazonPool()
+        pool.take("dev", "sig")
+
+        amazon = Amazon("dev", {"dev": "123456789123"})
+        amazon._validated = True
+        amazon._session = mock.Mock(name="session")
+        amazon.identifiers = mock.Mock(name="identifiers")
+
+        amazon.lambdas.inventories["ap-southeast-2"] = {"fn": {}}
+        amazon.s3.existing = set(["blah"])
+        amazon.s3.infos["blah"] = {}
+        amazon.apigateway.inventories["ap-southeast-2"] = mock.Mock(name="inventory")
+        clients = dict(amazon.lambdas.clients)
+
+        pool.give("dev", "sig", amazon, 1)
+        self.assertEqual(pool.take("dev", "sig"), (amazon, 1))
+
+        self.assertEqual((amazon.lambdas.inventories, amazon.s3.existing, amazon.s3.infos, amazon.apigateway.inventories), ({}, None, {}, {}))
+        amazon.identifiers.reload.assert_called_once_with()
+        self.assertEqual(amazon.lambdas.clients, clients)
+        self.assertEqual(amazon._validated, True)
+
+    it "forgets connections when the accounts change":
+        pool = AmazonPool()
+        pool.take("dev", "sig")
+        pool.give("dev", "sig", mock.Mock(name="amazon", assume_role=None), 1)
+        self.assertEqual(pool.take("dev", "sig2"), (None, None))
+
+        pool.give("dev", "sig", mock.Mock(name="amazon", assume_role=None), 1)
+        self.assertEqual(pool.take("dev", "sig2"), (None, None))
+
+    it "doesn't keep assumed credentials for too long":
+        pool = AmazonPool()
+        pool.take("dev", "sig")
+        pool.give("dev", "sig", mock.Mock(name="amazon", assume_role="role/deployer"), time.time() - max_assumed_age - 1)
+        self.assertEqual(pool.take("dev", "sig"), (None, None))
+
+describe TestCase, "ThreadOutput":
+    it "sends what a request's thread writes to that request":
+        original = StringIO()
+        output = ThreadOutput(original)
+        sent = []
+
+        def request():
+            output.local.send = sent.append
+            output.write("from request")
+        thread = threading.Thread(target=request)
+        thread.start()
+        thread.join()
+        output.write("from server")
+
+        self.assertEqual(sent, [{"output": "from request"}])
+        self.assertEqual(original.getvalue(), "from server")
+
+describe TestCase, "Server":
+    it "refuses clients with different aws environment variables":
+        request = request_for(["./dev"], "/here", {"AWS_PROFILE": "somewhere-else"})
+        with self.a_directory() as directory:
+            server = Server(os.path.join(directory, "server.sock"))
+            try:
+                with mock.patch.dict(os.environ, {"AWS_PROFILE": "here"}):
+                    with self.fuzzyAssertRaisesError(BadOption, "The client's AWS_\\* environment variables are different from the server's"):
+                        server.run(request, mock.Mock(name="output"))
+            finally:
+                server.server_close()
+
+describe TestCase, "request_for":
+    it "sends a hash of the aws environment variables":
+        self.assertEqual(aws_environment({"AWS_PROFILE": "dev", "AWS_SYNCR_SERVER": "/sock", "HOME": "/home"}), aws_environment({"AWS_PROFILE": "dev"}))
+        self.assertNotEqual(aws_environment({"AWS_PROFILE": "dev"}), aws_environment({"AWS_PROFILE": "stg"}))
+        self.assertNotIn("dev", request_for(["./dev"], "/here", {"AWS_PROFILE": "dev"})["aws_environment"])
+
+    it "passes on our default config folder":
+        environ = {"AWS_SYNCR_CONFIG_FOLDER": "/config"}
+        self.assertEqual(request_for(["./dev", "--task", "render"], "/here", {}), {"argv": ["./dev", "--task", "render"], "cwd": "/here", "aws_environment": aws_environment({})})
+        self.assertEqual(request_for(["./dev", "--", "extra"], "/here", environ)["argv"], ["./dev", "--config-folder", "/config", "--", "extra"])
+        self.assertEqual(request_for(["./dev", "--config-folder", "/other"], "/here", environ)["argv"], ["./dev", "--config-folder", "/other"])
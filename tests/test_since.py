@@ -0,0 +1,33 @@
+# coding: spec
+
+from aws_syncr.since import changed_items
+
+from noseOfYeti.tokeniser.support import noy_sup_setUp
+from tests.helpers import TestCase
+
+from option_merge import MergedOptions
+import mock
+import os
+
+describe TestCase, "changed_items":
+    before_each:
+        self.configuration = MergedOptions()
+        self.configuration["__registered__"] = ["roles", "buckets"]
+        self.configuration.update({"accounts": {"dev": "123456789123"}}, source="/config/accounts.yaml")
+        self.configuration.update({"templates": {"root": {"description": "a"}, "base": {"use": "root"}}}, source="/config/dev/templates.yaml")
+        self.configuration.update({"roles": {"one": {"use": "base"}, "two": {"description": "b"}}}, source="/config/dev/roles.yaml")
+        self.configuration.update({"buckets": {"blah": {"location": "ap-southeast-2"}}}, source="/config/dev/buckets.yaml")
+
+    def changed(self, *files):
+        with mock.patch("aws_syncr.since.changed_files", lambda folder, ref: set(os.path.realpath(f) for f in files)):
+            return changed_items(self.configuration, "/config", "HEAD")
+
+    it "finds the items defined in changed files":
+        self.assertEqual(self.changed("/config/dev/buckets.yaml"), {"buckets": set(["blah"])})
+        self.assertEqual(self.changed(), {})
+
+    it "finds items that use a changed template, even through other templates":
+        self.assertEqual(self.changed("/config/dev/templates.yaml"), {"roles": set(["one"])})
+
+    it "says to sync everything if something outside the sections changed":
+        self.assertIs(self.changed("/config/accounts.yaml"), None)
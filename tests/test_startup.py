@@ -0,0 +1,21 @@
+# coding: spec
+
+from tests.helpers import TestCase
+
+import subprocess
+import json
+import sys
+import os
+
+check = """
+import sys, json
+import aws_syncr.executor
+heavy = ("boto3", "botocore", "Crypto", "datadiff", "readline", "yaml", "pkg_resources")
+print(json.dumps(sorted(set(name.split(".")[0] for name in sys.modules if name.split(".")[0] in heavy))))
+"""
+
+describe TestCase, "Starting up":
+    it "doesn't import heavy modules until a task needs them":
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        output = subprocess.check_output([sys.executable, "-c", check], cwd=root)
+        self.assertEqual(json.loads(output.decode('utf-8').strip().split("\n")[-1]), [])
@@ -0,0 +1,99 @@
+# coding: spec
+
+from aws_syncr.watch import Watcher, modified_times, selector_for
+from aws_syncr.option_spec.aws_syncr_specs import AwsSyncrSpec
+
+from noseOfYeti.tokeniser.support import noy_sup_setUp, noy_sup_tearDown
+from input_algorithms.meta import Meta
+from tests.helpers import TestCase
+
+import tempfile
+import shutil
+import mock
+import yaml
+import os
+
+describe TestCase, "selector_for":
+    it "escapes glob characters in the name":
+        self.assertEqual(selector_for("roles", "ci/deployer"), "roles:ci/deployer")
+        self.assertEqual(selector_for("buckets", "a*b?[c]"), "buckets:a[*]b[?][[]c]")
+
+describe TestCase, "Watcher":
+    before_each:
+        self.folder = os.path.realpath(tempfile.mkdtemp())
+        os.makedirs(os.path.join(self.folder, "dev"))
+        self.write("accounts.yaml", "accounts:\n  dev: '123456789123'\n")
+        self.write("dev/templates.yaml", "templates:\n  base:\n    description: base\n")
+        self.write("dev/one.yaml", "roles:\n  one:\n    use: base\n  two: {}\n")
+        self.write("dev/two.yaml", "roles:\n  three: {}\n")
+
+        aws_syncr = AwsSyncrSpec().aws_syncr_spec.normalise(Meta({}, []), {"environment": "dev", "config_folder": self.folder, "artifact": ""})
+        self.amazon = mock.Mock(name="amazon")
+        collector = mock.Mock(name="collector", configuration={"aws_syncr": aws_syncr, "amazon": self.amazon})
+
+        self.synced = []
+        def action(collector):
+            self.assertIs(collector.configuration["amazon"], self.amazon)
+            self.synced.append(sorted(collector.configuration["roles"].items.keys()))
+        self.watcher = Watcher(collector, action)
+
+    after_each:
+        shutil.rmtree(self.folder)
+
+    def write(self, name, contents):
+        with open(os.path.join(self.folder, name), "w") as fle:
+            fle.write(contents)
+        return os.path.join(self.folder, name)
+
+    it "syncs everything to begin with":
+        self.watcher.cycle(set())
+        self.assertEqual(self.synced, [["one", "three", "two"]])
+
+    it "looks at the account again each time":
+        self.watcher.cycle(set())
+        self.watcher.cycle(set([self.write("dev/one.yaml", "roles:\n  one:\n    use: base\n  two:\n    description: changed\n")]))
+        self.assertEqual(self.amazon.forget_discovered.call_count, 2)
+
+    it "only syncs the items in files that changed":
+        self.watcher.cycle(set([os.path.join(self.folder, "dev", "two.yaml")]))
+        self.assertEqual(self.synced, [["three"]])
+
+    it "syncs items using templates that changed":
+        self.watcher.cycle(set([os.path.join(self.folder, "dev", "templates.yaml")]))
+        self.assertEqual(self.synced, [["one"]])
+
+    it "doesn't sync items in a changed file that are the same as last time":
+        self.watcher.cycle(set())
+        self.watcher.cycle(set([self.write("dev/one.yaml", "roles:\n  one:\n    use: base\n  two:\n    description: changed\n")]))
+        self.assertEqual(self.synced, [["one", "three", "two"], ["two"]])
+
+    it "keeps watching when a sync fails, and syncs the same items again next time":
+        from botocore.exceptions import ClientError
+        self.watcher.cycle(set())
+
+        action = self.watcher.action
+        def fail(collector):
+            action(collector)
+            raise ClientError({"Error": {"Code": "AccessDenied", "Message": "no"}, "ResponseMetadata": {"HTTPStatusCode": 403}}, "GetRole")
+        self.watcher.action = fail
+        changed = set([self.write("dev/one.yaml", "roles:\n  one:\n    use: base\n  two:\n    description: changed\n")])
+        self.watcher.cycle(changed)
+
+        self.watcher.action = action
+        self.watcher.cycle(changed)
+        self.assertEqual(self.synced, [["one", "three", "two"], ["two"], ["two"]])
+
+    it "only parses files again if they changed":
+        self.watcher.cycle(set())
+        with mock.patch("yaml.load", wraps=yaml.load) as load:
+            self.watcher.cycle(set([self.write("dev/two.yaml", "roles:\n  four: {}\n")]))
+
+        # The file listing what to include is new each time
+        parsed = [call[1][0] for call in load.mock_calls]
+        self.assertEqual(len(parsed), 2)
+        self.assertIn(b"four", parsed[1])
+        self.assertEqual(self.synced, [["one", "three", "two"], ["four"]])
+
+    it "finds files that changed":
+        before = modified_times([os.path.join(self.folder, "dev")])
+        self.assertEqual(sorted(before), sorted(os.path.join(self.folder, "dev", name) for name in ("one.yaml", "templates.yaml", "two.yaml")))